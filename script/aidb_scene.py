@@ -1,12 +1,11 @@
 import os
 from pathlib import Path
 import sys
+import time
 from typing import Any, Optional
 import pyperclip
 
-from aidb import SceneConfig, SceneManager, SceneImageManager, SceneImage, Scene
-
-from aidb.app.scene.app import AIDBSceneApp
+from aidb import SceneConfig, SceneManager, SceneImageManager, SceneImage, Scene, SceneWatcher
 
 from ait.tools.files import is_img_or_vid, is_dir
 
@@ -65,6 +64,17 @@ def scenes_update(params: Any, clipspace: Any, config: SceneConfig) -> None:
     return None
 
 
+def scenes_watch(params: Any, clipspace: Any, config: SceneConfig) -> None:
+    """Full update once, then every [params[0]=10] seconds only the scenes that changed."""
+    interval = float(params[0]) if params else 10.0
+    scm = SceneManager(verbose=0, config=config)
+    with SceneWatcher(scm.url_scenes) as watcher:
+        scm.scenes_update()
+        while True:
+            time.sleep(interval)
+            scm.scenes_update(journal=watcher.journal)
+
+
 def scene_url(params: Any, clipspace: Any, config: SceneConfig) -> Optional[Path]:
     scm = SceneManager(verbose=0, config=config)
     url_reg_file = clipspace[0]
@@ -101,8 +111,7 @@ def images_register(params: Any, clipspace: Any, config: SceneConfig) -> None:
     im: SceneImageManager = sm.scene_image_manager()
 
     urls_scene_to_update = []
-    for url in urls_img:
-        ret = im.register_from_url(url)
+    for url, ret in im.register_from_urls(urls_img).items():
         if ret is not None:
             # remember potential scene url
             urls_scene_to_update.append(Path(url).parent)
@@ -137,6 +146,9 @@ def images_rate(params: Any, clipspace: Any, config: SceneConfig) -> None:
 
 def start_app(params: Any, clipspace: Any, config: SceneConfig,
               skin: str = '1xlasm') -> None:
+    # gradio and the app modules load only for this command
+    from aidb.app.scene.app import AIDBSceneApp
+
     scm = SceneManager(config=config)  # type: ignore
     scm.scenes_update()
     app = AIDBSceneApp(scm, skin=skin)
@@ -177,6 +189,7 @@ if __name__ == '__main__':
         'url': scene_url,
         'new': scene_new,
         'update': scenes_update,
+        'watch': scenes_watch,
         'imgs_info': images_info,
         'imgs_register': images_register,
         'imgs_rate': images_rate,
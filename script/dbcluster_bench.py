@@ -0,0 +1,160 @@
+"""Benchmark of the incremental focus-vector clustering (`aidb.dbcluster.FocusClusterState`,
+`Statistics.imgs_cluster_incremental`) on synthetic data.
+
+n image documents with focus vectors around sparse cluster centers (about 250 images
+per center) go into an in-memory mongomock collection, or with db=mongodb://host:port
+into the collection `imgs_bench` of the database `dbcluster_bench` of a local mongod
+(dropped before and after). Timed are:
+
+- fit: `FocusClusterState.fit` and sklearn's `DBSCAN.fit` on the same standardized data;
+- update: `FocusClusterState.update` of the fitted state with `add` new images;
+- incremental: a whole `Statistics.imgs_cluster_incremental` call after `add` more images
+  were inserted, i.e. the Mongo read of all focus vectors, the state load, the update
+  and the save. The read, load and save are also timed alone.
+
+The target is +100 images on a 50k images DB in under `budget` seconds: update and
+incremental must stay within it, the script exits with 1 otherwise. mongomock reads
+orders of magnitude slower than a server, so there the incremental budget applies to
+the call minus its read; run with db= for the end to end number.
+
+Usage:
+    python script/dbcluster_bench.py [n=50000] [add=100] [eps=0.5] [min_samples=5] [budget=1.0] [db=mongodb://localhost:27017]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from bson import ObjectId
+from sklearn.cluster import DBSCAN
+
+from aidb.dbcluster import FocusClusterState
+from aidb.dbmanager import DBManager
+from aidb.dbstatistics import Statistics
+from aidb.tagger_defines import TaggerDef
+
+DB_NAME = 'dbcluster_bench'
+COLLECTION = 'imgs_bench'
+PER_CENTER = 250
+QUERY = ({'statistics.focus_vector': {'$exists': True}}, {'statistics.focus_vector': 1})
+
+
+def vectors_synthetic(rng: np.random.Generator, centers: np.ndarray, n: int) -> np.ndarray:
+    which = rng.integers(0, len(centers), n)
+    noise = rng.normal(0.0, 0.02, (n, centers.shape[1])) * (centers[which] > 0)
+    return np.clip(centers[which] + noise, 0.0, 1.0)
+
+
+def docs_synthetic(X: np.ndarray, offset: int) -> list[dict]:
+    return [
+        {'_id': ObjectId(f'{offset + i:024x}'), 'statistics': {'focus_vector': x.tolist()}}
+        for i, x in enumerate(X)
+    ]
+
+
+def stats_connect(url_db: str | None) -> Statistics:
+    dbm = object.__new__(DBManager)
+    dbm._verbose = 0
+    dbm._collection = COLLECTION
+    if url_db is None:
+        import mongomock
+
+        dbm.client = None
+        dbm.db = mongomock.MongoClient().db
+    else:
+        import pymongo
+
+        dbm.client = pymongo.MongoClient(url_db)
+        dbm.client.drop_database(DB_NAME)
+        dbm.db = dbm.client[DB_NAME]
+    return Statistics(dbm)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    ret = fn()
+    return ret, time.perf_counter() - t0
+
+
+def main() -> None:
+    n = 50000
+    add = 100
+    eps = 0.5
+    min_samples = 5
+    budget = 1.0
+    url_db = None
+    for arg in sys.argv[1:]:
+        key, _, value = arg.partition('=')
+        if key == 'n':
+            n = int(value)
+        elif key == 'add':
+            add = int(value)
+        elif key == 'eps':
+            eps = float(value)
+        elif key == 'min_samples':
+            min_samples = int(value)
+        elif key == 'budget':
+            budget = float(value)
+        elif key == 'db':
+            url_db = value
+        else:
+            print(f'unknown arg: {arg}', file=sys.stderr)
+            sys.exit(1)
+
+    rng = np.random.default_rng(0)
+    d = len(TaggerDef.TAGS_FOCUS)
+    k = max(1, n // PER_CENTER)
+    centers = rng.random((k, d)) * (rng.random((k, d)) < 0.05)
+    X = vectors_synthetic(rng, centers, n)
+    X_add = vectors_synthetic(rng, centers, 2 * add)
+    ids = [f'{i:024x}' for i in range(n + 2 * add)]
+
+    state = FocusClusterState(eps, min_samples)
+    _, t_fit = timed(lambda: state.fit(ids[:n], X))
+    _, t_sklearn = timed(lambda: DBSCAN(eps=eps, min_samples=min_samples).fit(state._scaled(X)))
+    n_clusters = len(set(state.labels.tolist()) - {-1})
+    print(
+        f'n={n}, eps={eps}: fit {t_fit:.2f}s, sklearn DBSCAN {t_sklearn:.2f}s '
+        f'({t_fit / t_sklearn:.1f}x), {n_clusters} clusters, noise {(state.labels < 0).mean():.0%}'
+    )
+    _, t_update = timed(lambda: state.update(ids[: n + add], np.vstack([X, X_add[:add]])))
+    print(f'update +{add}: {t_update:.3f}s')
+
+    stats = stats_connect(url_db)
+    collection = stats._db_manager._get_collection(COLLECTION)
+    try:
+        collection.insert_many(docs_synthetic(np.vstack([X, X_add[:add]]), 0))
+        with tempfile.TemporaryDirectory() as tmp:
+            # the state the update left matches the collection: the call below is incremental
+            url_state = Path(tmp) / 'clusters.npz'
+            state.save(url_state)
+
+            collection.insert_many(docs_synthetic(X_add[add:], n + add))
+            clusters, t_incremental = timed(
+                lambda: stats.imgs_cluster_incremental(url_state, eps, min_samples)
+            )
+            _, t_read = timed(lambda: list(collection.find(*QUERY)))
+            loaded, t_load = timed(lambda: FocusClusterState.load(url_state, eps, min_samples))
+            _, t_save = timed(lambda: loaded.save(url_state))
+    finally:
+        if url_db is not None:
+            stats._db_manager.client.drop_database(DB_NAME)
+
+    assert sum(len(members) for members in clusters.values()) == n + 2 * add
+    print(
+        f'incremental +{add} ({url_db or "mongomock"}): {t_incremental:.3f}s, of which read '
+        f'{t_read:.3f}s, load {t_load:.3f}s, save {t_save:.3f}s'
+    )
+
+    t_checked = t_incremental if url_db else t_incremental - t_read
+    over = [name for name, t in [('update', t_update), ('incremental', t_checked)] if t > budget]
+    for name in over:
+        print(f'{name}: over budget of {budget}s', file=sys.stderr)
+    if over:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Single-pass merge of a stack of LoRA / LoKr adapters into a base checkpoint.
+
+Replaces chained runs of merge_lora_into_fp8.py / merge_lokr_into_bf16.py:
+the base is streamed once, every adapter's delta (LoRA B @ A, LoKr kron(w1, w2))
+is accumulated in fp32 per row chunk of a tensor and cast once at the end, so N
+adapters cost one read + one write of the base and no intermediate bf16/fp8 round
+trips. out may be the base: the merge is written to a temp file replacing it.
+
+Output dtype per tensor:
+  fp8_ref=<file>   F8_E4M3 for the reference file's fp8 keys, BF16 otherwise
+                   (the merge_lora_into_fp8.py layout); stochastic=1 uses
+                   stochastic rounding for merged fp8 tensors
+  otherwise        dtype=native keeps each base tensor's dtype (default), or
+                   dtype=BF16 / F16 / F32 for all floating point tensors
+
+Usage:
+  python script/merge_adapters.py base=<bf16.safetensors> out=<out.safetensors> \\
+      adapter=<lora.safetensors>:lora:0.8 adapter=<lokr.safetensors>:lokr:0.75 \\
+      [fp8_ref=<fp8.safetensors> stochastic=1] [dtype=native] [seed=42]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+from ait.merge.adapters import Adapter, AdapterSpec
+from ait.merge.merger import stream_adapters_merge
+from ait.merge.safetensors_header import SafetensorsHeader, TensorInfo
+
+ARGS = ('base', 'out', 'adapter', 'fp8_ref', 'stochastic', 'dtype', 'seed')
+DTYPES_FLOAT = ('F32', 'F16', 'BF16')
+
+
+def main() -> None:
+    args: dict[str, str] = {}
+    specs: list[AdapterSpec] = []
+    for arg in sys.argv[1:]:
+        key, _, value = arg.partition('=')
+        if key not in ARGS:
+            print(f'unknown arg: {arg}', file=sys.stderr)
+            sys.exit(1)
+        if key == 'adapter':
+            specs.append(AdapterSpec.from_arg(value))
+        else:
+            args[key] = value
+    if 'base' not in args or 'out' not in args or not specs:
+        print(__doc__, file=sys.stderr)
+        sys.exit(1)
+
+    t_start = time.time()
+    base_url, out = Path(args['base']), Path(args['out'])
+    out.parent.mkdir(parents=True, exist_ok=True)
+
+    # 1. Plan and validate every adapter from the headers (no tensor data read)
+    print(f'[1/2] planning {len(specs)} adapters against {base_url.name} ...')
+    base = SafetensorsHeader(base_url)
+    try:
+        adapters = [Adapter(spec, base) for spec in specs]
+    except ValueError as e:
+        raise SystemExit(str(e)) from None
+    for adapter in adapters:
+        print(
+            f'    {adapter.spec.url.name}: {adapter.spec.kind} @ {adapter.spec.strength}, '
+            f'{len(adapter)} targets'
+        )
+
+    if 'fp8_ref' in args:
+        fp8_keys = SafetensorsHeader(args['fp8_ref']).keys_by_dtype('F8_E4M3')
+        missing = fp8_keys - set(base.keys())
+        if missing:
+            raise SystemExit(
+                f'{len(missing)} fp8 reference keys absent in base, e.g. {sorted(missing)[:3]}'
+            )
+
+        def dtype_for(key: str, info: TensorInfo) -> str:
+            return 'F8_E4M3' if key in fp8_keys else 'BF16'
+    else:
+        dtype = args.get('dtype', 'native')
+        if dtype != 'native' and dtype not in DTYPES_FLOAT:
+            raise SystemExit(f'dtype must be native or one of {DTYPES_FLOAT}')
+
+        def dtype_for(key: str, info: TensorInfo) -> str:
+            return dtype if dtype != 'native' and info.dtype in DTYPES_FLOAT else info.dtype
+
+    metadata = {
+        'format': 'pt',
+        'merged_from': ' + '.join(
+            [base_url.name]
+            + [f'{a.spec.url.name}:{a.spec.kind}@{a.spec.strength}' for a in adapters]
+        ),
+        'merge_type': 'single_pass_fp32_accumulate',
+    }
+
+    # 2. Stream the base once, all deltas summed in fp32, one final cast per tensor
+    print(f'[2/2] streaming merge -> {out} ...')
+    counts = stream_adapters_merge(
+        base_url,
+        adapters,
+        out,
+        dtype_for,
+        stochastic=args.get('stochastic', '0') == '1',
+        seed=int(args.get('seed', '42')),
+        metadata=metadata,
+    )
+
+    print(f'\n✓ done in {time.time() - t_start:.1f}s')
+    print(
+        f'  merged: {counts["merged"]} ({counts["deltas"]} deltas)   copy-only: {counts["copied"]}'
+    )
+    print(f'  output: {out}  ({out.stat().st_size / 1e9:.2f} GB)')
+
+
+if __name__ == '__main__':
+    main()
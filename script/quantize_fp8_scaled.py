@@ -11,13 +11,13 @@ transformer, reproducing the EXACT format of a reference stock fp8 file:
 
 Which tensors are fp8 is defined solely by the reference file (its F8_E4M3 keys +
 _quantization_metadata), so this stays correct even if the base's fp8 layer set
-is non-trivial. Streams one tensor at a time -> RAM bounded by the largest weight.
+is non-trivial. Streams the tensors through a reader thread / chunk worker pool /
+ordered writer pipeline (ait.merge.quantize) -> RAM bounded by a few tensors plus
+the fp32 row chunks in flight; wall time scales with Q_WORKERS (default: all cores).
 
 Usage: edit the constants and run. Runs a self-test first (re-quantise the stock
 bf16 and check it reproduces the stock fp8) before writing the real output.
 """
-import gc
-import json
 import os
 import struct
 import time
@@ -26,6 +26,9 @@ from pathlib import Path
 import torch
 from safetensors import safe_open
 
+from ait.merge.quantize import FP8_MAX, StreamPipeline, amax, as_bytes, row_chunks
+from ait.merge.safetensors_header import SafetensorsHeader, header_encode
+
 # ── inputs (override via env: Q_MERGED / Q_FP8_REF / Q_STOCK_BF16 / Q_OUT) ───
 # FP8_REF + STOCK_BF16 must be the *same variant's* stock files (the fp8 ref
 # defines which layers are fp8 + the _quantization_metadata; the self-test
@@ -50,31 +53,34 @@ OUT = Path(os.environ.get(
     'krea2-raw-snofs0.75-fp8-scaled.safetensors'
 ))
 
-FP8_MAX = 448.0  # float8_e4m3fn max representable
-DTYPE_BYTES = {'F32': 4, 'F16': 2, 'BF16': 2, 'F8_E4M3': 1}
+WORKERS = int(os.environ.get('Q_WORKERS', os.cpu_count() or 1))
 TORCH_FROM_NAME = {'F32': torch.float32, 'F16': torch.float16,
                    'BF16': torch.bfloat16, 'F8_E4M3': torch.float8_e4m3fn}
 
 
-def header(p: Path) -> dict:
-    with open(p, 'rb') as f:
-        n = struct.unpack('<Q', f.read(8))[0]
-        return json.loads(f.read(n))
+def scale_of(w: torch.Tensor) -> float:
+    """scale = amax/448 (matches stock)."""
+    a = amax(w)
+    return a / FP8_MAX if a > 0 else 1.0
+
+
+def quantize_rows(w: torch.Tensor, rows: slice, scale: float) -> torch.Tensor:
+    """Round-to-nearest scaled fp8 of a row chunk; fp32 temporaries are chunk sized."""
+    w = w if w.dim() == 0 else w[rows]
+    return (w.float() / scale).clamp(-FP8_MAX, FP8_MAX).to(torch.float8_e4m3fn)
 
 
 def quantize(w_bf16: torch.Tensor) -> tuple[torch.Tensor, float]:
     """Round-to-nearest scaled fp8, scale = amax/448 (matches stock)."""
-    w = w_bf16.float()
-    amax = w.abs().max().item()
-    scale = amax / FP8_MAX if amax > 0 else 1.0
-    q = (w / scale).clamp(-FP8_MAX, FP8_MAX).to(torch.float8_e4m3fn)
+    scale = scale_of(w_bf16)
+    q = torch.cat([quantize_rows(w_bf16, rows, scale) for rows in row_chunks(w_bf16.shape)])
     return q, scale
 
 
 def self_test() -> None:
     print('[self-test] reproducing stock fp8 from stock bf16 ...')
-    ref = header(FP8_REF)
-    keys = [k for k in ref if k != '__metadata__' and ref[k]['dtype'] == 'F8_E4M3'][:4]
+    ref = SafetensorsHeader(FP8_REF)
+    keys = [k for k in ref if ref[k].dtype == 'F8_E4M3'][:4]
     with safe_open(STOCK_BF16, framework='pt') as fb, safe_open(FP8_REF, framework='pt') as ff:
         for k in keys:
             q, sc = quantize(fb.get_tensor(k))
@@ -98,82 +104,90 @@ def main() -> None:
     OUT.parent.mkdir(parents=True, exist_ok=True)
     self_test()
 
-    ref = header(FP8_REF)
-    ref_meta = ref.get('__metadata__', {})
+    ref = SafetensorsHeader(FP8_REF)
+    ref_meta = ref.metadata
     if '_quantization_metadata' not in ref_meta:
         raise SystemExit('reference has no _quantization_metadata; wrong template')
-    order = [k for k in ref if k != '__metadata__']
-    fp8_wkeys = {k for k in order if ref[k]['dtype'] == 'F8_E4M3'}
+    order = ref.keys()
+    fp8_wkeys = ref.keys_by_dtype('F8_E4M3')
     print(f'[1/3] reference: {len(order)} tensors, {len(fp8_wkeys)} fp8 linears')
 
-    # pre-pass: scales from merged weights (256 floats)
-    print('[2/3] computing per-linear scales from merged bf16 ...')
-    scales: dict[str, float] = {}
+    # validate the merged file against the reference layout before reading any tensor data
+    merged = SafetensorsHeader(MERGED_BF16)
+    miss = [k for k in order if k not in merged and not k.endswith('.weight_scale')]
+    if miss:
+        raise SystemExit(f'{len(miss)} reference tensors absent in merged, e.g. {miss[:3]}')
+    bad = [k for k in order if k in merged and merged[k].shape != ref[k].shape]
+    if bad:
+        raise SystemExit(f'{len(bad)} shape mismatches vs reference, e.g. {bad[:3]}')
+
+    pipeline = StreamPipeline(WORKERS)
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // WORKERS))  # no oversubscription
+
+    # pre-pass: scales from merged weights (256 floats), amax of the row chunks in parallel
+    print(f'[2/3] computing per-linear scales from merged bf16 ({WORKERS} workers) ...')
+    amaxes: dict[str, float] = {}
+
+    def amax_tasks(k: str, w: torch.Tensor) -> list:
+        return [lambda rows=rows: (k, amax(w[rows])) for rows in row_chunks(w.shape)]
+
+    def amax_collect(result: tuple[str, float]) -> None:
+        k, a = result
+        amaxes[k] = max(amaxes.get(k, 0.0), a)
+
+    fp8_order = [k for k in order if k in fp8_wkeys]
     with safe_open(MERGED_BF16, framework='pt') as fm:
-        merged_keys = set(fm.keys())
-        miss = [k for k in fp8_wkeys if k not in merged_keys]
-        if miss:
-            raise SystemExit(f'{len(miss)} fp8 targets absent in merged, e.g. {miss[:3]}')
-        for k in fp8_wkeys:
-            scales[k] = quantize(fm.get_tensor(k))[1]
+        pipeline.run(fp8_order, fm.get_tensor, amax_tasks, amax_collect)
+    scales = {k: a / FP8_MAX if a > 0 else 1.0 for k, a in amaxes.items()}  # as scale_of
     print(f'    {len(scales)} scales')
 
     # build header mirroring the reference dtypes/shapes
-    entries: dict[str, dict] = {}
-    off = 0
-    for k in order:
-        dt = ref[k]['dtype']
-        shape = ref[k]['shape']
-        nb = DTYPE_BYTES[dt] * (1 if not shape else _numel(shape))
-        entries[k] = {'dtype': dt, 'shape': shape, 'data_offsets': [off, off + nb]}
-        off += nb
-    entries['__metadata__'] = {
-        'format': 'pt',
-        '_quantization_metadata': ref_meta['_quantization_metadata'],  # verbatim
-        'merged_from': MERGED_BF16.name,
-        'quant': 'fp8_e4m3fn scaled (amax/448, round-nearest)',
-    }
-    hb = json.dumps(entries, separators=(',', ':')).encode('utf-8')
-    hb += b' ' * ((8 - (len(hb) % 8)) % 8)
-
-    # write pass
+    hb, _ = header_encode(
+        [(k, ref[k].dtype, ref[k].shape) for k in order],
+        {
+            'format': 'pt',
+            '_quantization_metadata': ref_meta['_quantization_metadata'],  # verbatim
+            'merged_from': MERGED_BF16.name,
+            'quant': 'fp8_e4m3fn scaled (amax/448, round-nearest)',
+        },
+    )
+
+    # write pass: reader thread -> chunk workers -> ordered writer
     print(f'[3/3] streaming quant -> {OUT} ...')
-    n_fp8 = n_scale = n_bf16 = 0
+    counts = {'fp8': 0, 'scale': 0, 'bf16': 0}
     last = time.time()
+
+    def load(k: str) -> torch.Tensor | None:
+        return None if k.endswith('.weight_scale') and k not in fp8_wkeys else fm.get_tensor(k)
+
+    def tasks(k: str, t: torch.Tensor | None) -> list:
+        nonlocal last
+        if time.time() - last > 5.0:
+            print(f'    {sum(counts.values())}/{len(order)}  fp8={counts["fp8"]} '
+                  f'scale={counts["scale"]} bf16={counts["bf16"]}')
+            last = time.time()
+        if ref[k].dtype == 'F8_E4M3':                   # linear weight -> fp8
+            counts['fp8'] += 1
+            return [lambda rows=rows: as_bytes(quantize_rows(t, rows, scales[k]))
+                    for rows in row_chunks(t.shape)]
+        elif k.endswith('.weight_scale'):               # scalar scale
+            counts['scale'] += 1
+            wk = k[: -len('.weight_scale')] + '.weight'
+            return [lambda: struct.pack('<f', scales[wk])]
+        counts['bf16'] += 1                             # norm/1-D -> bf16
+        # 0-dim tensors (markers) are their own single chunk, slice(None) does not index them
+        return [lambda rows=rows: as_bytes((t if t.dim() == 0 else t[rows]).to(torch.bfloat16))
+                for rows in row_chunks(t.shape)]
+
     with open(OUT, 'wb') as out, safe_open(MERGED_BF16, framework='pt') as fm:
-        out.write(struct.pack('<Q', len(hb)))
         out.write(hb)
-        for i, k in enumerate(order):
-            dt = ref[k]['dtype']
-            if dt == 'F8_E4M3':                          # linear weight -> fp8
-                q, _ = quantize(fm.get_tensor(k))
-                out.write(q.contiguous().view(torch.uint8).numpy().tobytes())
-                n_fp8 += 1
-            elif k.endswith('.weight_scale'):            # scalar scale
-                wk = k[: -len('.weight_scale')] + '.weight'
-                out.write(struct.pack('<f', scales[wk]))
-                n_scale += 1
-            else:                                        # norm/1-D -> bf16
-                out.write(fm.get_tensor(k).to(torch.bfloat16)
-                          .contiguous().view(torch.uint8).numpy().tobytes())
-                n_bf16 += 1
-            if (i + 1) % 100 == 0:
-                gc.collect()
-            if time.time() - last > 5.0:
-                print(f'    {i+1}/{len(order)}  fp8={n_fp8} scale={n_scale} bf16={n_bf16}')
-                last = time.time()
+        pipeline.run(order, load, tasks, out.write)
+    n_fp8, n_scale, n_bf16 = counts['fp8'], counts['scale'], counts['bf16']
 
     print(f'\n✓ done in {time.time()-t0:.1f}s')
     print(f'  fp8 weights: {n_fp8}   scales: {n_scale}   bf16: {n_bf16}')
     print(f'  output: {OUT}  ({OUT.stat().st_size/1e9:.2f} GB)')
 
 
-def _numel(shape: list[int]) -> int:
-    n = 1
-    for s in shape:
-        n *= s
-    return n
-
-
 if __name__ == '__main__':
     main()
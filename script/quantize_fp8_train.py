@@ -15,15 +15,15 @@ Streams one tensor at a time -> RAM bounded by the largest single weight.
 Usage: edit constants / env (Q_SRC, Q_OUT, Q_KEEP) and run.
 """
 import gc
-import json
 import os
-import struct
 import time
 from pathlib import Path
 
 import torch
 from safetensors import safe_open
 
+from ait.merge.safetensors_header import SafetensorsHeader, header_encode
+
 # ── inputs ───────────────────────────────────────────────────────────────────
 SRC = Path(os.environ.get(
     'Q_SRC',
@@ -42,14 +42,6 @@ KEEP = os.environ.get('Q_KEEP', 'first,tmlp,tproj,txtfusion,txtmlp,last').split(
 
 FP8 = torch.float8_e4m3fn
 ST_NAME = {torch.float32: 'F32', torch.float16: 'F16', torch.bfloat16: 'BF16', FP8: 'F8_E4M3'}
-NAME_BYTES = {'F32': 4, 'F16': 2, 'BF16': 2, 'F8_E4M3': 1}
-
-
-def _numel(shape):
-    n = 1
-    for s in shape:
-        n *= s
-    return n
 
 
 def target_dtype(key: str, shape: list[int], src_name: str):
@@ -66,38 +58,31 @@ def main() -> None:
     OUT.parent.mkdir(parents=True, exist_ok=True)
 
     # header pass
-    with open(SRC, 'rb') as f:
-        n = struct.unpack('<Q', f.read(8))[0]
-        src_hdr = json.loads(f.read(n))
-    src_meta = src_hdr.get('__metadata__', {})
-    order = [k for k in src_hdr if k != '__metadata__']
-
-    entries: dict[str, dict] = {}
-    off = 0
+    src_hdr = SafetensorsHeader(SRC)
+    src_meta = src_hdr.metadata
+    order = src_hdr.keys()
+
     n_fp8 = n_keep = 0
     plan: dict[str, str] = {}
     for k in order:
-        shape = src_hdr[k]['shape']
-        src_name = src_hdr[k]['dtype']
-        _, out_name = target_dtype(k, shape, src_name)
+        src_name = src_hdr[k].dtype
+        _, out_name = target_dtype(k, list(src_hdr[k].shape), src_name)
         plan[k] = out_name
         if out_name == 'F8_E4M3' and src_name != 'F8_E4M3':
             n_fp8 += 1
         else:
             n_keep += 1
-        nb = NAME_BYTES[out_name] * (1 if not shape else _numel(shape))
-        entries[k] = {'dtype': out_name, 'shape': shape, 'data_offsets': [off, off + nb]}
-        off += nb
-
-    entries['__metadata__'] = {
-        'format': 'pt',
-        'reduced_from': SRC.name,
-        'quant': 'fp8_e4m3fn plain (block linears; keep=%s)' % ','.join(KEEP),
-        'merge_type': src_meta.get('merge_type', ''),
-        'lora_strength': src_meta.get('lora_strength', ''),
-    }
-    hb = json.dumps(entries, separators=(',', ':')).encode('utf-8')
-    hb += b' ' * ((8 - (len(hb) % 8)) % 8)
+
+    hb, _ = header_encode(
+        [(k, plan[k], src_hdr[k].shape) for k in order],
+        {
+            'format': 'pt',
+            'reduced_from': SRC.name,
+            'quant': 'fp8_e4m3fn plain (block linears; keep=%s)' % ','.join(KEEP),
+            'merge_type': src_meta.get('merge_type', ''),
+            'lora_strength': src_meta.get('lora_strength', ''),
+        },
+    )
 
     print(f'[plan] {len(order)} tensors: {n_fp8} -> fp8, {n_keep} kept verbatim  (keep={KEEP})')
 
@@ -105,7 +90,6 @@ def main() -> None:
     print(f'[write] streaming -> {OUT}')
     last = time.time()
     with open(OUT, 'wb') as out, safe_open(SRC, framework='pt') as fs:
-        out.write(struct.pack('<Q', len(hb)))
         out.write(hb)
         for i, k in enumerate(order):
             t = fs.get_tensor(k)
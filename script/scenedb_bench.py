@@ -0,0 +1,339 @@
+"""Benchmark of the scene DB hot paths on synthetic scenes.
+
+Writes n scene folders of m tiny PNG renders each (an enhancer payload in their
+`parent_metadata` text chunk, like the real ones) to a temp root, registers them
+into an in-memory mongomock database, or with db=mongodb://host:port into the
+database `scenedb_bench` of a local mongod (dropped before and after), and times
+`SceneManager.ids`, `Scene.imgs`, `SceneSet.imgs_for_query`, `SceneSet.compile`,
+`SceneManager.scan_all` and the app's grid builders `_html_scenes_search_and_op`
+and `_set_editor_filter_imgs` (skipped when the app does not import).
+
+Every op also counts its DB round trips (find / find_one / distinct / writes ...
+per collection call). The count must stay within a budget linear in n and m, an
+op going from one query per scene to one per image (N+1) or from one per op to
+one per scene exceeds it; the script then exits with 1. Results are written as
+JSON (commit, parameters, seconds and round trips per op) to stdout or out=FILE,
+diff them across commits.
+
+Usage:
+    python script/scenedb_bench.py [n=50] [m=8] [repeat=3] [db=mongodb://localhost:27017] [out=FILE]
+"""
+
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable
+
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from aidb.scene.db_connect import DBConnection
+from aidb.scene.scene import Scene
+from aidb.scene.scene_common import SceneDef
+from aidb.scene.scene_manager import SceneManager
+from aidb.scene.scene_set_manager import SceneSetManager
+from ait.tools.images import EMBED_MODEL_DEFAULT
+
+CONFIG = 'bench'
+DB_NAME = 'scenedb_bench'
+SET_NAME = 'bench'
+SIZE = 64  # px, renders are tiny: the DB paths are measured, not the codecs
+
+# collection calls that go to the server, each counted as one round trip
+ROUND_TRIPS = {
+    'aggregate',
+    'bulk_write',
+    'count_documents',
+    'delete_many',
+    'delete_one',
+    'distinct',
+    'find',
+    'find_one',
+    'find_one_and_update',
+    'insert_many',
+    'insert_one',
+    'replace_one',
+    'update_many',
+    'update_one',
+}
+
+# max round trips per op for n scenes of m images: (per op, per scene, per image), the counts
+# of today's code; lower one when an op gets cheaper. The scene grid reads every scene's images
+# three times (active / prototype split, cell), Scene() costs two finds.
+BUDGETS: dict[str, tuple[int, int, int]] = {
+    'ids': (1, 0, 0),
+    'scene_imgs': (0, 0, 1),
+    'set_imgs_for_query': (1, 3, 1),
+    'set_compile': (1, 3, 1),
+    'scan_all': (1, 2, 0),
+    'app_html_scenes_search_and_op': (3, 2, 3),
+    'app_set_editor_filter_imgs': (1, 3, 1),
+}
+
+
+class CountingCollection:
+    """Collection proxy counting the round trip calls into a shared Counter."""
+
+    def __init__(self, collection: Any, counter: Counter) -> None:
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._collection, name)
+        if name not in ROUND_TRIPS:
+            return attr
+
+        def counted(*args, **kwargs):
+            self._counter[f'{self._collection.name}.{name}'] += 1
+            return attr(*args, **kwargs)
+
+        return counted
+
+
+class CountingDatabase:
+    """Database proxy handing out CountingCollections (pymongo and mongomock alike)."""
+
+    def __init__(self, db: Any, counter: Counter) -> None:
+        self._db = db
+        self._counter = counter
+
+    def __getitem__(self, name: str) -> CountingCollection:
+        return CountingCollection(self._db[name], self._counter)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._db, name)
+
+
+def config_write(url_conf: Path, root: Path, host: str, port: int) -> None:
+    url = url_conf / 'aidb' / f'dbc_scenes_{CONFIG}.yaml'
+    url.parent.mkdir(parents=True)
+    url.write_text(
+        f'mongodb:\n  host: "{host}"\n  port: {port}\n  name: "{DB_NAME}"\n\n'
+        f'url:\n  root: "{root}"\n  thumbnail: "___thumbnails"\n  train: "___train"\n'
+        '  ait_caption: "___ait_caption"\n\n'
+        'size:\n  thumbnail: 64\n  train: 64\n'
+    )
+
+
+def dbc_connect(url_db: str | None, counter: Counter) -> DBConnection:
+    if url_db is None:
+        import mongomock
+
+        from aidb.scene.config_reader import ConfigReader
+
+        # pymongo >= 4.11 passes sort= to bulk update builders, mongomock 4.3 does not take it
+        builder = mongomock.collection.BulkOperationBuilder
+        add_update = builder.add_update
+        builder.add_update = lambda self, *args, sort=None, **kwargs: add_update(
+            self, *args, **kwargs
+        )
+
+        dbc = object.__new__(DBConnection)
+        dbc.config = ConfigReader(CONFIG, verbose=0)
+        dbc.client = None
+        dbc.db = mongomock.MongoClient().db
+        dbc._verbose = 0
+    else:
+        dbc = DBConnection(config=CONFIG, verbose=0)
+        dbc.client.drop_database(DB_NAME)
+    dbc.db = CountingDatabase(dbc.db, counter)
+    return dbc
+
+
+def render_synthetic(url: Path, scene: int, img: int) -> None:
+    payload = {
+        'schema_id': '1xlasm_enhancer.iteration.v4',
+        'scene_id': f'enh-{scene}',
+        'url': f'/renders/origin_{scene}.png',
+        'prompts': {'current': 0, 'entries': [f'scene {scene}, render {img}']},
+    }
+    info = PngInfo()
+    info.add_text('parent_metadata', json.dumps({'input_data': payload}))
+    color = (scene * 37 % 256, img * 53 % 256, 128)
+    Image.new('RGB', (SIZE, SIZE), color).save(url, pnginfo=info)
+
+
+def scenes_synthetic(scm: SceneManager, n: int, m: int) -> None:
+    """n registered scenes of m registered renders, thumbnails and fresh scan docs."""
+    im = scm.scene_image_manager()
+    collection = scm._dbc._get_collection(SceneDef.COLLECTION_IMAGES)
+    for i in range(n):
+        url = scm.url_scenes / f'scene_{i:05d}'
+        url.mkdir(parents=True)
+        urls = [url / f'render_{j:03d}.png' for j in range(m)]
+        for j, url_img in enumerate(urls):
+            render_synthetic(url_img, i, j)
+        scm.update_from_url(url)
+        ids = im.register_from_urls(urls)
+        for j, url_img in enumerate(urls):
+            # spread ratings, prototypes and captions so the filters have something to pick
+            fields = {
+                SceneDef.FIELD_RATING: SceneDef.RATING_INIT + (i + j) % 3,
+                SceneDef.FIELD_PROTOTYPE: i % 10 == 9,
+            }
+            if j % 2:
+                fields[SceneDef.FIELD_CAPTION] = f'caption {i} {j}'
+            collection.update_one(
+                {SceneDef.FIELD_OID: scm._dbc.to_oid(ids[str(url_img)])}, {'$set': fields}
+            )
+
+    # scene.update sets ratings and writes the thumbnails
+    scm.scenes_update()
+    # the embedding scan is fresh everywhere: scan_all runs its near-free sweep
+    scan = {
+        SceneDef.SCAN_PROP_EMBEDDING: {
+            SceneDef.FIELD_SCAN_MODEL: EMBED_MODEL_DEFAULT,
+            SceneDef.FIELD_SCAN_TS: SceneDef.now_ts(),
+        }
+    }
+    scm._dbc._get_collection(SceneDef.COLLECTION_SCENES).update_many(
+        {}, {'$set': {SceneDef.FIELD_SCAN: scan}}
+    )
+
+
+def app_ops(scm: SceneManager, ssm: SceneSetManager) -> dict[str, Callable[[], Any]] | str:
+    """The grid builders of a headless AIDBSceneApp, or why the app does not import."""
+    try:
+        from aidb.app.scene.app import AIDBSceneApp
+    except ImportError as e:
+        return f'app not importable: {e}'
+
+    app = object.__new__(AIDBSceneApp)
+    app._scm = scm
+    app._dbc = scm._dbc
+    app._ssm = ssm
+    sset = ssm.set_from_id_or_name(SET_NAME)
+    return {
+        'app_html_scenes_search_and_op': lambda: app._html_scenes_search_and_op(
+            None, None, 'info', SET_NAME, None
+        ),
+        'app_set_editor_filter_imgs': lambda: app._set_editor_filter_imgs(
+            sset, None, None, 'ignore', 'ignore', 'ignore', 'ignore', 'ignore', 'empty'
+        ),
+    }
+
+
+def timed(fn: Callable[[], Any], repeat: int, counter: Counter) -> dict[str, Any]:
+    seconds = []
+    for _ in range(repeat):
+        counter.clear()
+        t0 = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - t0)
+    return {
+        's_min': round(min(seconds), 6),
+        's_median': round(statistics.median(seconds), 6),
+        'queries': counter.total(),
+        'queries_by_call': dict(sorted(counter.items())),
+    }
+
+
+def commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def main() -> None:
+    n = 50
+    m = 8
+    repeat = 3
+    url_db = None
+    url_out = None
+    for arg in sys.argv[1:]:
+        key, _, value = arg.partition('=')
+        if key == 'n':
+            n = int(value)
+        elif key == 'm':
+            m = int(value)
+        elif key == 'repeat':
+            repeat = int(value)
+        elif key == 'db':
+            url_db = value
+        elif key == 'out':
+            url_out = Path(value)
+        else:
+            print(f'unknown arg: {arg}', file=sys.stderr)
+            sys.exit(1)
+
+    results: dict[str, Any] = {
+        'commit': commit(),
+        'python': platform.python_version(),
+        'db': url_db or 'mongomock',
+        'n': n,
+        'm': m,
+        'repeat': repeat,
+        'ops': {},
+        'over_budget': [],
+    }
+    counter: Counter = Counter()
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(sys.stderr):
+        tmp = Path(tmp)
+        host, _, port = (url_db or 'mongodb://localhost:27017').rpartition(':')
+        config_write(tmp / 'conf', tmp / 'scenes', host, int(port))
+        os.environ['CONF_AIT'] = str(tmp / 'conf')
+        dbc = dbc_connect(url_db, counter)
+        try:
+            scm = SceneManager(dbc=dbc)
+            ssm = SceneSetManager(dbc=dbc)
+            t0 = time.perf_counter()
+            scenes_synthetic(scm, n, m)
+            ssm.make_new(SET_NAME)
+            results['s_setup'] = round(time.perf_counter() - t0, 3)
+
+            sset = ssm.set_from_id_or_name(SET_NAME)
+            scenes = [Scene(scm, id) for id in scm.ids]
+            ops: dict[str, Callable[[], Any]] = {
+                'ids': lambda: list(scm.ids),
+                'scene_imgs': lambda: [scene.imgs for scene in scenes],
+                'set_imgs_for_query': lambda: list(sset.imgs_for_query(sset.query_img)),
+                'set_compile': sset.compile,
+                'scan_all': scm.scan_all,
+            }
+            app = app_ops(scm, ssm)
+            if isinstance(app, str):
+                results['skipped'] = app
+            else:
+                ops |= app
+
+            for name, fn in ops.items():
+                result = timed(fn, repeat, counter)
+                per_op, per_scene, per_img = BUDGETS[name]
+                result['budget'] = per_op + per_scene * n + per_img * n * m
+                results['ops'][name] = result
+                if result['queries'] > result['budget']:
+                    results['over_budget'].append(name)
+        finally:
+            if url_db is not None:
+                dbc.client.drop_database(DB_NAME)
+
+    text = json.dumps(results, indent=2)
+    if url_out is None:
+        print(text)
+    else:
+        url_out.write_text(text + '\n')
+    for name in results['over_budget']:
+        op = results['ops'][name]
+        print(f'{name}: {op["queries"]} round trips, budget {op["budget"]}', file=sys.stderr)
+    if results['over_budget']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
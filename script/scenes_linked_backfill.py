@@ -9,14 +9,23 @@ url-resolved origin DB scene into `scenes_linked.ids_scene_db.sourced`
 re-runnable). Without this, `scene_adopt_img` payload matching starts blind and
 every adoption spawns a new scene.
 
+Scans go through the `scene_links` index and the metadata cache: a rerun only
+reads images that are new or changed since the last one. Scenes are scanned by
+a process pool (`SceneManager.scenes_links_backfill`, header-only metadata
+reads, one bulk write per shard); progress is checkpointed under
+~/.cache/ait, so an interrupted run picks up where it stopped.
+
 Usage:
-    python script/scenes_linked_backfill.py [config=test|prod] [dry]
+    python script/scenes_linked_backfill.py [config=test|prod] [dry] [processes=N]
 
-    config  DB profile (default: test — pass config=prod for the real run)
-    dry     scan and report only, no DB writes
+    config     DB profile (default: test — pass config=prod for the real run)
+    dry        scan and report only, no scene doc writes (the link index is still
+               updated: it caches the scans, the real run skips the images read)
+    processes  worker processes (default: cpu count, 1 = no pool)
 """
 
 import sys
+from pathlib import Path
 
 from aidb import SceneConfig, SceneDef, SceneManager
 
@@ -24,6 +33,7 @@ from aidb import SceneConfig, SceneDef, SceneManager
 def main() -> None:
     config: SceneConfig = 'test'
     dry = False
+    processes: int | None = None
     for arg in sys.argv[1:]:
         if arg.startswith('config='):
             value = arg.split('=', 1)[1]
@@ -33,31 +43,37 @@ def main() -> None:
             config = value  # type: ignore[assignment]
         elif arg == 'dry':
             dry = True
+        elif arg.startswith('processes='):
+            value = arg.split('=', 1)[1]
+            if not value.isdigit():
+                print(f'invalid processes: {value}', file=sys.stderr)
+                sys.exit(1)
+            processes = int(value)
         else:
             print(f'unknown arg: {arg}', file=sys.stderr)
             sys.exit(1)
 
     scm = SceneManager(config=config, verbose=0)
-    n_scenes = 0
-    n_linked = 0
-    n_sourced = 0
-    for scene_id in scm.ids:
-        n_scenes += 1
-        if dry:
-            found = scm.scene_scan_links(scene_id)
-        else:
-            found = scm.scene_seed_enh_links(scene_id)
+    url_checkpoint = Path.home() / '.cache' / 'ait' / f'scenes_linked_backfill_{config}.json'
+    counts = {'scenes': 0, 'linked': 0, 'sourced': 0}
+
+    def report(scene_id: str, found: dict[str, list[str]]) -> None:
+        counts['scenes'] += 1
         enh = found[SceneDef.FIELD_IDS_SCENE_ENH]
         sourced = found[SceneDef.FIELD_LINKED_SOURCED]
         if enh or sourced:
-            n_linked += 1
-            n_sourced += 1 if sourced else 0
+            counts['linked'] += 1
+            counts['sourced'] += 1 if sourced else 0
             print(f'{scene_id}: enh={enh} sourced={sourced}')
 
-    mode = 'DRY RUN — no writes' if dry else 'written'
+    scm.scenes_links_backfill(
+        dry=dry, processes=processes, url_checkpoint=url_checkpoint, on_scene=report
+    )
+
+    mode = 'DRY RUN — no scene doc writes' if dry else 'written'
     print(
-        f'{n_scenes} scenes scanned, {n_linked} carry enhancer renders, '
-        f'{n_sourced} resolve an origin scene ({mode})'
+        f'{counts["scenes"]} scenes scanned, {counts["linked"]} carry enhancer renders, '
+        f'{counts["sourced"]} resolve an origin scene ({mode})'
     )
 
 
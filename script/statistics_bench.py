@@ -0,0 +1,96 @@
+"""Benchmark of the legacy `Statistics` neighborhood / distance paths on synthetic data.
+
+Builds n synthetic image documents (sparse TAGS_FOCUS probabilities in `tags.tags_wd`),
+turns them into the focus-vector matrix and times `neighborhood_from_matrix` and
+`dist_focus_vectors`. Each n runs twice: all images tagged, and tie-heavy with a
+fraction `untagged` of all-zero vectors (untagged images), whose distance ties make
+every other zero row a neighbor candidate. For n <= legacy the old pairwise python
+loop is timed as well and its result compared with the vectorized one.
+
+Usage:
+    python script/statistics_bench.py [n=1000,10000,50000] [size=10] [legacy=1000] [untagged=0.2]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from aidb.dbstatistics import Statistics
+from aidb.tagger_defines import TaggerDef
+
+
+def docs_synthetic(n: int, seed: int = 0, untagged: float = 0.0) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    tags = list(TaggerDef.TAGS_FOCUS.keys())
+    docs = []
+    for i in range(n):
+        if rng.random() < untagged:
+            docs.append({'_id': f'{i:024x}'})
+            continue
+        picked = rng.choice(len(tags), size=rng.integers(3, 15), replace=False)
+        tags_wd = {tags[j]: round(float(rng.random()), 4) for j in picked}
+        docs.append({'_id': f'{i:024x}', 'tags': {'tags_wd': tags_wd}})
+    return docs
+
+
+def neighborhood_legacy(ids: list[str], X: np.ndarray, size: int) -> dict[str, dict[str, float]]:
+    ret = {}
+    for i, id_i in enumerate(ids):
+        dists = {
+            id_j: Statistics.dist_focus_vector(X[i], X[j]) for j, id_j in enumerate(ids) if i != j
+        }
+        ret[id_i] = dict(sorted(dists.items(), key=lambda item: item[1])[:size])
+    return ret
+
+
+def main() -> None:
+    ns = [1000, 10000, 50000]
+    size = 10
+    legacy = 1000
+    untagged = 0.2
+    for arg in sys.argv[1:]:
+        key, _, value = arg.partition('=')
+        if key == 'n':
+            ns = [int(v) for v in value.split(',')]
+        elif key == 'size':
+            size = int(value)
+        elif key == 'legacy':
+            legacy = int(value)
+        elif key == 'untagged':
+            untagged = float(value)
+        else:
+            print(f'unknown arg: {arg}', file=sys.stderr)
+            sys.exit(1)
+
+    for n, fraction in [(n, fraction) for n in ns for fraction in (0.0, untagged)]:
+        docs = docs_synthetic(n, untagged=fraction)
+        ids = [doc['_id'] for doc in docs]
+
+        t0 = time.perf_counter()
+        X = Statistics.focus_vectors_from_docs(docs)
+        t_matrix = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        Statistics.dist_focus_vectors(X[0], X)
+        t_dist = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        neighborhood = Statistics.neighborhood_from_matrix(ids, X, size=size)
+        t_neighborhood = time.perf_counter() - t0
+
+        line = (
+            f'n={n}, untagged {fraction:.0%}: matrix {t_matrix:.3f}s, dist_img_list {t_dist * 1000:.1f}ms, '
+            f'neighborhood {t_neighborhood:.2f}s'
+        )
+        if n <= legacy:
+            t0 = time.perf_counter()
+            expected = neighborhood_legacy(ids, X, size)
+            t_legacy = time.perf_counter() - t0
+            same = all(list(expected[id].items()) == list(neighborhood[id].items()) for id in ids)
+            line += f', legacy loop {t_legacy:.2f}s, equal: {same}'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""CPU benchmark of the legacy WD14 tagger: per-image `tags()` vs `tags_batch()`.
+
+Without `model=`/`labels=` a tiny onnx model (dynamic batch, global mean pool +
+linear + sigmoid) is exported to a temp dir, so the run measures the pipeline
+around the model rather than the model itself. There the decode / resize
+dominates: `tags_batch()` only wins by preparing images on several cores while
+the model runs, on a single core both are about even. With the real model
+(`model=`, `labels=`) the batched model runs add their own gain.
+
+Usage:
+    python script/tagger_wd_bench.py [n=64] [size=1024] [batch=16] [threads=0]
+                                     [model=<onnx>] [labels=<csv>]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from aidb.tagger import TaggerWD
+
+N_TAGS = 64
+SIZE_MODEL = 448
+
+
+def export_tiny(url: Path) -> tuple[Path, Path]:
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+    weight = numpy_helper.from_array(
+        rng.normal(0.0, 0.01, (3, N_TAGS)).astype(np.float32), name='weight'
+    )
+    graph = helper.make_graph(
+        [
+            helper.make_node('ReduceMean', ['input'], ['pooled'], axes=[1, 2], keepdims=0),
+            helper.make_node('MatMul', ['pooled', 'weight'], ['logits']),
+            helper.make_node('Sigmoid', ['logits'], ['output']),
+        ],
+        'tiny_wd',
+        [
+            helper.make_tensor_value_info(
+                'input', TensorProto.FLOAT, ['N', SIZE_MODEL, SIZE_MODEL, 3]
+            )
+        ],
+        [helper.make_tensor_value_info('output', TensorProto.FLOAT, ['N', N_TAGS])],
+        initializer=[weight],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 17)], ir_version=8)
+    url_model = url / 'model.onnx'
+    onnx.save(model, url_model)
+
+    url_labels = url / 'selected_tags.csv'
+    lines = ['tag_id,name,category,count']
+    lines += [f'{i},tag_{i},{9 if i < 4 else 0},0' for i in range(N_TAGS)]
+    url_labels.write_text('\n'.join(lines) + '\n')
+    return url_model, url_labels
+
+
+def main() -> None:
+    args = {'n': '64', 'size': '1024', 'batch': '16', 'threads': '0'}
+    for arg in sys.argv[1:]:
+        key, _, value = arg.partition('=')
+        if key not in ('n', 'size', 'batch', 'threads', 'model', 'labels'):
+            print(f'unknown arg: {arg}', file=sys.stderr)
+            sys.exit(1)
+        args[key] = value
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if 'model' in args and 'labels' in args:
+            url_model, url_labels = Path(args['model']), Path(args['labels'])
+        else:
+            url_model, url_labels = export_tiny(Path(tmp))
+
+        threads = int(args['threads'])
+        tagger = TaggerWD(url_model, url_labels, intra_op_threads=threads)
+        rng = np.random.default_rng(0)
+        size = int(args['size'])
+        imgs = [
+            Image.fromarray(rng.integers(0, 255, (size, size * 3 // 4, 4), dtype=np.uint8), 'RGBA')
+            for _ in range(int(args['n']))
+        ]
+
+        t0 = time.perf_counter()
+        single = [tagger.tags(img) for img in imgs]
+        t_single = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        batched = tagger.tags_batch(imgs, batch_size=int(args['batch']))
+        t_batch = time.perf_counter() - t0
+
+    same = all(a['tags_sorted'] == b['tags_sorted'] for a, b in zip(single, batched, strict=True))
+    print(
+        f'{len(imgs)} images {size}px: tags() {t_single:.2f}s, '
+        f'tags_batch() {t_batch:.2f}s ({t_single / t_batch:.1f}x), same tags: {same}'
+    )
+
+
+if __name__ == '__main__':
+    main()
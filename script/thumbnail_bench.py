@@ -0,0 +1,103 @@
+"""Benchmark of scene thumbnail generation at typical SDXL / Flux resolutions.
+
+Writes n synthetic renders per resolution and format (PNG, JPEG) to a temp
+folder and times, per image, the old full decode + thumbnail() against
+`thumbnail_to_url` (JPEG draft / integer reduce before the resample, atomic
+write), then the whole set serially against a ThumbnailPool.
+
+Usage:
+    python script/thumbnail_bench.py [n=8] [size=256] [processes=N] [res=1024x1024,...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from aidb.scene.scene_thumbs import ThumbnailPool
+from ait.tools.images import thumbnail_to_url
+
+# SDXL buckets, Flux defaults, a 2x upscale
+RESOLUTIONS = [(1024, 1024), (832, 1216), (1216, 832), (1344, 768), (1536, 1536), (2048, 2048)]
+
+
+def render_synthetic(url: Path, width: int, height: int, seed: int) -> None:
+    # smooth gradients plus grain, so the encoders work about as hard as on a render
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack(
+        [np.sin(x / (50 + 10 * c) + seed) * np.cos(y / (70 + 10 * c)) for c in range(3)], -1
+    )
+    arr = (base * 100 + 128 + rng.normal(0, 6, (height, width, 3))).clip(0, 255)
+    Image.fromarray(arr.astype(np.uint8)).save(url, quality=92)
+
+
+def thumbnail_full(url_from: Path, url_to: Path, size: int) -> None:
+    with Image.open(url_from) as pil:
+        pil.load()
+        pil.thumbnail((size, size), reducing_gap=None)
+        pil.save(url_to)
+
+
+def timed(fn, urls: list[Path], dir_out: Path, size: int) -> float:
+    t0 = time.perf_counter()
+    for url in urls:
+        fn(url, dir_out / f'{url.stem}.png', size)
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    n = 8
+    size = 256
+    processes = os.cpu_count() or 1
+    resolutions = RESOLUTIONS
+    for arg in sys.argv[1:]:
+        key, _, value = arg.partition('=')
+        if key == 'n':
+            n = int(value)
+        elif key == 'size':
+            size = int(value)
+        elif key == 'processes':
+            processes = int(value)
+        elif key == 'res':
+            resolutions = [tuple(int(v) for v in r.split('x')) for r in value.split(',')]
+        else:
+            print(f'unknown arg: {arg}', file=sys.stderr)
+            sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        dir_out = tmp / 'thumbs'
+        dir_out.mkdir()
+        urls_all = []
+        for suffix in ('png', 'jpg'):
+            for width, height in resolutions:
+                urls = [tmp / f'{width}x{height}_{i}.{suffix}' for i in range(n)]
+                for i, url in enumerate(urls):
+                    render_synthetic(url, width, height, seed=i)
+                urls_all += urls
+                t_full = timed(thumbnail_full, urls, dir_out, size) / n
+                t_new = timed(thumbnail_to_url, urls, dir_out, size) / n
+                print(
+                    f'{suffix} {width}x{height}: full decode {t_full * 1000:.1f}ms, '
+                    f'draft/reduce {t_new * 1000:.1f}ms ({t_full / t_new:.1f}x)'
+                )
+
+        t_serial = timed(thumbnail_to_url, urls_all, dir_out, size)
+        t0 = time.perf_counter()
+        with ThumbnailPool(processes=processes, verbose=0) as pool:
+            for url in urls_all:
+                pool.submit(url, dir_out / f'{url.stem}_pool.png', size)
+        t_pool = time.perf_counter() - t0
+        print(
+            f'{len(urls_all)} thumbnails: serial {t_serial:.2f}s, '
+            f'pool of {processes} {t_pool:.2f}s ({t_serial / t_pool:.1f}x)'
+        )
+
+
+if __name__ == '__main__':
+    main()
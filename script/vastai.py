@@ -11,6 +11,12 @@ import urllib.request
 from pathlib import Path
 from urllib.parse import urlparse, parse_qs, unquote
 
+try:
+    # segmented, resumable downloads when the ait package is on the path (and configured)
+    from ait.install.download import download
+except (ImportError, KeyError):
+    download = None
+
 
 class DownloadMethod(Enum):
     Hugging = auto()
@@ -63,6 +69,7 @@ class ModelInst:
     token_cai = os.environ.get("CAI_TOKEN", "")
 
     CHUNK_SIZE: Final = 1638400
+    SEGMENTS: Final = 8  # concurrent Range requests per file (ait download only)
     USER_AGENT: Final = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"  # noqa
 
     def __init__(
@@ -108,6 +115,14 @@ class ModelInst:
         return Path(link)
 
     def download_wget(self, url: str, fname: str):
+        if download is not None:
+            try:
+                download(url, fname, segments=self.SEGMENTS)
+            except Exception as e:
+                print(f"Url download went wrong: {url}")
+                print(e)
+            return
+
         resp = requests.get(url, stream=True)
         total = int(resp.headers.get("content-length", 0))
 
@@ -180,6 +195,12 @@ class ModelInst:
 
         output_file = os.path.join(opath, filename)
 
+        if download is not None:
+            response.close()
+            download(redirect_url, output_file, segments=self.SEGMENTS)
+            print(f"Download completed. File saved as: {filename}")
+            return
+
         with open(output_file, "wb") as f:
             downloaded = 0
             start_time = time.time()
@@ -1,17 +1,27 @@
-from .scene import (
-    AdoptOutcome,
-    SceneDef,
-    Sceneical,
-    SceneConfig,
-    SceneManager,
-    Scene,
-    SceneSetManager,
-    SceneSet,
-    SceneImageManager,
-    SceneImage,
-    HFDataset,
-    DBConnection,
-)
+"""aidb: scene database and its apps. The scene API names resolve lazily
+through `aidb.scene` (PEP 562), so `import aidb` stays cheap."""
+
+from typing import TYPE_CHECKING, Any
+
+from . import scene as _scene
+
+if TYPE_CHECKING:
+    from .scene import (
+        AdoptOutcome,
+        DBConnection,
+        HFDataset,
+        Scene,
+        SceneConfig,
+        SceneDef,
+        SceneImage,
+        SceneImageManager,
+        Sceneical,
+        SceneJournal,
+        SceneManager,
+        SceneSet,
+        SceneSetManager,
+        SceneWatcher,
+    )
 
 __all__ = [
     'AdoptOutcome',
@@ -26,4 +36,18 @@ __all__ = [
     'SceneImage',
     'HFDataset',
     'DBConnection',
+    'SceneJournal',
+    'SceneWatcher',
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in __all__:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(_scene, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
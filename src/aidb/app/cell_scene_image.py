@@ -1190,8 +1190,10 @@ class AppSceneImageCell:
 
         Behaviour:
           - Hidden by default; shown by JS callback after the server returns
-            the image base64 (and, for registered targets, the current
-            caption + image id stored on the overlay's dataset).
+            the URL of a screen-sized rendition (and, for registered targets,
+            the current caption + image id stored on the overlay's dataset).
+          - 'original' button -> swaps in the full-size original, which is
+            only downloaded on this request.
           - Click on the overlay BACKGROUND -> if the overlay holds a
             registered image and the caption was edited, the value is
             persisted via the cmd-bus (`db_query` / set_caption) and then
@@ -1255,7 +1257,7 @@ class AppSceneImageCell:
             f"if (o) {{ o.style.display = 'none'; "
             f"o.dataset.targetType = ''; o.dataset.imageId = '';"
             f"o.dataset.setId = ''; }}"
-            f"if (i) {{ i.src = ''; }}"
+            f"if (i) {{ i.src = ''; i.dataset.full = ''; }}"
             f"if (c) {{ c.value = ''; }}"
             f"if (p) {{ p.checked = false; }}"
             f"if (x) {{ x.checked = false; }}"
@@ -1283,7 +1285,7 @@ class AppSceneImageCell:
             f"if (o) {{ o.style.display = 'none'; "
             f"o.dataset.targetType = ''; o.dataset.imageId = '';"
             f"o.dataset.setId = ''; }}"
-            f"if (i) {{ i.src = ''; }}"
+            f"if (i) {{ i.src = ''; i.dataset.full = ''; }}"
             f"if (c) {{ c.value = ''; }}"
             f"const p2 = document.getElementById('{prototype_id}');"
             f"if (p2) {{ p2.checked = false; }}"
@@ -1291,6 +1293,14 @@ class AppSceneImageCell:
             f"if (x2) {{ x2.checked = false; }}"
         )
 
+        # ---- original on demand: swap the screen rendition for the file ---
+        original_js = (
+            f"event.stopPropagation();"
+            f"const i = document.getElementById('{img_id}');"
+            f"if (i && i.dataset.full && i.src !== i.dataset.full) {{"
+            f"  i.src = i.dataset.full; }}"
+        )
+
         # The textarea also gets stopPropagation on keystrokes so e.g. Esc
         # / arrow keys typed during editing don't bubble up unexpectedly.
         textarea_keydown_js = "event.stopPropagation();"
@@ -1373,7 +1383,8 @@ class AppSceneImageCell:
                 gap: 8px;
             }}
             #{overlay_id} .simg-lightbox-prototype-toggle,
-            #{overlay_id} .simg-lightbox-exclude-toggle {{
+            #{overlay_id} .simg-lightbox-exclude-toggle,
+            #{overlay_id} .simg-lightbox-original {{
                 display: inline-flex;
                 align-items: center;
                 gap: 6px;
@@ -1388,7 +1399,8 @@ class AppSceneImageCell:
                 line-height: 1;
             }}
             #{overlay_id} .simg-lightbox-prototype-toggle:hover,
-            #{overlay_id} .simg-lightbox-exclude-toggle:hover {{
+            #{overlay_id} .simg-lightbox-exclude-toggle:hover,
+            #{overlay_id} .simg-lightbox-original:hover {{
                 background-color: rgba(70,70,70,0.95);
             }}
             #{overlay_id} .simg-lightbox-prototype-toggle input[type="checkbox"],
@@ -1421,6 +1433,9 @@ class AppSceneImageCell:
                            onchange="{exclude_change_js}">
                     exclude
                 </label>
+                <span class="simg-lightbox-original"
+                      title="load the full-size original"
+                      onclick="{original_js}">original</span>
             </div>
             <div class="{content_cls}">
                 <img id="{img_id}" src="" alt="Full Size Image">
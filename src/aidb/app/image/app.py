@@ -7,6 +7,7 @@ from aidb.image import Image
 from aidb.set import SetImg
 from aidb.tagger import TAGS_CUSTOM
 from aidb.app.cell_image import AppImageCell
+from aidb.app.lightbox import DerivedImageCache, app_kwargs_cached
 from aidb.app.tab_search_and_rate import AppTabSearchAndRate
 from typing import Final, Optional, List, Tuple
 import html
@@ -36,6 +37,8 @@ class AIDBGradioApp:
         self._db_manager = db_manager
         self._query_handler = Query(db_manager)
         self._statistics_handler = Statistics(db_manager)
+        # the modal shows screen-sized renditions served by URL
+        self._lightbox = DerivedImageCache()
         print('AIDBGradioApp initialized with DBManager, Query, and Statistics references.')
 
         # hidden update triggers
@@ -288,7 +291,7 @@ class AIDBGradioApp:
                 ],  # Inputs are the data buses
                 None,  # No outputs to Gradio components for this JS part
                 js="""
-                (img_base64, details_json_string) => {
+                (img_url, details_json_string) => {
                     console.log('JS: Received data for modal. Updating modal content.');
                     const details = JSON.parse(details_json_string); // Parse the JSON string from the data bus
 
@@ -299,11 +302,11 @@ class AIDBGradioApp:
                             <p>${details.error}</p>
                         `;
                     } else {
-                        document.getElementById('fullPageImage').src = 'data:image/png;base64,' + img_base64;
+                        document.getElementById('fullPageImage').src = img_url;
                         document.getElementById('fullPageImageDetails').innerHTML = `
                             <h4>Image Details:</h4>
                             <p><strong>ID:</strong> ${details.id}</p>
-                            <p><strong>Full Path:</strong> ${details.full_path}</p>
+                            <p><strong>Full Path:</strong> <a href="${details.full_url}" target="_blank">${details.full_path}</a></p>
                             <p><strong>Rating:</strong> ${details.rating}</p>
                             <p><strong>Category:</strong> ${details.category}</p>
                             <p><strong>Dimensions:</strong> ${details.dimensions_width}x${details.dimensions_height} ${details.dimensions_unit}</p>
@@ -760,7 +763,8 @@ class AIDBGradioApp:
     def _get_full_image_data_for_modal(self, image_id: str) -> Tuple[str, str, str]:
         """
         Fetches full image data for the modal display.
-        Returns a raw base64 string and a JSON-serialized string of the image details.
+        Returns the URL of a screen-sized rendition and a JSON-serialized string of the image
+        details (with the URL of the original as full_url).
         These strings are intended to be placed in hidden Textbox components (data buses).
         """
         print(f'DEBUG: _get_full_image_data_for_modal called for image ID: {image_id}')
@@ -786,8 +790,9 @@ class AIDBGradioApp:
                 {'error': f"Image with ID '{image_id}' not found in the database."}
             )
 
-        pil_img = img_obj.pil
-        if pil_img is None:
+        url = img_obj.get_full_path()
+        urls = self._lightbox.urls(url) if url is not None else None
+        if urls is None:
             print(f'ERROR: Could not load PIL image file for image ID: {image_id}.')
             return '', json.dumps({'error': f'Could not load image file for ID: {image_id}.'})  # pyright: ignore
 
@@ -800,8 +805,6 @@ class AIDBGradioApp:
         if img_caption is None:
             img_caption = ''
 
-        full_img_base64 = AppImageCell._pil_to_base64(pil_img)
-
         tags_wd = image_data.get('tags', {}).get('tags_wd', {})
         sorted_tags_wd = sorted(tags_wd.items(), key=lambda item: item[1], reverse=True)
         # Escape tag names to prevent potential HTML injection issues
@@ -811,7 +814,8 @@ class AIDBGradioApp:
 
         image_details = {
             'id': str(img_obj.id),
-            'full_path': str(img_obj.get_full_path()) if img_obj.get_full_path() else 'N/A',
+            'full_path': str(url),
+            'full_url': urls['src_full'],
             'rating': img_obj.data.get('rating', 'N/A'),
             'category': img_obj.data.get('category', 'N/A'),
             'dimensions_width': image_data.get('dimensions', {}).get('width', 'N/A'),
@@ -823,7 +827,7 @@ class AIDBGradioApp:
             'caption': img_caption,
         }
 
-        return full_img_base64, json.dumps(image_details)  # pyright: ignore
+        return urls['src'], json.dumps(image_details)  # pyright: ignore
 
     def _update_image_rating(
         self,
@@ -937,6 +941,7 @@ class AIDBGradioApp:
 
     def launch(self, **kwargs):
         print('Launching Gradio application...')
+        kwargs['app_kwargs'] = app_kwargs_cached(self._lightbox, kwargs.get('app_kwargs'))
         self.interface.launch(**kwargs)
 
 
@@ -0,0 +1,216 @@
+"""
+Lightbox images served by URL instead of base64 through the Gradio JSON channel.
+
+The modal first shows a screen-sized progressive JPEG (or WebP) from a derived
+image cache; the original is only fetched when asked for. Derived files are
+named after the source path, size, mtime and render settings, so their URLs
+never change content and are served with a long-lived immutable
+Cache-Control header; originals get a short private one.
+
+Only the derived cache root is a Gradio static path. An original is served by
+OriginalFileMiddleware under an opaque token, and only after the cache
+validated it (an image suffix, a regular file below the allowed roots, a
+successful decode): its folder's other files are never reachable.
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Final, Iterable, Literal, Optional
+from urllib.parse import quote, unquote
+
+import gradio as gr
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+from ait.tools.files import SUFFIXES_IMG
+
+URL_FILE: Final = '/gradio_api/file='
+URL_ORIGINAL: Final = '/lightbox/original/'
+SCREEN_MAX: Final = 2048  # longest side of the derived image
+QUALITY: Final = 85
+CACHE_CONTROL_DERIVED: Final = 'public, max-age=31536000, immutable'
+CACHE_CONTROL_FILE: Final = 'private, max-age=3600'
+
+
+def file_url(url: str | Path) -> str:
+    """URL under which Gradio serves a local file (its directory must be a static path)."""
+    return URL_FILE + quote(str(Path(url).resolve()))
+
+
+_served: set[Path] = set()
+
+
+def serve_paths(*urls: str | Path) -> None:
+    """Lets Gradio serve files below urls (registered once each, effective at runtime)."""
+    new = [Path(url).resolve() for url in urls if Path(url).resolve() not in _served]
+    if new:
+        _served.update(new)
+        gr.set_static_paths(paths=new)
+
+
+class DerivedImageCache:
+    """
+    Screen-sized renditions of local images, created on first request.
+    fmt 'JPEG' writes progressive JPEGs (the image builds up while loading), 'WEBP' smaller files.
+    Originals are only handed out for image files below roots (anywhere if None).
+    """
+
+    def __init__(
+        self,
+        root: Optional[str | Path] = None,
+        max_side: int = SCREEN_MAX,
+        fmt: Literal['JPEG', 'WEBP'] = 'JPEG',
+        quality: int = QUALITY,
+        roots: Optional[Iterable[str | Path]] = None,
+    ) -> None:
+        if root is None:
+            root = Path.home() / '.cache' / 'aidb' / 'lightbox'
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_side = max_side
+        self.fmt = fmt
+        self.quality = quality
+        self.roots = None if roots is None else [Path(r).resolve() for r in roots]
+        self._originals: dict[str, Path] = {}  # token -> validated original
+
+    def _url_derived(self, url: Path) -> Path:
+        st = url.stat()
+        key = f'{url.resolve()}:{st.st_size}:{st.st_mtime_ns}:{self.max_side}:{self.quality}'
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        suffix = '.jpg' if self.fmt == 'JPEG' else '.webp'
+        return self.root / digest[:2] / f'{digest}{suffix}'
+
+    def screen(self, url: str | Path) -> Optional[Path]:
+        """The screen-sized rendition of url (created if missing), None if url is unreadable."""
+        url = Path(url)
+        try:
+            url_derived = self._url_derived(url)
+        except OSError:
+            return None
+        if url_derived.exists():
+            return url_derived
+
+        try:
+            with PILImage.open(url) as pil:
+                # JPEG sources decode directly at a reduced scale
+                pil.draft('RGB', (self.max_side, self.max_side))
+                img = ImageOps.exif_transpose(pil)
+                img.thumbnail((self.max_side, self.max_side), PILImage.Resampling.LANCZOS)
+                if img.mode != 'RGB':
+                    img = img.convert('RGB')
+                url_derived.parent.mkdir(parents=True, exist_ok=True)
+                tmp = url_derived.with_name(
+                    f'{url_derived.name}.{os.getpid()}.{threading.get_ident()}.tmp'
+                )
+                if self.fmt == 'JPEG':
+                    img.save(tmp, 'JPEG', quality=self.quality, progressive=True, optimize=True)
+                else:
+                    img.save(tmp, 'WEBP', quality=self.quality, method=4)
+                os.replace(tmp, url_derived)
+        except OSError as e:
+            print(f'ERROR: lightbox derive [{url}]: {e}')
+            return None
+        return url_derived
+
+    def allowed(self, url: str | Path) -> bool:
+        """True if url is a regular image file below the roots."""
+        url = Path(url).resolve()
+        if url.suffix not in SUFFIXES_IMG or not url.is_file():
+            return False
+        return self.roots is None or any(url.is_relative_to(root) for root in self.roots)
+
+    def urls(self, url: str | Path) -> Optional[dict[str, str]]:
+        """
+        {'src': screen-sized URL, 'src_full': original URL} for url, None if url is not an allowed
+        image or unreadable.
+        """
+        url = Path(url)
+        if not self.allowed(url):
+            print(f'ERROR: lightbox refused [{url}]: not an image below {self.roots}')
+            return None
+        url_screen = self.screen(url)
+        if url_screen is None:
+            return None
+        serve_paths(self.root)
+        # the rendition's content key is the token: a changed original gets a new URL
+        token = f'{url_screen.stem}{url.suffix.lower()}'
+        self._originals[token] = url.resolve()
+        return {'src': file_url(url_screen), 'src_full': URL_ORIGINAL + token}
+
+    def original(self, token: str) -> Optional[Path]:
+        """The original urls() handed out under token, None if unknown or no longer allowed."""
+        url = self._originals.get(token)
+        if url is None or not self.allowed(url):
+            return None
+        return url
+
+
+class CacheControlMiddleware:
+    """
+    ASGI middleware setting Cache-Control on Gradio file responses: immutable for files below
+    the derived cache root, a short private max-age for every other served file.
+    Added via `launch(app_kwargs={'middleware': [Middleware(CacheControlMiddleware, ...)]})`.
+    """
+
+    def __init__(self, app, root_derived: str | Path) -> None:
+        self.app = app
+        self.prefix_derived = URL_FILE + str(Path(root_derived).resolve())
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(URL_FILE):
+            await self.app(scope, receive, send)
+            return
+        path = unquote(scope['path'])
+        if path.startswith(self.prefix_derived + '/'):
+            value = CACHE_CONTROL_DERIVED.encode()
+        else:
+            value = CACHE_CONTROL_FILE.encode()
+
+        async def send_cached(message):
+            if message['type'] == 'http.response.start' and message['status'] in (200, 206, 304):
+                headers = [
+                    (k, v) for k, v in message.get('headers', []) if k.lower() != b'cache-control'
+                ]
+                message = {**message, 'headers': headers + [(b'cache-control', value)]}
+            await send(message)
+
+        await self.app(scope, receive, send_cached)
+
+
+class OriginalFileMiddleware:
+    """
+    ASGI middleware serving the originals of a DerivedImageCache under URL_ORIGINAL + token
+    (GET / HEAD, short private Cache-Control); unknown tokens get a 404. Every other request
+    passes through.
+    """
+
+    def __init__(self, app, cache: DerivedImageCache) -> None:
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(URL_ORIGINAL):
+            await self.app(scope, receive, send)
+            return
+        from starlette.responses import FileResponse, Response
+
+        url = self.cache.original(scope['path'][len(URL_ORIGINAL) :])
+        if url is None or scope.get('method', 'GET') not in ('GET', 'HEAD'):
+            response = Response(status_code=404)
+        else:
+            response = FileResponse(url, headers={'cache-control': CACHE_CONTROL_FILE})
+        await response(scope, receive, send)
+
+
+def app_kwargs_cached(cache: DerivedImageCache, app_kwargs: Optional[dict] = None) -> dict:
+    """launch() app_kwargs with the Cache-Control and original file middlewares appended."""
+    from starlette.middleware import Middleware
+
+    app_kwargs = dict(app_kwargs or {})
+    middleware = list(app_kwargs.get('middleware', []))
+    middleware.append(Middleware(CacheControlMiddleware, root_derived=cache.root))
+    middleware.append(Middleware(OriginalFileMiddleware, cache=cache))
+    app_kwargs['middleware'] = middleware
+    return app_kwargs
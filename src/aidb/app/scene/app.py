@@ -10,10 +10,10 @@ from aidb import SceneManager, SceneDef
 from aidb.scene.scene_set_manager import SceneSetManager
 from aidb.app.cell_scene import AppSceneCell
 from aidb.app.cell_scene_image import AppSceneImageCell, set_active_skin
-from aidb.app.html import AppHtml, AppOpMmode, AppHelper, HtmlHelper
+from aidb.app.html import AppHtml, AppOpMmode, AppHelper
+from aidb.app.lightbox import DerivedImageCache, app_kwargs_cached
 
 from ait.tools.files import imgs_from_url
-from ait.tools.images import image_from_url
 
 
 class AIDBSceneApp:
@@ -43,6 +43,10 @@ class AIDBSceneApp:
         from aidb.app.tab_penis_mask import PenisMaskTab
         self._penis_mask_tab = PenisMaskTab(self._scm)
 
+        # lightbox images are served by URL from screen-sized renditions; originals (the
+        # unregistered target is a client given path) only below the scene root
+        self._lightbox = DerivedImageCache(roots=[self._scm.root])
+
         self._interface = self._create_interface()
 
     # head HTML injected into the page <head> so the penis-mask annotator's
@@ -746,9 +750,10 @@ class AIDBSceneApp:
                 """,
             )
 
-            # Lightbox: thumbnail click -> server reads the full image and
-            # returns a JSON payload `{b64, type, image_id?, caption?}`.
-            # The JS .then() callback decodes it, sets the modal image,
+            # Lightbox: thumbnail click -> server returns a JSON payload
+            # `{src, src_full, type, image_id?, caption?}` with the URLs of
+            # the screen-sized rendition and of the original. The JS .then()
+            # callback sets the modal image (original on demand),
             # populates the editable caption textarea (registered only) and
             # shows the overlay (fit-to-screen via CSS).
             button_hidden_simg_editor_lightbox.click(
@@ -764,7 +769,7 @@ class AIDBSceneApp:
                     if (!resultStr) return;
                     let data;
                     try { data = JSON.parse(resultStr); } catch (e) { return; }
-                    if (!data || !data.b64) return;
+                    if (!data || !data.src) return;
 
                     const img      = document.getElementById('simg-lightbox-img');
                     const overlay  = document.getElementById('simg-lightbox-overlay');
@@ -773,7 +778,8 @@ class AIDBSceneApp:
                     const excl     = document.getElementById('simg-lightbox-exclude');
                     if (!img || !overlay) return;
 
-                    img.src = 'data:image/png;base64,' + data.b64;
+                    img.src = data.src;
+                    img.dataset.full = data.src_full || '';
 
                     const content = overlay.querySelector('.simg-lightbox-content');
                     if (data.type === 'registered' && data.image_id) {
@@ -2807,21 +2813,21 @@ class AIDBSceneApp:
 
     def _lightbox_load(self, data_str: Optional[str]) -> str:
         """
-        Loads the full-size image for a registered SceneImage (by id) or an
+        Resolves the image of a registered SceneImage (by id) or an
         unregistered file (by url) and returns a JSON-serialised payload
         consumed by the lightbox JS .then() callback:
 
             {
-              "b64":      "<image bytes base64>",
+              "src":      "<URL of the screen-sized rendition>",
+              "src_full": "<URL of the original, fetched on demand>",
               "type":     "registered" | "unregistered",
               "image_id": "<oid>",        # only for registered targets
               "caption":  "<current caption>"  # only for registered targets
             }
 
-        Returns '' on failure (the JS callback no-ops).
-
-        Always runs `_flush_state()` afterwards so any temporary PIL bytes
-        / large strings used for the encode are released.
+        Returns '' on failure (the JS callback no-ops). No image bytes go
+        through the payload; the rendition is derived once and cached, so
+        opening the modal does not depend on the original's file size.
         """
         if not data_str or not isinstance(data_str, str):
             return ''
@@ -2837,64 +2843,42 @@ class AIDBSceneApp:
         if not target_type or not target:
             return ''
 
-        pil = None
-        b64: Optional[str] = None
+        url: Optional[Path] = None
         caption_text: Optional[str] = None
         prototype_flag: bool = False
         excluded_flag: bool = False
-        try:
-            if target_type == 'registered':
-                try:
-                    simg = self._scm.scene_image_manager().image_from_id_or_url(target)
-                except Exception as e:
-                    print(f'ERROR: lightbox load registered [{target}]: {e}')
-                    gr.Warning(f'Lightbox load failed: {e}')
-                    return ''
-                pil = simg.pil
-                caption_text = simg.caption or ''
-                prototype_flag = bool(simg.prototype)
-                if set_id_in:
-                    try:
-                        scene_set = self._ssm.set_from_id_or_name(set_id_in)
-                        excluded_flag = str(target) in set(scene_set.imgs_exclude)
-                    except Exception as e:
-                        print(f'WARN: lightbox set lookup [{set_id_in}]: {e}')
-                        set_id_in = ''
-            elif target_type == 'unregistered':
-                url = Path(str(target).strip())
-                if not url.exists():
-                    gr.Warning(f'Lightbox: file does not exist: {url}')
-                    return ''
-                pil = image_from_url(url)
-            else:
-                gr.Warning(f'Lightbox: unknown target type [{target_type}].')
-                return ''
-
-            if pil is None:
-                gr.Warning('Lightbox: could not open image.')
-                return ''
-
+        if target_type == 'registered':
             try:
-                b64 = HtmlHelper.pil_to_base64(pil)
+                simg = self._scm.scene_image_manager().image_from_id_or_url(target)
             except Exception as e:
-                print(f'ERROR: lightbox base64 encode failed: {e}')
-                gr.Warning(f'Lightbox encode failed: {e}')
+                print(f'ERROR: lightbox load registered [{target}]: {e}')
+                gr.Warning(f'Lightbox load failed: {e}')
                 return ''
-        finally:
-            # Eagerly drop the PIL handle and any large temporary buffers,
-            # then flush so subsequent renders / GPU users start clean.
-            if pil is not None:
+            url = simg.url_from_data
+            caption_text = simg.caption or ''
+            prototype_flag = bool(simg.prototype)
+            if set_id_in:
                 try:
-                    pil.close()
-                except Exception:
-                    pass
-            del pil
-            self._flush_state()
+                    scene_set = self._ssm.set_from_id_or_name(set_id_in)
+                    excluded_flag = str(target) in set(scene_set.imgs_exclude)
+                except Exception as e:
+                    print(f'WARN: lightbox set lookup [{set_id_in}]: {e}')
+                    set_id_in = ''
+        elif target_type == 'unregistered':
+            url = Path(str(target).strip())
+            if not url.exists():
+                gr.Warning(f'Lightbox: file does not exist: {url}')
+                return ''
+        else:
+            gr.Warning(f'Lightbox: unknown target type [{target_type}].')
+            return ''
 
-        if not b64:
+        urls = self._lightbox.urls(url) if url is not None else None
+        if urls is None:
+            gr.Warning('Lightbox: could not open image.')
             return ''
 
-        result: dict = {'b64': b64, 'type': target_type}
+        result: dict = urls | {'type': target_type}
         if target_type == 'registered':
             result['image_id'] = str(target)
             result['caption'] = caption_text or ''
@@ -2972,6 +2956,8 @@ class AIDBSceneApp:
         # (launch-time head is the supported path in gradio 6; Blocks(head=)
         # is deprecated). <script> in gr.HTML would not execute.
         kwargs.setdefault('head', self._blocks_head)
+        # long-lived caching of the (content-addressed) lightbox renditions
+        kwargs['app_kwargs'] = app_kwargs_cached(self._lightbox, kwargs.get('app_kwargs'))
         self._interface.launch(**kwargs)
 
 
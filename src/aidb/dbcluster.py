@@ -0,0 +1,372 @@
+import hashlib
+from pathlib import Path
+from typing import Final, Optional
+
+import numpy as np
+
+from aidb.tagger_defines import TaggerDef
+
+
+class FocusClusterState:
+    """
+    Persistent, incrementally updated DBSCAN clustering over image focus vectors.
+
+    The state holds the standardized feature matrix, the eps-neighbor count of every
+    point (its core flag is count >= min_samples) and the cluster labels (-1 = noise).
+    It is stored as one .npz file next to a version key; a key mismatch (format,
+    eps, min_samples or TAGS_FOCUS changed) makes `load` return None, i.e. a refit.
+
+    `update` only re-evaluates what a change can reach: the eps-neighborhoods of new,
+    changed and removed points, the clusters those neighborhoods touch when points
+    were removed or changed (a cluster may split), and a merge of the clusters newly
+    connected by new core points. Insertion-only updates never re-walk an unaffected
+    cluster.
+
+    `fit` builds the pivot index and the neighbor counts, and takes its labels from
+    sklearn's DBSCAN run on the eps-graph of that same search.
+
+    eps-queries of a few points (the walks of an update) go through a pivot (LAESA-style)
+    index: the distances of every point to a few far-apart pivots bound, via the triangle
+    inequality, which points can lie within eps of a query; only those get an exact
+    distance. Unlike kd/ball trees this stays selective at the ~150 dimensions of the
+    focus vector. Larger queries, and those the pivots don't prune (a sampled estimate
+    of the candidate fraction), go brute force in blocks: one matmul beats the pivot
+    mask from about a dozen query rows on.
+
+    The standardization (mean/std) is fixed at `fit`, so labels of an incrementally
+    grown state can drift from a from-scratch `Statistics.imgs_cluster`; refit with
+    force when the data changed substantially.
+    """
+
+    FORMAT_VERSION: Final = 2
+    N_PIVOTS: Final = 8
+    BLOCK: Final = 256
+    # fraction of pivot candidates above which an eps-query goes brute force
+    DENSE: Final = 0.05
+    # query rows up to which the pivot index is used
+    PIVOT_ROWS: Final = 8
+    # stored points the candidate fraction is estimated on
+    SAMPLE: Final = 1024
+
+    def __init__(self, eps: float = 0.5, min_samples: int = 5) -> None:
+        self.eps = float(eps)
+        self.min_samples = int(min_samples)
+        self.ids: list[str] = []
+        d = len(TaggerDef.TAGS_FOCUS)
+        self.X = np.zeros((0, d))
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.labels = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(d)
+        self.scale = np.ones(d)
+        self.pivots = np.zeros((0, d))
+        self.D = np.zeros((0, 0))
+        self.sq = np.zeros(0)
+        self._label_next = 0
+        self._X_aug: tuple[np.ndarray, np.ndarray] | None = None
+
+    @property
+    def version(self) -> str:
+        tags = hashlib.sha1('\n'.join(TaggerDef.TAGS_FOCUS.keys()).encode()).hexdigest()[:12]
+        return f'{self.FORMAT_VERSION}:{self.eps!r}:{self.min_samples}:{tags}'
+
+    @property
+    def core(self) -> np.ndarray:
+        return self.counts >= self.min_samples
+
+    @property
+    def clusters(self) -> dict[int, list[str]]:
+        """cluster label -> image ids, same shape as Statistics.imgs_cluster"""
+        ret: dict[int, list[str]] = {}
+        for id, label in zip(self.ids, self.labels.tolist(), strict=True):
+            ret.setdefault(label, []).append(id)
+        return ret
+
+    # ---- persistence ----
+
+    @classmethod
+    def load(
+        cls, url: str | Path, eps: float = 0.5, min_samples: int = 5
+    ) -> Optional['FocusClusterState']:
+        """the stored state, or None if missing, unreadable or of another version"""
+        state = cls(eps, min_samples)
+        try:
+            with np.load(url, allow_pickle=False) as data:
+                if str(data['version']) != state.version:
+                    return None
+                state.ids = data['ids'].tolist()
+                state.X = data['X']
+                state.counts = data['counts']
+                state.labels = data['labels']
+                state.mean = data['mean']
+                state.scale = data['scale']
+                state.pivots = data['pivots']
+                state.D = data['D']
+                state.sq = data['sq']
+        except (OSError, KeyError, ValueError):
+            return None
+        state._label_next = int(state.labels.max(initial=-1)) + 1
+        return state
+
+    def save(self, url: str | Path) -> None:
+        """writes the state atomically (tmp file + rename)"""
+        url = Path(url)
+        url_tmp = url.with_name(f'{url.name}.tmp.npz')
+        np.savez(
+            url_tmp,
+            version=np.array(self.version),
+            ids=np.array(self.ids, dtype=str),
+            X=self.X,
+            counts=self.counts,
+            labels=self.labels,
+            mean=self.mean,
+            scale=self.scale,
+            pivots=self.pivots,
+            D=self.D,
+            sq=self.sq,
+        )
+        url_tmp.replace(url)
+
+    # ---- clustering ----
+
+    def fit(self, ids: list[str], X_raw: np.ndarray) -> None:
+        """full clustering from scratch, also refits the standardization and the pivots"""
+        from scipy import sparse
+        from sklearn.cluster import DBSCAN
+
+        X_raw = np.asarray(X_raw, dtype=np.float64).reshape(len(ids), -1)
+        self.mean = X_raw.mean(axis=0) if len(ids) else np.zeros(X_raw.shape[1])
+        std = X_raw.std(axis=0) if len(ids) else np.ones(X_raw.shape[1])
+        self.scale = np.where(std > 0, std, 1.0)
+
+        self.ids = list(ids)
+        self.X = self._scaled(X_raw)
+        self.pivots = self._pivots_select(self.X)
+        self.D = self._dist_pivots(self.X)
+        self.sq = np.einsum('ij,ij->i', self.X, self.X)
+        # one eps-search for both: the counts, and sklearn's DBSCAN labels on the eps-graph
+        rows, cols = self._eps_pairs(self.X)
+        self.counts = np.bincount(rows, minlength=len(ids)).astype(np.int64)
+        if len(ids):
+            graph = sparse.csr_matrix((np.zeros(len(rows)), (rows, cols)), shape=(len(ids),) * 2)
+            db = DBSCAN(eps=self.eps, min_samples=self.min_samples, metric='precomputed')
+            self.labels = db.fit(graph).labels_.astype(np.int64)
+        else:
+            self.labels = np.zeros(0, dtype=np.int64)
+        self._label_next = int(self.labels.max(initial=-1)) + 1
+
+    def update(self, ids: list[str], X_raw: np.ndarray) -> bool:
+        """
+        Brings the state to the given (ids, vectors): new ids are inserted, ids with a
+        different vector re-inserted, missing ids removed. Returns False if nothing changed.
+        """
+        X_new = self._scaled(np.asarray(X_raw, dtype=np.float64).reshape(len(ids), -1))
+        pos = {id: i for i, id in enumerate(self.ids)}
+        incoming = set(ids)
+
+        drop = [i for i, id in enumerate(self.ids) if id not in incoming]
+        insert = [k for k, id in enumerate(ids) if id not in pos]
+        kept = [(pos[id], k) for k, id in enumerate(ids) if id in pos]
+        if kept:
+            i_kept, k_kept = np.array(kept).T
+            changed = np.flatnonzero((self.X[i_kept] != X_new[k_kept]).any(axis=1))
+            drop += i_kept[changed].tolist()
+            insert = sorted(insert + k_kept[changed].tolist())
+        if not drop and not insert:
+            return False
+
+        core_before = self.core
+
+        # 1) take dropped points out: their neighbors lose them, their clusters may split
+        labels_dirty: set[int] = set()
+        if drop:
+            drop_arr = np.array(sorted(drop))
+            for i, nb in zip(drop_arr, self._eps_neighbors(self.X[drop_arr]), strict=True):
+                self.counts[nb] -= 1
+                labels_dirty.update(self.labels[nb].tolist())
+                labels_dirty.add(int(self.labels[i]))
+            labels_dirty.discard(-1)
+            keep = np.ones(len(self.ids), dtype=bool)
+            keep[drop_arr] = False
+            self.ids = [id for id, k in zip(self.ids, keep.tolist(), strict=True) if k]
+            self.X = self.X[keep]
+            self.D = self.D[keep]
+            self.sq = self.sq[keep]
+            self.counts = self.counts[keep]
+            self.labels = self.labels[keep]
+            core_before = core_before[keep]
+
+        # 2) insert new/changed points: they and their neighbors gain counts
+        n_old = len(self.ids)
+        insert_arr = np.array(insert, dtype=np.int64)
+        self.ids += [ids[k] for k in insert]
+        self.X = np.vstack([self.X, X_new[insert_arr]])
+        self.D = np.vstack([self.D, self._dist_pivots(X_new[insert_arr])])
+        self.sq = np.concatenate([self.sq, np.einsum('ij,ij->i', X_new[insert_arr], X_new[insert_arr])])
+        self.counts = np.concatenate([self.counts, np.zeros(len(insert), dtype=np.int64)])
+        self.labels = np.concatenate([self.labels, np.full(len(insert), -1, dtype=np.int64)])
+        rows_new = np.arange(n_old, len(self.ids))
+        nbs_new = dict(zip(rows_new.tolist(), self._eps_neighbors(self.X[rows_new]), strict=True))
+        for r, nb in nbs_new.items():
+            self.counts[nb[nb < n_old]] += 1
+            self.counts[r] = len(nb)
+
+        # 3) relabel what changed: new rows, core flips, members of dirty clusters
+        flipped = np.flatnonzero(core_before != self.core[:n_old])
+        members_dirty = np.flatnonzero(np.isin(self.labels, list(labels_dirty)))
+        seeds = np.unique(np.concatenate([rows_new, flipped, members_dirty]))
+        self._relabel(seeds, labels_dirty, nbs_new)
+        return True
+
+    def _relabel(
+        self, seeds: np.ndarray, labels_dirty: set[int], nbs: dict[int, np.ndarray]
+    ) -> None:
+        """
+        Re-derives labels reachable from `seeds`. Members of `labels_dirty` are reset and
+        re-walked; intact clusters reached by a walk are merged as a whole (insertions only
+        add edges, so their inner connectivity still holds). `nbs` holds already known
+        eps-neighborhoods; those of the other seeds are searched in one go.
+        """
+        missing = np.array([s for s in seeds.tolist() if s not in nbs], dtype=np.int64)
+        nbs = nbs | dict(zip(missing.tolist(), self._eps_neighbors(self.X[missing]), strict=True))
+
+        def neighbors(batch: np.ndarray) -> np.ndarray:
+            rest = batch[[i not in nbs for i in batch.tolist()]]
+            known = [nbs[i] for i in batch.tolist() if i in nbs]
+            return np.unique(np.concatenate(known + self._eps_neighbors(self.X[rest])))
+
+        if labels_dirty:
+            self.labels[np.isin(self.labels, list(labels_dirty))] = -1
+        core = self.core
+        intact = self.labels >= 0
+        visited = np.zeros(len(self.ids), dtype=bool)
+
+        for s in seeds.tolist():
+            if not core[s] or visited[s]:
+                continue
+            # a seed may already be labeled (a border point that just turned core): its
+            # walk then extends that cluster
+            comp = [np.array([s])]
+            borders: list[np.ndarray] = []
+            merged: set[int] = {int(self.labels[s])} if intact[s] else set()
+            visited[s] = True
+            frontier = np.array([s])
+            while len(frontier):
+                batch, frontier = frontier[: self.BLOCK], frontier[self.BLOCK :]
+                reached = neighbors(batch)
+                reached = reached[~visited[reached]]
+                hit = reached[intact[reached] & core[reached]]
+                merged.update(np.unique(self.labels[hit]).tolist())
+                reached = reached[~intact[reached]]
+                visited[reached] = True
+                cores_new = reached[core[reached]]
+                comp.append(cores_new)
+                borders.append(reached[~core[reached]])
+                frontier = np.concatenate([frontier, cores_new])
+
+            if merged:
+                label = min(merged)
+                for other in merged - {label}:
+                    self.labels[self.labels == other] = label
+            else:
+                label = self._label_next
+                self._label_next += 1
+            members = np.concatenate(comp + borders)
+            self.labels[members] = label
+            intact[members] = True
+
+        # non-core points left without a cluster may still border an intact one
+        loose = seeds[(self.labels[seeds] < 0) & ~core[seeds]]
+        for i in loose.tolist():
+            nb = nbs[i]
+            labels_core = self.labels[nb[core[nb]]]
+            labels_core = labels_core[labels_core >= 0]
+            if len(labels_core):
+                self.labels[i] = labels_core[0]
+
+    # ---- eps-index ----
+
+    def _scaled(self, X_raw: np.ndarray) -> np.ndarray:
+        return (X_raw - self.mean) / self.scale
+
+    def _pivots_select(self, X: np.ndarray) -> np.ndarray:
+        """farthest-first pivots, starting from the point farthest from the centroid"""
+        if len(X) == 0:
+            return np.zeros((0, X.shape[1]))
+        n_pivots = min(self.N_PIVOTS, len(X))
+        dmin = np.linalg.norm(X - X.mean(axis=0), axis=1)
+        picked = []
+        for _ in range(n_pivots):
+            i = int(np.argmax(dmin))
+            picked.append(i)
+            dmin = np.minimum(dmin, np.linalg.norm(X - X[i], axis=1))
+        return X[picked].copy()
+
+    def _dist_pivots(self, X: np.ndarray) -> np.ndarray:
+        if len(self.pivots) == 0:
+            return np.zeros((len(X), 0))
+        return np.stack([np.linalg.norm(X - p, axis=1) for p in self.pivots], axis=1)
+
+    def _eps_pairs_dense(self, Q: np.ndarray, X_aug: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Brute force for eps so large that the pivots don't prune: |q|^2 + |x|^2 - 2qx as
+        one matmul of the augmented rows [-2q, |q|^2, 1] and [x, 1, |x|^2], exact distances
+        only for pairs within its rounding error of eps.
+        """
+        sq_q = np.einsum('ij,ij->i', Q, Q)
+        d2 = np.hstack([-2.0 * Q, sq_q[:, None], np.ones((len(Q), 1))]) @ X_aug.T
+        eps2 = self.eps**2
+        margin = 4 * float(np.finfo(np.float64).eps) * Q.shape[1] * (sq_q.max() + self.sq.max())
+        rows, cols = np.nonzero(d2 <= eps2 + margin)
+        edge = np.flatnonzero(d2[rows, cols] > eps2 - margin)
+        if len(edge):
+            diff = self.X[cols[edge]] - Q[rows[edge]]
+            outside = edge[np.sqrt(np.einsum('ij,ij->i', diff, diff)) > self.eps]
+            rows, cols = np.delete(rows, outside), np.delete(cols, outside)
+        return rows, cols
+
+    def _eps_pairs(self, Q: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """(query row, point) index pairs of all points within eps, sorted by query row"""
+        if len(self.ids) == 0 or len(Q) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        if len(Q) <= self.PIVOT_ROWS:
+            Dq = self._dist_pivots(Q)
+            # the candidate fraction on a sample decides before the full mask is built
+            sample = self.D[:: max(1, len(self.ids) // self.SAMPLE)]
+            if self._candidates(sample, Dq).mean() <= self.DENSE:
+                return self._eps_pairs_pivots(Q, Dq)
+        rows, cols = [], []
+        for start in range(0, len(Q), self.BLOCK):
+            r, c = self._eps_pairs_dense(Q[start : start + self.BLOCK], self._augmented())
+            rows.append(r + start)
+            cols.append(c)
+        return np.concatenate(rows), np.concatenate(cols)
+
+    def _eps_pairs_pivots(self, Q: np.ndarray, Dq: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """exact distances only to the candidates the pivot distances Dq leave"""
+        rows, cols = [], []
+        for r, (q, row) in enumerate(zip(Q, self._candidates(self.D, Dq), strict=True)):
+            cand = np.flatnonzero(row)
+            diff = self.X[cand] - q
+            cand = cand[np.sqrt(np.einsum('ij,ij->i', diff, diff)) <= self.eps]
+            rows.append(np.full(len(cand), r))
+            cols.append(cand)
+        return np.concatenate(rows), np.concatenate(cols)
+
+    def _augmented(self) -> np.ndarray:
+        """the rows [x, 1, |x|^2] of the brute force matmul, rebuilt when X was replaced"""
+        if self._X_aug is None or self._X_aug[0] is not self.X:
+            X_aug = np.hstack([self.X, np.ones((len(self.X), 1)), self.sq[:, None]])
+            self._X_aug = (self.X, X_aug)
+        return self._X_aug[1]
+
+    def _candidates(self, D: np.ndarray, Dq: np.ndarray) -> np.ndarray:
+        """(Dq row, D row) mask of the points not excluded from the eps-ball by a pivot"""
+        mask = np.ones((len(Dq), len(D)), dtype=bool)
+        for p in range(D.shape[1]):
+            mask &= np.abs(D[None, :, p] - Dq[:, p, None]) <= self.eps
+        return mask
+
+    def _eps_neighbors(self, Q: np.ndarray) -> list[np.ndarray]:
+        """indices of all points within eps of each query row (itself included if stored)"""
+        rows, cols = self._eps_pairs(Q)
+        return np.split(cols, np.cumsum(np.bincount(rows, minlength=len(Q)))[:-1]) if len(Q) else []
@@ -1,6 +1,8 @@
 import json
+from pathlib import Path
 
 from bson import ObjectId
+from aidb.dbcluster import FocusClusterState
 from aidb.dbmanager import DBManager
 from aidb.image import Image  # Import the Image class
 from aidb.tagger_defines import TaggerDef
@@ -160,12 +162,15 @@ class Statistics:
     @property
     def img_rand(self) -> Image:
         """picks a random existing image from the db."""
-        image_docs = self._db_manager.find_documents(self._db_manager._collection)
-        if not image_docs:
+        collection = self._db_manager._get_collection(self._db_manager._collection)
+        if collection is None:
             raise ValueError('No images found in the database.')
 
-        # Pick a random document
-        random_doc = image_docs[np.random.randint(len(image_docs))]
+        # Let the server pick the document instead of loading all of them
+        image_docs = list(collection.aggregate([{'$sample': {'size': 1}}]))
+        if not image_docs:
+            raise ValueError('No images found in the database.')
+        random_doc = image_docs[0]
 
         # Create and return an Image object
         return Image(self._db_manager, str(random_doc['_id']), doc=random_doc)
@@ -185,6 +190,29 @@ class Statistics:
             focus_vector[i] = img_obj.get_tag_probability(tag)
         return focus_vector
 
+    @staticmethod
+    def focus_vectors_from_docs(docs: list[dict]) -> np.ndarray:
+        """builds the (n, len(TAGS_FOCUS)) matrix of the TAGS_FOCUS probabilities of image documents, same values as img_calc_focus_vector"""
+        tags_focus = list(TaggerDef.TAGS_FOCUS.keys())
+        X = np.zeros((len(docs), len(tags_focus)))
+        for i, doc in enumerate(docs):
+            tags_wd = ((doc or {}).get('tags') or {}).get('tags_wd')
+            if not tags_wd:
+                continue
+            X[i] = [tags_wd.get(tag, 0.0) for tag in tags_focus]
+        return X
+
+    def focus_matrix(self) -> tuple[list[str], np.ndarray]:
+        """
+        Returns the image ids and focus-vector matrix of all images in the current collection,
+        read with one (projected) query per call: not cached, images are added and retagged
+        by other writers.
+        """
+        collection = self._db_manager._get_collection(self._db_manager._collection)
+        docs = [] if collection is None else list(collection.find({}, {'tags.tags_wd': 1}))
+        ids = [str(doc['_id']) for doc in docs]
+        return ids, self.focus_vectors_from_docs(docs)
+
     def dist_img(self, img0: Image | str, img1: Image | str) -> float:
         """calcs a distance of 2 imgs based on the focus vector"""
         vec0 = self.img_calc_focus_vector(img0)
@@ -198,16 +226,7 @@ class Statistics:
         distances: dict[str, float] = {}
         if not imgl:
             # If imgl is empty, use all images from the database
-            image_docs = self._db_manager.find_documents(self._db_manager._collection)
-            if not image_docs:
-                return distances  # No images in DB
-
-            # Convert documents to Image objects for consistent processing
-            images_to_compare = [
-                Image(self._db_manager, str(doc['_id']), doc=doc)
-                for doc in image_docs
-                if '_id' in doc
-            ]
+            ids, X = self.focus_matrix()
         else:
             images_to_compare = []
             for item in imgl:
@@ -218,22 +237,22 @@ class Statistics:
                 else:
                     print(f'Warning: Skipping invalid item in imgl: {item}')
                     continue
+            ids = [img.id for img in images_to_compare]
+            X = self.focus_vectors_from_docs([img.data for img in images_to_compare])
 
-        if not images_to_compare:
+        if not ids:
             return distances
 
         # Calculate the focus vector for the reference image once
         vec0 = self.img_calc_focus_vector(img0)
+        dists = self.dist_focus_vectors(vec0, X)
 
-        for img_to_compare in images_to_compare:
+        id0 = img0.id if isinstance(img0, Image) else img0
+        for id, distance in zip(ids, dists.tolist(), strict=True):
             # Ensure we don't compare an image to itself if it's in the list
-            if not self_compare:
-                if img_to_compare.id == (img0.id if isinstance(img0, Image) else img0):
-                    continue
-
-            vec_compare = self.img_calc_focus_vector(img_to_compare)
-            distance = self.dist_focus_vector(vec0, vec_compare)
-            distances[img_to_compare.id] = distance
+            if not self_compare and id == id0:
+                continue
+            distances[id] = distance
 
         return Statistics.sort_tags(distances, highest2lowest=False)
 
@@ -326,43 +345,63 @@ class Statistics:
         The returned dict has the image id as key and as value a dictionary of neighboring image id's and their distances.
         The individual focus vectors are not calculated rather than read from the image metadata.
         """
-        neighborhoods: dict[str, dict[str, float]] = {}
-
-        # Pre-calculate all focus vectors to avoid redundant calculations
-        focus_vectors: dict[str, np.ndarray] = {}
+        ids: list[str] = []
+        vectors: list[np.ndarray] = []
         for img in imgs:
-            focus_vectors[img.id] = img.focus_vector
-
-        for i, img_i in enumerate(imgs):
-            current_image_id = img_i.id
-            distances_to_others: dict[str, float] = {}
-
-            # Retrieve focus vector for the current image
-            vec_i = focus_vectors.get(current_image_id)
-            if vec_i is None:
-                print(f'Warning: Focus vector not found for image {current_image_id}. Skipping.')
+            vec = img.focus_vector
+            if vec is None:
+                print(f'Warning: Focus vector not found for image {img.id}. Skipping.')
                 continue
+            ids.append(img.id)
+            vectors.append(vec)
 
-            for j, img_j in enumerate(imgs):
-                if i == j:  # Don't compare an image to itself
-                    continue
-
-                other_image_id = img_j.id
-                vec_j = focus_vectors.get(other_image_id)
-                if vec_j is None:
-                    print(
-                        f'Warning: Focus vector not found for image {other_image_id}. Skipping comparison with {current_image_id}.'
-                    )
-                    continue
-
-                distance = self.dist_focus_vector(vec_i, vec_j)
-                distances_to_others[other_image_id] = distance
+        if not vectors:
+            return {}
+        return self.neighborhood_from_matrix(ids, np.array(vectors), size=size)
 
-            # Sort distances and take the top 'size' neighbors
-            sorted_distances = sorted(distances_to_others.items(), key=lambda item: item[1])
+    @classmethod
+    def neighborhood_from_matrix(
+        cls, ids: list[str], X: np.ndarray, size: int = 10, block: int = 256
+    ) -> dict[str, dict[str, float]]:
+        """
+        The `size` nearest neighbors (id -> distance, ascending) of every row of X among the other rows.
 
-            # Store only the top 'size' neighbors
-            neighborhoods[current_image_id] = dict(sorted_distances[:size])
+        Candidates are ranked in float32 row blocks via |b|^2 - 2ab (|a|^2 is constant per row); only
+        the candidates up to the size-th one plus a bound on the float32 rounding error are rescored
+        with the pairwise loop's np.linalg.norm distance. Ties are ordered by position in ids.
+        """
+        n = len(ids)
+        neighborhoods: dict[str, dict[str, float]] = {}
+        if n == 0:
+            return neighborhoods
+        k = min(size, n - 1)
+        if k <= 0:
+            return {id: {} for id in ids}
+
+        X = np.asarray(X, dtype=np.float64)
+        X32 = X.astype(np.float32)
+        sq = np.einsum('ij,ij->i', X, X).astype(np.float32)
+        margin = 4 * float(np.finfo(np.float32).eps) * X.shape[1] * max(1.0, float(sq.max()))
+        # duplicate rows (untagged images are all zero) tie: each distinct row is measured once
+        X_unique, inverse = np.unique(X, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for start in range(0, n, block):
+            rows = np.arange(start, min(start + block, n))
+            d2 = X32[rows] @ X32.T
+            d2 *= -2.0
+            d2 += sq
+            d2[np.arange(len(rows)), rows] = np.inf  # don't compare an image to itself
+            kth = np.partition(d2, k - 1, axis=1)[:, k - 1]
+            hit_rows, hit_cols = np.nonzero(d2 <= (kth + margin)[:, None])
+            bounds = np.searchsorted(hit_rows, np.arange(len(rows) + 1))
+            for r, i in enumerate(rows):
+                cand = hit_cols[bounds[r] : bounds[r + 1]]
+                cand_unique, cand_inverse = np.unique(inverse[cand], return_inverse=True)
+                dists = cls.dist_focus_vectors(X[i], X_unique[cand_unique])[cand_inverse]
+                order = np.lexsort((cand, dists))[:k]
+                neighborhoods[ids[i]] = dict(
+                    zip([ids[j] for j in cand[order]], dists[order].tolist(), strict=True)
+                )
 
         return neighborhoods
 
@@ -444,6 +483,37 @@ class Statistics:
         # Convert defaultdict to regular dict for return
         return dict(clusters)
 
+    def imgs_cluster_incremental(
+        self, url_state: str | Path, eps: float = 0.5, min_samples: int = 5, force: bool = False
+    ) -> dict:
+        """
+        Clusters all images of the collection by their focus vector with DBScan, like imgs_cluster.
+
+        The clustering state is kept at url_state and only updated for new, changed or removed images
+        (see FocusClusterState); it is rebuilt from scratch if missing, of another version, or force.
+        """
+        collection = self._db_manager._get_collection(self._db_manager._collection)
+        if collection is None:
+            return {}
+        docs = list(
+            collection.find(
+                {'statistics.focus_vector': {'$exists': True}}, {'statistics.focus_vector': 1}
+            )
+        )
+        ids = [str(doc['_id']) for doc in docs]
+        X = np.array([doc['statistics']['focus_vector'] for doc in docs], dtype=np.float64)
+        X = X.reshape(len(ids), len(TaggerDef.TAGS_FOCUS))
+
+        state = None if force else FocusClusterState.load(url_state, eps, min_samples)
+        if state is None:
+            print(f'Building clustering state for {len(ids)} images.')
+            state = FocusClusterState(eps, min_samples)
+            state.fit(ids, X)
+        elif not state.update(ids, X):
+            return state.clusters
+        state.save(url_state)
+        return state.clusters
+
     def imgs_stdev(self, imgs: list[Image]) -> float:
         """
         Calculates the std dev of a list of images based on their focus vectors.
@@ -487,6 +557,15 @@ class Statistics:
     def dist_focus_vector(vec0: np.ndarray, vec1: np.ndarray) -> float:
         return np.linalg.norm(vec0 - vec1)
 
+    @staticmethod
+    def dist_focus_vectors(vec0: np.ndarray, X: np.ndarray) -> np.ndarray:
+        """
+        distances of vec0 to every row of X, each one the dist_focus_vector call of the baseline
+        (np.linalg.norm of a fresh difference vector, not a row sliced from a 2-D difference)
+        """
+        X = np.asarray(X, dtype=np.float64)
+        return np.array([np.linalg.norm(vec0 - x) for x in X], dtype=np.float64)
+
     @staticmethod
     def sort_tags(tags: Dict[str, float], highest2lowest=True) -> Dict[str, float]:
         """
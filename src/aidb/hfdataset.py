@@ -7,6 +7,8 @@ from huggingface_hub import hf_hub_download, snapshot_download
 from datasets import load_dataset
 from PIL import Image
 
+from aidb.hfio import PREFETCH_WORKERS, cached_file, iter_jsonl, prefetch_files
+
 map_bodypart: Final = {
     '_1gts0': '',
     '__tbr': '',
@@ -120,6 +122,11 @@ class HFDatasetImg:
                     self._captions[idx] = capjoy
 
         self._ids: list[str] = [Path(file).stem for file in self.img_files]
+        # id -> first idx, built once (id2idx/has_id were linear scans)
+        self._idx: dict[str, int] = {}
+        for idx, id in enumerate(self._ids):
+            self._idx.setdefault(id, idx)
+        self._files: dict[int, Path] = {}  # prefetched idx -> local file
 
     def _load_meta(self, force_download: bool = False):
         try:
@@ -133,10 +140,7 @@ class HFDatasetImg:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     return json.load(f)
             elif self.file_meta.endswith('.jsonl'):
-                data = []
-                with jsonlines.open(file_path) as reader:
-                    for obj in reader:
-                        data.append(obj)
+                data = list(iter_jsonl(file_path))
                 self._size = len(data)
                 return data
             else:
@@ -162,7 +166,7 @@ class HFDatasetImg:
         return self._ids
 
     def has_id(self, id: str) -> bool:
-        return id in self._ids
+        return id in self._idx
 
     @property
     def tags(self) -> list[dict]:
@@ -191,10 +195,30 @@ class HFDatasetImg:
         return self._size
 
     def id2idx(self, id: str) -> int | None:
-        for idx, img_file in enumerate(self.img_files):
-            if Path(img_file).stem == id:
-                return idx
-        return None
+        return self._idx.get(id, None)
+
+    def _file(self, idx: int) -> Path:
+        # prefetched, else from the local HF cache, else a single download
+        url = self._files.get(idx, None)
+        if url is None:
+            url = cached_file(self.repo_id, self.img_files[idx])
+        if url is None:
+            url = Path(
+                hf_hub_download(
+                    repo_id=self.repo_id, filename=self.img_files[idx], repo_type='dataset'
+                )
+            )
+        self._files[idx] = url
+        return url
+
+    def prefetch(self, idxs: list[int], workers: int = PREFETCH_WORKERS) -> int:
+        """Downloads the image files of idxs in parallel (only those). Returns the number fetched."""
+        files = prefetch_files(self.repo_id, [self.img_files[idx] for idx in idxs], workers=workers)
+        for idx in idxs:
+            url = files.get(self.img_files[idx], None)
+            if url is not None:
+                self._files[idx] = url
+        return sum(1 for idx in idxs if idx in self._files)
 
     def pil(self, idx: int) -> Image.Image | None:
         if not isinstance(idx, int):
@@ -205,10 +229,7 @@ class HFDatasetImg:
         if idx >= len(self):
             raise IndexError('Index out of bounds for tags list.')
 
-        file_img = hf_hub_download(
-            repo_id=self.repo_id, filename=self.img_files[idx], repo_type='dataset'
-        )
-        img = Image.open(file_img)
+        img = Image.open(self._file(idx))
 
         return img
 
@@ -263,10 +284,7 @@ class HFDatasetImg:
         if idx >= len(self):
             raise IndexError('Index out of bounds for tags list.')
 
-        file_img = hf_hub_download(
-            repo_id=self.repo_id, filename=self.img_files[idx], repo_type='dataset'
-        )
-        return Path(file_img)
+        return self._file(idx)
 
     def __len__(self):
         return len(self._meta)
@@ -315,6 +333,7 @@ class HFDatasetImg:
                 if idx:
                     idxs.append(idx)
 
+        self.prefetch(list(idxs))
         for idx in idxs:
             # caption
             caption = ''
@@ -329,8 +348,7 @@ class HFDatasetImg:
 
             # image
             img_path = Path(to_folder) / Path(self.img_files[idx]).name
-            img_path_download = hf_hub_download(
-                repo_id=self.repo_id, filename=self.img_files[idx], repo_type='dataset'
-            )
+            img_path_download = self._file(idx)
             # move downloaded img file to target folder
             shutil.move(img_path_download, img_path)
+            del self._files[idx]
@@ -0,0 +1,67 @@
+"""Streaming metadata and selective file prefetch for HF datasets.
+
+`iter_jsonl` yields one metadata line at a time, so callers that only keep an
+index never hold the parsed file as a list. `prefetch_files` fetches exactly a
+selected subset of a dataset repo on a bounded thread pool: files already in
+the local HF cache are resolved without a request, the rest are downloaded one
+`hf_hub_download` each. Unlike `snapshot_download(allow_patterns=...)` this
+never lists the full repo tree, which for a 100k-image dataset costs more than
+fetching a few hundred images.
+"""
+
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Final
+
+import jsonlines
+from huggingface_hub import hf_hub_download, try_to_load_from_cache
+
+PREFETCH_WORKERS: Final = 8
+
+
+def iter_jsonl(url: str | Path) -> Iterator[dict]:
+    with jsonlines.open(url) as reader:
+        yield from reader
+
+
+def cached_file(repo_id: str, filename: str, repo_type: str = 'dataset') -> Path | None:
+    """Local path of filename if it is in the HF cache (no network), else None."""
+    url = try_to_load_from_cache(repo_id, filename, repo_type=repo_type)
+    return Path(url) if isinstance(url, str) else None
+
+
+def prefetch_files(
+    repo_id: str,
+    filenames: Iterable[str],
+    repo_type: str = 'dataset',
+    workers: int = PREFETCH_WORKERS,
+) -> dict[str, Path]:
+    """
+    Makes filenames of repo_id local, at most `workers` downloads at a time.
+    Returns filename -> local path for every file that could be fetched.
+    """
+    files: dict[str, Path] = {}
+    missing: list[str] = []
+    for filename in dict.fromkeys(filenames):
+        url = cached_file(repo_id, filename, repo_type)
+        if url is None:
+            missing.append(filename)
+        else:
+            files[filename] = url
+    if not missing:
+        return files
+
+    def fetch(filename: str) -> Path | None:
+        try:
+            return Path(hf_hub_download(repo_id=repo_id, filename=filename, repo_type=repo_type))
+        except Exception as e:
+            print(f'prefetch: {repo_id}/{filename} failed: {e}')
+            return None
+
+    print(f'prefetch: {len(missing)} of {len(missing) + len(files)} files from {repo_id}')
+    with ThreadPoolExecutor(max(1, min(workers, len(missing)))) as executor:
+        for filename, url in zip(missing, executor.map(fetch, missing), strict=True):
+            if url is not None:
+                files[filename] = url
+    return files
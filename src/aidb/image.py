@@ -8,7 +8,7 @@ import numpy as np  # Import Image from Pillow and alias it to avoid conflict wi
 from aidb.dbdefines import TAGS_TRIGGER
 from aidb.dbmanager import DBManager  # Updated import
 from aidb.hfdataset import HFDatasetImg
-from aidb.tagger import tagger_wd as tagger  # Updated import
+from aidb import tagger as _tagger  # tagger_wd is loaded on first use
 
 from ait.tools.images import _image_extract_prompt_from_info_ext
 
@@ -154,7 +154,7 @@ class Image:
         return self.data.get('tags', {})
 
     def tags_prompt(self, trigger: str = '') -> list[str]:
-        return tagger.tags_prompt(self.tags, trigger=trigger)
+        return _tagger.tagger_wd.tags_prompt(self.tags, trigger=trigger)
 
     @property
     def rating(self) -> int | None:
@@ -301,7 +301,7 @@ class Image:
         Requires the PIL image to be loadable.
         """
         if self.pil:
-            return tagger.tags(self.pil)  # pyright: ignore
+            return _tagger.tagger_wd.tags(self.pil)  # pyright: ignore
         else:
             print(
                 f'Warning: Cannot generate tags for image {
@@ -1,13 +1,40 @@
-from .config_reader import ConfigReader
-from .db_connect import DBConnection
-from .scene_common import AdoptOutcome, SceneDef, SceneConfig, Sceneical
-from .scene_manager import SceneManager
-from .scene import Scene
-from .scene_set_manager import SceneSetManager
-from .scene_set import SceneSet
-from .scene_image_manager import SceneImageManager
-from .scene_image import SceneImage
-from .hfdataset import HFDataset
+"""Scene database API. Names resolve lazily (PEP 562): importing the package
+loads nothing heavy, the first access of a name imports its module."""
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .config_reader import ConfigReader
+    from .db_connect import DBConnection
+    from .hfdataset import HFDataset
+    from .scene import Scene
+    from .scene_common import AdoptOutcome, SceneConfig, SceneDef, Sceneical
+    from .scene_image import SceneImage
+    from .scene_image_manager import SceneImageManager
+    from .scene_manager import SceneManager
+    from .scene_set import SceneSet
+    from .scene_set_manager import SceneSetManager
+    from .scene_watch import SceneJournal, SceneWatcher
+
+# name -> submodule that defines it
+_LAZY = {
+    'AdoptOutcome': 'scene_common',
+    'ConfigReader': 'config_reader',
+    'DBConnection': 'db_connect',
+    'SceneDef': 'scene_common',
+    'SceneConfig': 'scene_common',
+    'Sceneical': 'scene_common',
+    'Scene': 'scene',
+    'SceneManager': 'scene_manager',
+    'SceneSetManager': 'scene_set_manager',
+    'SceneSet': 'scene_set',
+    'SceneImageManager': 'scene_image_manager',
+    'SceneImage': 'scene_image',
+    'HFDataset': 'hfdataset',
+    'SceneJournal': 'scene_watch',
+    'SceneWatcher': 'scene_watch',
+}
 
 __all__ = [
     'AdoptOutcome',
@@ -23,4 +50,19 @@ __all__ = [
     'SceneImageManager',
     'SceneImage',
     'HFDataset',
+    'SceneJournal',
+    'SceneWatcher',
 ]
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -89,6 +89,35 @@ class DBConnection:
                 )
         return None
 
+    def insert_documents(
+        self, collection_name: str, documents: list[dict[str, Any]]
+    ) -> Optional[list[str]]:
+        """
+        Inserts documents into the specified collection with one insert_many.
+
+        Args:
+            collection_name (str): The name of the collection.
+            documents (list): The documents to insert, in order.
+
+        Returns:
+            list or None: The string '_id's of the inserted documents in the order given, or None on failure.
+        """
+        if not documents:
+            return []
+        collection = self._get_collection(collection_name)
+        if collection is not None:
+            try:
+                result = collection.insert_many(documents, ordered=True)
+                self._log(f"{len(result.inserted_ids)} documents inserted into '{collection_name}'")
+                return [str(oid) for oid in result.inserted_ids]
+            except OperationFailure as e:
+                self._log(f"Failed to insert documents into '{collection_name}': {e}")
+            except Exception as e:
+                self._log(
+                    f"An unexpected error occurred during insertion into '{collection_name}': {e}"
+                )
+        return None
+
     def to_oid(self, id: Any) -> ObjectId | None:
         if isinstance(id, ObjectId):
             return id
@@ -1,8 +1,9 @@
 from pathlib import Path
-from typing import Final, Generator, Optional
+from typing import Final, Generator, Iterable, Iterator, Optional
 import jsonlines
 from huggingface_hub import hf_hub_download, snapshot_download
 
+from aidb.hfio import PREFETCH_WORKERS, iter_jsonl, prefetch_files
 from aidb.scene.scene_common import SceneDef
 
 
@@ -13,10 +14,11 @@ class HFDataset:
         self._repo_id = repo_id
         self._file_jsonl = file_jsonl
         self._url_cache: Optional[Path] = None
-        _jsonl = self._load_jsonl(force_download=force_meta_dl)
-        self._data = self._data_from_jsonl(_jsonl)
+        self._files: dict[str, Path] = {}  # prefetched id -> local file
+        # the id-keyed index is built straight from the streamed lines
+        self._data = self._data_from_jsonl(self._load_jsonl(force_download=force_meta_dl))
 
-    def _load_jsonl(self, force_download: bool = False) -> list[dict]:
+    def _load_jsonl(self, force_download: bool = False) -> Iterator[dict]:
         file_path = hf_hub_download(
             repo_id=self._repo_id,
             filename='train/' + self._file_jsonl,
@@ -24,15 +26,11 @@ class HFDataset:
             force_download=force_download,
         )
         if self._file_jsonl.endswith('.jsonl'):
-            meta = []
-            with jsonlines.open(file_path) as reader:
-                for obj in reader:
-                    meta.append(obj)
-            return meta
+            return iter_jsonl(file_path)
         else:
             raise FileNotFoundError('Unsupported file format. Only .json and .jsonl are supported.')
 
-    def _data_from_jsonl(self, jsonl: list[dict]) -> dict[str, dict]:
+    def _data_from_jsonl(self, jsonl: Iterable[dict]) -> dict[str, dict]:
         data_ids = {}
         for item in jsonl:
             url = item.get(SceneDef.FIELD_FILE_NAME, None)
@@ -68,6 +66,10 @@ class HFDataset:
     def _jsonl_from_data(self) -> list[dict]:
         return [line_data for line_data in self._data.values()]
 
+    @property
+    def repo_id(self) -> str:
+        return self._repo_id
+
     def cache(self) -> Path:
         if self._url_cache is None:
             url_cache = snapshot_download(repo_id=self._repo_id, repo_type='dataset')
@@ -122,11 +124,34 @@ class HFDataset:
         return data_id.get(SceneDef.FIELD_CAPTION, None)
 
     def url_file_from_id(self, id: str) -> Optional[Path]:
+        url = self._files.get(id, None)
+        if url is not None:
+            return url
         file_name = self.file_name_from_id(id)
         if file_name is None:
             return None
         return self.cache() / SceneDef.DIR_TRAIN / file_name
 
+    def prefetch(self, ids: Iterable[str], workers: int = PREFETCH_WORKERS) -> dict[str, Path]:
+        """
+        Makes the files of ids local and returns id -> file for the available ones. Only these
+        files are downloaded (in parallel); selecting every id downloads the full snapshot.
+        """
+        names = {}
+        for id in ids:
+            file_name = self.file_name_from_id(id)
+            if file_name is not None:
+                names[id] = f'{SceneDef.DIR_TRAIN}/{file_name}'
+        if len(names) == len(self) and self._url_cache is None:
+            self.cache()
+        if self._url_cache is not None:
+            return {id: self._url_cache / name for id, name in names.items()}
+        files = prefetch_files(self._repo_id, names.values(), workers=workers)
+        for id, name in names.items():
+            if name in files:
+                self._files[id] = files[name]
+        return {id: self._files[id] for id in names if id in self._files}
+
     def set_caption(self, id: str, caption: str) -> bool:
         if not id or not caption:
             return False
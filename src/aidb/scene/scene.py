@@ -4,7 +4,7 @@ import pprint
 from typing import Any, Callable, ClassVar, Generator
 
 from ait.tools.files import imgs_from_url, img_latest_from_url
-from ait.tools.images import thumbnail_to_url
+from ait.tools.images import thumbnail_stale
 
 from .scene_common import SceneDef
 from .scene_manager import SceneManager
@@ -240,27 +240,24 @@ class Scene:
         2. latest non reg img
         """
         url_latest: Path | None = None
-        ts_latest = 0.0
         # 1. reg imgs (shares the selection with `img_display`/`url_display`)
         img = self.img_display
         if img is not None:
             url_latest = img.url_from_data
-            ts_latest = SceneDef.get_timestamp_update_from_data(img)
 
         # 2. non-reg imgs
         if url_latest is None:
             url_latest = img_latest_from_url(self.url)
             if url_latest is None:
                 return False
-            ts_latest = url_latest.stat().st_ctime
-
-        if self.url_thumbnail.exists():
-            ts_thumbnail = self.url_thumbnail.stat().st_ctime
-            if ts_thumbnail > ts_latest:
-                if not force:
-                    return False
-        thumbnail_to_url(url_latest, self.url_thumbnail, size=self._scm.config.thumbs_size)
-        return True
+
+        # the thumbnail carries its source's mtime: a changed or different source is stale
+        if not force and not thumbnail_stale(url_latest, self.url_thumbnail):
+            return False
+        if not url_latest.exists():
+            return False
+        # enqueued when a thumbnail_scope is active (scenes_update), written right away otherwise
+        return self._scm.thumbnail_submit(url_latest, self.url_thumbnail)
 
     def _init_data(self) -> None:
         # rating
@@ -90,6 +90,21 @@ class SceneDef:
     FIELD_LINKED_NEIGHBORS: Final = 'neighbors'
     FIELD_LINKED_SOURCED: Final = 'sourced'
 
+    # scene_links: machine-maintained reverse index, one doc per image file in
+    # a scene folder (`url`, unique) -> owning scene / registered image, the
+    # file's enhancer scene id, its payload `url` and the origin scene that
+    # url resolved to, plus the file's (mtime_ns, size) when indexed. Kept by
+    # rescans (`scene_scan_links`), enhancer adoptions and registration renames;
+    # a row whose file changed is simply re-read. See `SceneLinkIndex`.
+    COLLECTION_LINKS: Final = 'scene_links'
+    FIELD_LINK_SCENE_ID: Final = 'scene_id'
+    FIELD_LINK_IMAGE_ID: Final = 'image_id'
+    FIELD_LINK_ID_ENH: Final = 'id_scene_enh'
+    FIELD_LINK_URL_ORIGIN: Final = 'url_origin'
+    FIELD_LINK_ID_ORIGIN: Final = 'id_origin'
+    FIELD_LINK_MTIME: Final = 'mtime_ns'
+    FIELD_LINK_SIZE: Final = 'size'
+
     # scan (board FEATURE REQ task 69): machine-maintained cache of derived
     # per-scene properties — one sub-doc per property under `scan`, each
     # carrying its own `ts` (epoch float) next to its value fields.
@@ -145,9 +145,9 @@ class SceneImage:
     def append_caption_log(self, entry: dict) -> None:
         """Append a single entry to `caption_log`. Stamps `ts` if missing.
 
-        Caller is responsible for `db_store()` — typically the helper in
-        `ait.caption.caption_log` calls `db_store()` after each append so
-        a crash mid-pipeline leaves a partial-but-readable trace on disk.
+        Caller is responsible for `db_store()`, which re-sets the whole
+        document. The pipeline helpers in `ait.caption.caption_log` do not
+        go through here; they `$push` via `CaptionLogSink` instead.
         """
         if not isinstance(entry, dict):
             return
@@ -160,6 +160,26 @@ class SceneImage:
             SceneDef.FIELD_TIMESTAMP_CAPTION_LOG: SceneDef.now_ts(),
         }
 
+    def caption_log_mirror(
+        self,
+        entries: list[dict],
+        clear: bool = False,
+        cap: Optional[int] = None,
+        ts: Optional[float] = None,
+    ) -> None:
+        """Apply a caption_log push that was already persisted via
+        `SceneImageManager.caption_log_push` to the in-memory document, so
+        a later `db_store()` does not overwrite the pushed entries.
+        """
+        log = [] if clear else list(self.caption_log)
+        log.extend(entries)
+        if cap:
+            log = log[-cap:]
+        self._data |= {
+            SceneDef.FIELD_CAPTION_LOG: log,
+            SceneDef.FIELD_TIMESTAMP_CAPTION_LOG: ts if ts is not None else SceneDef.now_ts(),
+        }
+
     def clear_caption_log(self) -> None:
         """Drop all caption-log entries for this image. Used at the top of
         a fresh `/imgs_caption` run so the new trail is not mixed with
@@ -1,14 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Generator, Optional
+from typing import Any, Final, Generator, Iterable, Optional
 import sys
 import json
 
+from pymongo import UpdateOne
+
 from .db_connect import DBConnection
 from .scene_common import SceneDef, SceneConfig
+from .scene_link_index import SceneLinkIndex
 
 from ait.tools.files import is_img_or_vid, url_move_to_new_parent
 from ait.tools.images import image_info_from_url
 
+REGISTER_WORKERS: Final = 8  # threads reading image headers for register_from_urls
+
 
 class SceneImageManager:
     def __init__(
@@ -16,6 +22,7 @@ class SceneImageManager:
         dbc: DBConnection | None = None,
         config: SceneConfig = 'default',
         verbose: int = 1,
+        link_index: SceneLinkIndex | None = None,
     ) -> None:
         if dbc is None:
             self._verbose = verbose
@@ -29,6 +36,7 @@ class SceneImageManager:
         if _collection is None:
             raise (ValueError('SceneImageManager DB collection is None!'))
         self._collection = _collection
+        self._link_index = link_index
 
     @property
     def config(self):
@@ -38,6 +46,13 @@ class SceneImageManager:
     def root(self) -> Path:
         return self._dbc.config.root
 
+    @property
+    def link_index(self) -> SceneLinkIndex:
+        """The scene link index registered files are renamed in (indexes ensured once)."""
+        if self._link_index is None:
+            self._link_index = SceneLinkIndex(self._dbc)
+        return self._link_index
+
     def id_from_url(self, url: str | Path) -> None | str:
         data = self.data_from_url_db(url)
         if data is None:
@@ -71,11 +86,43 @@ class SceneImageManager:
             return None
         if SceneDef.id_and_prefix_from_filename(url) is not None:
             return None
-        data = self.init_data_from_url(url)
-        if data is None:
-            return
-        ret = self._db_insert_image(data)
+        return self.register_from_urls([url]).get(str(url))
+
+    def register_from_urls(
+        self, urls: Iterable[Path | str], workers: int = REGISTER_WORKERS
+    ) -> dict[str, str | None]:
+        """
+        Registers many img/vid at once: url -> id, None where register_from_url would return None.
 
+        The headers are read on a thread pool (dimensions and text chunks only, no pixel decode),
+        the new documents go into the DB with one insert_many, then every file is moved to its
+        registered name and the link index follows all moves in one bulk write.
+        """
+        urls = list(dict.fromkeys(str(url) for url in urls))
+        todo = [
+            url
+            for url in urls
+            if is_img_or_vid(url) and SceneDef.id_and_prefix_from_filename(url) is None
+        ]
+        if len(todo) > 1 and workers > 1:
+            with ThreadPoolExecutor(min(workers, len(todo)), thread_name_prefix='register') as ex:
+                datas = list(ex.map(self.init_data_from_url, todo))
+        else:
+            datas = [self.init_data_from_url(url) for url in todo]
+
+        docs = [self._insert_data_image(data) for data in datas if data is not None]
+        docs = [doc for doc in docs if doc is not None]
+        ids = self._dbc.insert_documents(self._collection_name, docs) or []
+
+        ret: dict[str, str | None] = dict.fromkeys(urls)
+        moves = []
+        for doc, id in zip(docs, ids, strict=False):  # ids is empty if the insert failed
+            move = self._image_move_src_data(self._dbc.to_oid(id), doc)
+            if move is not None:
+                moves.append(move)
+            ret[doc[SceneDef.FIELD_URL_SRC]] = id
+        if moves:
+            self.link_index.move_many(moves)
         return ret
 
     def data_from_url_db(self, url: str | Path) -> dict | None:
@@ -139,7 +186,7 @@ class SceneImageManager:
             return False
         return True
 
-    def _db_insert_image(self, data: dict) -> str | None:
+    def _insert_data_image(self, data: dict) -> dict | None:
         url_src = data.get(SceneDef.FIELD_URL_SRC, None)
         if url_src is None:
             return None
@@ -149,11 +196,7 @@ class SceneImageManager:
         set_data = data.copy()
         set_data.pop(SceneDef.FIELD_OID, None)
         set_data |= {SceneDef.FIELD_URL_PARENT: str(Path(url_src).parent)}
-        id = self._dbc.insert_document(self._collection_name, set_data)
-
-        self.image_move_src(id)
-
-        return id
+        return set_data
 
     def _db_update_image(self, data: dict) -> bool:
         dbc = self._dbc_images
@@ -175,6 +218,56 @@ class SceneImageManager:
             return False
         return True
 
+    def caption_log_push(
+        self,
+        pushes: list[tuple[Any, list[dict], bool]],
+        cap: Optional[int] = None,
+        ts: Optional[float] = None,
+    ) -> bool:
+        """
+        Appends caption_log entries to many images with one `bulk_write`.
+
+        `pushes` holds `(id, entries, clear)` per image. A plain push is a
+        `$push` with `$each` (plus `$slice: -cap` when `cap` is set); `clear`
+        replaces the log with `entries` instead. Only `timestamp_caption_log`
+        is `$set` next to it, so the cost is O(entries) rather than a full
+        document store, and `timestamp_updated` is deliberately left alone.
+        """
+        if ts is None:
+            ts = SceneDef.now_ts()
+        ops = []
+        for id, entries, clear in pushes:
+            oid = self._dbc.to_oid(id)
+            if oid is None:
+                continue
+            if clear:
+                log = entries[-cap:] if cap else entries
+                update = {
+                    '$set': {
+                        SceneDef.FIELD_CAPTION_LOG: log,
+                        SceneDef.FIELD_TIMESTAMP_CAPTION_LOG: ts,
+                    }
+                }
+            elif entries:
+                push: dict[str, Any] = {'$each': entries}
+                if cap:
+                    push['$slice'] = -cap
+                update = {
+                    '$push': {SceneDef.FIELD_CAPTION_LOG: push},
+                    '$set': {SceneDef.FIELD_TIMESTAMP_CAPTION_LOG: ts},
+                }
+            else:
+                continue
+            ops.append(UpdateOne({SceneDef.FIELD_OID: oid}, update))
+        if not ops:
+            return True
+        try:
+            self._collection.bulk_write(ops, ordered=False)
+        except Exception as e:
+            self._log(f'caption_log push failed: {e}', level='error')
+            return False
+        return True
+
     def image_from_id_or_url(self, id_or_url: str | Path) -> Any:
         from .scene_image import SceneImage
 
@@ -188,19 +281,32 @@ class SceneImageManager:
         data = self.data_from_id(oid)
         if data is None:
             return
+        move = self._image_move_src_data(oid, data)
+        if move is not None:
+            self.link_index.move(*move)
+
+    def _image_move_src_data(self, oid: Any, data: dict) -> tuple[str, Path, Any] | None:
+        """
+        Moves the file to its registered name. Returns the (url_src, url_orig, oid) move the
+        link index has to follow (the indexed scene file keeps its row), None if nothing moved.
+        """
+        if oid is None:
+            return None
         url_src = data.get(SceneDef.FIELD_URL_SRC, None)
         if url_src is None:
-            return
+            return None
         url_parent = data.get(SceneDef.FIELD_URL_PARENT, None)
         if url_parent is None:
-            return
+            return None
         if not is_img_or_vid(url_src):
-            return
+            return None
 
         filename_orig = SceneDef.filename_orig_from_id(oid)
         if filename_orig is None:
-            return
+            return None
         url_move_to_new_parent(url_src, url_parent, filename_orig, delete_src=True, exist_ok=True)
+        url_orig = (Path(url_parent) / filename_orig).with_suffix(Path(url_src).suffix)
+        return url_src, url_orig, oid
 
     def ids_img_from_query(self, query: dict, ids: Optional[list[Any]]) -> list[str]:
         if ids is not None:
@@ -0,0 +1,108 @@
+import os
+from pathlib import Path
+from typing import Any, Final, Iterable
+
+import pymongo
+from pymongo import UpdateOne
+
+from .db_connect import DBConnection
+from .scene_common import SceneDef
+
+# (collection, field, unique) lookups the adoption and link paths run per file
+INDEXES: Final = [
+    (SceneDef.COLLECTION_LINKS, SceneDef.FIELD_URL, True),
+    (SceneDef.COLLECTION_LINKS, SceneDef.FIELD_LINK_SCENE_ID, False),
+    (SceneDef.COLLECTION_LINKS, SceneDef.FIELD_LINK_ID_ENH, False),
+    (SceneDef.COLLECTION_LINKS, SceneDef.FIELD_LINK_URL_ORIGIN, False),
+    (SceneDef.COLLECTION_SCENES, SceneDef.FIELD_URL, False),
+    (
+        SceneDef.COLLECTION_SCENES,
+        f'{SceneDef.FIELD_SCENES_LINKED}.{SceneDef.FIELD_IDS_SCENE_ENH}',
+        False,
+    ),
+    (SceneDef.COLLECTION_IMAGES, SceneDef.FIELD_URL, False),
+    (SceneDef.COLLECTION_IMAGES, SceneDef.FIELD_URL_SRC, False),
+]
+
+
+def file_state(url: str | Path) -> dict | None:
+    """The (mtime_ns, size) fields of a link row for url, None if url is gone."""
+    try:
+        st = os.stat(url)
+    except OSError:
+        return None
+    return {SceneDef.FIELD_LINK_MTIME: st.st_mtime_ns, SceneDef.FIELD_LINK_SIZE: st.st_size}
+
+
+class SceneLinkIndex:
+    """
+    Reverse index `scene_links`: image file url -> owning scene, registered image, enhancer
+    scene id, payload url and resolved origin scene. Every lookup is a single indexed query.
+    """
+
+    def __init__(self, dbc: DBConnection) -> None:
+        self._dbc = dbc
+        collection = self._dbc._get_collection(SceneDef.COLLECTION_LINKS)
+        if collection is None:
+            raise (ValueError('SceneLinkIndex DB collection is None!'))
+        self._collection = collection
+        self.ensure_indexes()
+
+    def ensure_indexes(self) -> None:
+        """Creates the lookup indexes (create_index is idempotent, a no-op when they exist)."""
+        for collection_name, field, unique in INDEXES:
+            collection = self._dbc._get_collection(collection_name)
+            if collection is None:
+                continue
+            collection.create_index([(field, pymongo.ASCENDING)], unique=unique)
+
+    def rows_from_urls(self, urls: Iterable[str | Path]) -> dict[str, dict]:
+        query = {SceneDef.FIELD_URL: {'$in': [str(url) for url in urls]}}
+        return {row[SceneDef.FIELD_URL]: row for row in self._collection.find(query)}
+
+    def row_from_url(self, url: str | Path) -> dict | None:
+        return self._collection.find_one({SceneDef.FIELD_URL: str(url)})
+
+    def scene_ids_from_enh_id(self, id_enh: str) -> list[str]:
+        return self._collection.distinct(
+            SceneDef.FIELD_LINK_SCENE_ID, {SceneDef.FIELD_LINK_ID_ENH: id_enh}
+        )
+
+    def put(self, rows: list[dict]) -> None:
+        """Upserts rows (keyed by url) in one bulk write."""
+        if not rows:
+            return
+        ops = [
+            UpdateOne({SceneDef.FIELD_URL: row[SceneDef.FIELD_URL]}, {'$set': row}, upsert=True)
+            for row in rows
+        ]
+        self._collection.bulk_write(ops, ordered=False)
+
+    def drop_scene_except(self, scene_id: str, urls: Iterable[str | Path]) -> int:
+        """Removes the rows of scene_id whose file is not among urls. Returns the count."""
+        result = self._collection.delete_many(
+            {
+                SceneDef.FIELD_LINK_SCENE_ID: scene_id,
+                SceneDef.FIELD_URL: {'$nin': [str(url) for url in urls]},
+            }
+        )
+        return result.deleted_count
+
+    def move(self, url_from: str | Path, url_to: str | Path, image_id: Any = None) -> None:
+        """Follows a renamed file (registration), content and row stay the same."""
+        self.move_many([(url_from, url_to, image_id)])
+
+    def move_many(self, moves: list[tuple[str | Path, str | Path, Any]]) -> None:
+        """move() for many (url_from, url_to, image_id) at once: one delete, one bulk write."""
+        if not moves:
+            return
+        self._collection.delete_many(
+            {SceneDef.FIELD_URL: {'$in': [str(url_to) for _, url_to, _ in moves]}}
+        )
+        ops = []
+        for url_from, url_to, image_id in moves:
+            fields: dict[str, Any] = {SceneDef.FIELD_URL: str(url_to)}
+            if image_id is not None:
+                fields[SceneDef.FIELD_LINK_IMAGE_ID] = str(image_id)
+            ops.append(UpdateOne({SceneDef.FIELD_URL: str(url_from)}, {'$set': fields}))
+        self._collection.bulk_write(ops, ordered=False)
@@ -1,21 +1,37 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Generator
+from typing import Any, Callable, Final, Generator, Iterator
 import filecmp
+import os
 import shutil
 import sys
 import json
 
+from pymongo import UpdateOne
+
 from aidb.scene.db_connect import DBConnection
 from aidb.scene.scene_image_manager import SceneImageManager
 from ait.tools.files import (
+    dir_entries,
+    dir_scan_scope,
     imgs_and_vids_from_url,
     is_img_or_vid,
     subdir_inc,
     is_dir,
 )
 from ait.tools.images import metadata as image_metadata
+from ait.tools.images import thumbnail_to_url
+from ait.tools.metadata_cache import MetadataCache
 
 from .scene_common import AdoptOutcome, SceneDef, SceneConfig
+from .scene_link_index import SceneLinkIndex, file_state
+from .scene_thumbs import ThumbnailPool
+from .scene_watch import SceneJournal
+
+BACKFILL_SHARD: Final = 16  # scene ids per backfill worker task
+
+Links = dict[str, list[str]]  # scene_scan_links result
 
 
 class SceneManager:
@@ -34,6 +50,9 @@ class SceneManager:
             self._verbose = self._dbc._verbose
         self._subdir_scenes = subdir_scenes
         self._collection = SceneDef.COLLECTION_SCENES
+        self._metadata_cache: MetadataCache | None = None
+        self._link_index: SceneLinkIndex | None = None
+        self._thumbnails: ThumbnailPool | None = None
 
     @property
     def config(self):
@@ -54,6 +73,20 @@ class SceneManager:
     def url_thumbs(self) -> Path:
         return self._dbc.config.thumbs_url
 
+    @property
+    def metadata_cache(self) -> MetadataCache:
+        """Image metadata cache shared by the scans and adoptions (opened on first use)."""
+        if self._metadata_cache is None:
+            self._metadata_cache = MetadataCache()
+        return self._metadata_cache
+
+    @property
+    def link_index(self) -> SceneLinkIndex:
+        """Reverse index image file -> scene / enhancer scene / origin (indexes ensured once)."""
+        if self._link_index is None:
+            self._link_index = SceneLinkIndex(self._dbc)
+        return self._link_index
+
     @staticmethod
     def _url_dotfile_path(url: str | Path) -> Path:
         url = Path(url)
@@ -294,15 +327,14 @@ class SceneManager:
         """Register the raw images of freshly imported scenes.
 
         Mirrors the curator flow (``script/aidb_scene.py`` imgs_register):
-        ``register_from_url`` inserts each image doc and renames the file to the
-        ``0rig___<id>`` convention; ``scene.update`` then refreshes the scene so
-        ``imgs_active`` counts the registered images.
+        ``register_from_urls`` inserts the image docs and renames the files to
+        the ``0rig___<id>`` convention; ``scene.update`` then refreshes the
+        scene so ``imgs_active`` counts the registered images.
         """
         im = self.scene_image_manager()
         for oid in scene_ids:
             scene = self.scene_from_id_or_url(oid)
-            for url_img in list(scene.urls_img):
-                im.register_from_url(url_img)
+            im.register_from_urls(list(scene.urls_img))
             scene.update(force=True)
 
     def _scene_new_imgs(self, url_imgs: list[str] | list[Path]) -> None | str:
@@ -487,7 +519,7 @@ class SceneManager:
             self._log(f'scene_adopt_img: not an image file: {url}', level='warning')
             return False
 
-        md = image_metadata(url)
+        md = image_metadata(url, cache=self.metadata_cache)
         id_enh = self._enh_id_from_metadata(md)
         if id_enh is not None:
             return self._adopt_by_enh_id(url, id_enh, move, subdir_new, md)
@@ -703,6 +735,7 @@ class SceneManager:
             self.link_scene_enh(placed, id_enh)
             if id_origin is not None:
                 self.link_scene_db_sourced(placed, id_origin)
+            self._link_index_put(placed, url.name, md, id_origin)
             return AdoptOutcome(placed, id_origin)
 
         if subdir_new is None:
@@ -711,10 +744,16 @@ class SceneManager:
                 level='warning',
             )
             return None
-        return self._scene_new_from_enh(url, id_enh, move, subdir_new, id_origin)
+        return self._scene_new_from_enh(url, id_enh, move, subdir_new, id_origin, md)
 
     def _scene_new_from_enh(
-        self, url: Path, id_enh: str, move: bool, subdir_new: str, id_origin: str | None
+        self,
+        url: Path,
+        id_enh: str,
+        move: bool,
+        subdir_new: str,
+        id_origin: str | None,
+        md: dict | None = None,
     ) -> str | bool:
         """Create a new scene under ``subdir_new`` for an unmatched enhancer
         render: place the file, register the scene doc, seed ``ids_scene_enh``
@@ -738,6 +777,7 @@ class SceneManager:
         self.link_scene_enh(scene_id, id_enh)
         if id_origin is not None:
             self.link_scene_db_sourced(scene_id, id_origin)
+        self._link_index_put(scene_id, url.name, md, id_origin)
         self._log(f'scene_adopt_img: {url.name} -> NEW scene[{scene_id}] ({dir_scene})')
         return AdoptOutcome(scene_id, id_origin)
 
@@ -745,9 +785,13 @@ class SceneManager:
         """Tie-break key for multi-match adoption: newest file mtime in the
         scene folder (folder mtime when it holds no files)."""
         url_scene = self.url_from_id(scene_id)
-        if url_scene is None or not Path(url_scene).is_dir():
+        if url_scene is None:
+            return 0.0
+        try:
+            entries = dir_entries(url_scene)
+        except OSError:
             return 0.0
-        mtimes = [f.stat().st_mtime for f in Path(url_scene).iterdir() if f.is_file()]
+        mtimes = [f.stat().st_mtime for f in entries if f.is_file()]
         return max(mtimes) if mtimes else Path(url_scene).stat().st_mtime
 
     @staticmethod
@@ -761,9 +805,12 @@ class SceneManager:
 
     def scene_ids_from_enh_id(self, id_enh: str) -> list[str]:
         """DB scene ids whose ``scenes_linked.ids_scene_enh`` contains the
-        enhancer scene id."""
+        enhancer scene id, plus the scenes the link index has files of that
+        enhancer scene in (both indexed lookups)."""
         query = {f'{SceneDef.FIELD_SCENES_LINKED}.{SceneDef.FIELD_IDS_SCENE_ENH}': id_enh}
-        return list(self.ids_from_query(query))
+        ids = list(self.ids_from_query(query))
+        ids += [id for id in self.link_index.scene_ids_from_enh_id(id_enh) if id not in ids]
+        return ids
 
     def link_scene_enh(self, scene_id: str, id_enh: str) -> bool:
         """Ensure an enhancer scene id is present in a scene's
@@ -800,10 +847,14 @@ class SceneManager:
         return self.scene_scan_links(scene_id)[SceneDef.FIELD_IDS_SCENE_ENH]
 
     def scene_scan_links(self, scene_id: str) -> dict[str, list[str]]:
-        """Read-only: the enhancer scene ids found in the payloads of a scene
-        folder's images plus the origin DB scenes those payloads' ``url``
-        resolve to — ``{ids_scene_enh: [...], sourced: [...]}``, both dedup'd,
-        self-links excluded from ``sourced``."""
+        """Read-only on the scene docs: the enhancer scene ids found in the
+        payloads of a scene folder's images plus the origin DB scenes those
+        payloads' ``url`` resolve to — ``{ids_scene_enh: [...], sourced:
+        [...]}``, both dedup'd, self-links excluded from ``sourced``.
+
+        Rescans the folder into the link index (`SceneLinkIndex`): only files
+        without a row or changed since (mtime, size) are read, unresolved
+        origins are retried, rows of files gone from the folder are dropped."""
         found: dict[str, list[str]] = {
             SceneDef.FIELD_IDS_SCENE_ENH: [],
             SceneDef.FIELD_LINKED_SOURCED: [],
@@ -811,14 +862,42 @@ class SceneManager:
         url_scene = self.url_from_id(scene_id)
         if url_scene is None or not Path(url_scene).is_dir():
             return found
-        for url_img in imgs_and_vids_from_url(url_scene):
-            md = image_metadata(url_img)
-            id_enh = self._enh_id_from_metadata(md)
+        urls = imgs_and_vids_from_url(url_scene)
+        index = self.link_index
+        rows = index.rows_from_urls(urls)
+        states = {url: file_state(url) for url in urls}
+        stale = [
+            url
+            for url in urls
+            if states[url] is not None
+            and (
+                (row := rows.get(str(url))) is None
+                or row.get(SceneDef.FIELD_LINK_SCENE_ID) != scene_id
+                or any(row.get(k) != v for k, v in states[url].items())
+            )
+        ]
+        mds = self.metadata_cache.metadata_many(stale)
+        new_rows = [self._link_row(scene_id, url, mds[url], states[url]) for url in stale]
+        for row in rows.values():
+            # origin scene registered after the file was indexed
+            url_origin = row.get(SceneDef.FIELD_LINK_URL_ORIGIN)
+            if url_origin and not row.get(SceneDef.FIELD_LINK_ID_ORIGIN):
+                id_origin = self._origin_scene_from_url(url_origin)
+                if id_origin is not None:
+                    row[SceneDef.FIELD_LINK_ID_ORIGIN] = id_origin
+                    new_rows.append({k: v for k, v in row.items() if k != SceneDef.FIELD_OID})
+        index.put(new_rows)
+        index.drop_scene_except(scene_id, urls)
+
+        rows |= {row[SceneDef.FIELD_URL]: row for row in new_rows}
+        for url in urls:
+            row = rows.get(str(url))
+            id_enh = row.get(SceneDef.FIELD_LINK_ID_ENH) if row else None
             if id_enh is None:
                 continue
             if id_enh not in found[SceneDef.FIELD_IDS_SCENE_ENH]:
                 found[SceneDef.FIELD_IDS_SCENE_ENH].append(id_enh)
-            id_origin = self._origin_scene_from_enh(md)
+            id_origin = row.get(SceneDef.FIELD_LINK_ID_ORIGIN)
             if (
                 id_origin is not None
                 and id_origin != scene_id
@@ -827,13 +906,50 @@ class SceneManager:
                 found[SceneDef.FIELD_LINKED_SOURCED].append(id_origin)
         return found
 
+    def _link_row(
+        self,
+        scene_id: str,
+        url: Path,
+        md: dict | None,
+        state: dict | None,
+        id_origin: str | None = None,
+    ) -> dict:
+        """Link index row of a scene folder file from its metadata."""
+        enh = md.get('enhancer') if md else None
+        url_origin = enh.get('url') if isinstance(enh, dict) else None
+        if not isinstance(url_origin, str) or not url_origin:
+            url_origin = None
+        if id_origin is None and url_origin is not None:
+            id_origin = self._origin_scene_from_url(url_origin)
+        id_prefix = SceneDef.id_and_prefix_from_filename(url)
+        return {
+            SceneDef.FIELD_URL: str(url),
+            SceneDef.FIELD_LINK_SCENE_ID: scene_id,
+            SceneDef.FIELD_LINK_IMAGE_ID: id_prefix[0] if id_prefix is not None else None,
+            SceneDef.FIELD_LINK_ID_ENH: self._enh_id_from_metadata(md),
+            SceneDef.FIELD_LINK_URL_ORIGIN: url_origin,
+            SceneDef.FIELD_LINK_ID_ORIGIN: id_origin,
+        } | (state or {})
+
+    def _link_index_put(
+        self, scene_id: str, name: str, md: dict | None, id_origin: str | None
+    ) -> None:
+        """Records an adopted file in the link index, so the next adoption of
+        the same enhancer scene is a single index lookup."""
+        url_scene = self.url_from_id(scene_id)
+        if url_scene is None:
+            return
+        url = Path(url_scene) / name
+        row = self._link_row(scene_id, url, md, file_state(url), id_origin=id_origin)
+        self.link_index.put([row])
+
     def scene_seed_enh_links(self, scene_id: str) -> dict[str, list[str]]:
         """Scan a scene folder's images for enhancer payloads and write the
         found enhancer scene ids into ``scenes_linked.ids_scene_enh`` and the
         payloads' resolved origin scenes into ``scenes_linked.ids_scene_db.
-        sourced``. Returns the `scene_scan_links` result. Shared by the
-        creation-time seeding and the one-time backfill
-        (`script/scenes_linked_backfill.py`)."""
+        sourced``. Returns the `scene_scan_links` result. Used by the
+        creation-time seeding; `scenes_links_backfill` is the bulk form for
+        all scenes (`script/scenes_linked_backfill.py`)."""
         found = self.scene_scan_links(scene_id)
         for id_enh in found[SceneDef.FIELD_IDS_SCENE_ENH]:
             self.link_scene_enh(scene_id, id_enh)
@@ -841,6 +957,118 @@ class SceneManager:
             self.link_scene_db_sourced(scene_id, id_origin)
         return found
 
+    def scenes_links_backfill(
+        self,
+        dry: bool = False,
+        processes: int | None = None,
+        url_checkpoint: str | Path | None = None,
+        on_scene: Callable[[str, Links], None] | None = None,
+    ) -> dict[str, Links]:
+        """`scene_seed_enh_links` for every scene, in bulk. Scene ids are
+        sharded across ``processes`` workers (default: cpu count; <= 1 scans
+        in this process) that read image metadata header-only. The links of
+        each finished shard go out in one `links_bulk_write` and the shard is
+        checkpointed to ``url_checkpoint``, so an interrupted run resumes with
+        the scenes not done yet; the checkpoint is removed when the run
+        completes. ``dry`` scans without writing scene docs; the scans still
+        update the link index like any `scene_scan_links`. Returns the
+        `scene_scan_links` result per scene id; ``on_scene`` gets each one as
+        its shard completes (checkpointed ones first)."""
+        done = self._backfill_checkpoint_read(url_checkpoint, dry)
+        if on_scene is not None:
+            for scene_id, found in done.items():
+                on_scene(scene_id, found)
+        todo = [id for id in self.ids if id not in done]
+        shards = [todo[i : i + BACKFILL_SHARD] for i in range(0, len(todo), BACKFILL_SHARD)]
+
+        def finish(results: dict[str, Links]) -> None:
+            if not dry:
+                self.links_bulk_write(results)
+            done.update(results)
+            self._backfill_checkpoint_write(url_checkpoint, dry, done)
+            if on_scene is not None:
+                for scene_id, found in results.items():
+                    on_scene(scene_id, found)
+
+        if processes is None:
+            processes = os.cpu_count() or 1
+        url_cache = self.metadata_cache.url
+        if processes <= 1 or len(shards) <= 1:
+            scanner = _backfill_scanner(
+                SceneManager(dbc=self._dbc, subdir_scenes=self._subdir_scenes), url_cache
+            )
+            for shard in shards:
+                finish({id: scanner.scene_scan_links(id) for id in shard})
+        else:
+            with ProcessPoolExecutor(
+                min(processes, len(shards)),
+                initializer=_backfill_init,
+                initargs=(self._dbc.config.config, self._subdir_scenes, url_cache),
+            ) as executor:
+                futures = [executor.submit(_backfill_scan, shard) for shard in shards]
+                try:
+                    for future in as_completed(futures):
+                        finish(future.result())
+                except BaseException:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+        if url_checkpoint is not None:
+            Path(url_checkpoint).unlink(missing_ok=True)
+        return done
+
+    def links_bulk_write(self, found: dict[str, Links]) -> int:
+        """Write `scene_scan_links` results per scene id into ``scenes_linked``
+        with one ``bulk_write`` — the same $addToSet (and refused self-links)
+        as `link_scene_enh` / `link_scene_db_sourced`. Returns the number of
+        scene docs addressed."""
+        field_enh = f'{SceneDef.FIELD_SCENES_LINKED}.{SceneDef.FIELD_IDS_SCENE_ENH}'
+        field_sourced = (
+            f'{SceneDef.FIELD_SCENES_LINKED}.{SceneDef.FIELD_IDS_SCENE_DB}'
+            f'.{SceneDef.FIELD_LINKED_SOURCED}'
+        )
+        ops = []
+        for scene_id, links in found.items():
+            oid = self._dbc.to_oid(scene_id)
+            if oid is None:
+                continue
+            enh = links[SceneDef.FIELD_IDS_SCENE_ENH]
+            sourced = [id for id in links[SceneDef.FIELD_LINKED_SOURCED] if id != scene_id]
+            add = {}
+            if enh:
+                add[field_enh] = {'$each': enh}
+            if sourced:
+                add[field_sourced] = {'$each': sourced}
+            if add:
+                ops.append(UpdateOne({SceneDef.FIELD_OID: oid}, {'$addToSet': add}))
+        dbc = self._dbc_scenes
+        if dbc is None or not ops:
+            return 0
+        dbc.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    @staticmethod
+    def _backfill_checkpoint_read(url: str | Path | None, dry: bool) -> dict[str, Links]:
+        # a dry run's checkpoint never counts as written (and vice versa)
+        if url is None or not Path(url).exists():
+            return {}
+        try:
+            data = json.loads(Path(url).read_text())
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get('dry') != dry:
+            return {}
+        return data.get('done') or {}
+
+    @staticmethod
+    def _backfill_checkpoint_write(url: str | Path | None, dry: bool, done: dict) -> None:
+        if url is None:
+            return
+        url = Path(url)
+        url.parent.mkdir(parents=True, exist_ok=True)
+        tmp = url.with_name(url.name + '.tmp')
+        tmp.write_text(json.dumps({'dry': dry, 'done': done}))
+        tmp.replace(url)
+
     def _origin_scene_from_enh(self, md: dict | None) -> str | None:
         """Origin DB scene of an enhancer payload: its ``url`` (the enhancer
         scene's canonical image path) resolved as a registered image
@@ -853,6 +1081,13 @@ class SceneManager:
         url = enh.get('url') if isinstance(enh, dict) else None
         if not isinstance(url, str) or not url:
             return None
+        return self._origin_scene_from_url(url)
+
+    def _origin_scene_from_url(self, url: str) -> str | None:
+        # an indexed scene file answers in one lookup
+        row = self.link_index.row_from_url(url)
+        if row is not None and row.get(SceneDef.FIELD_LINK_SCENE_ID):
+            return row[SceneDef.FIELD_LINK_SCENE_ID]
         scene_id = self._scene_of_registered_img(url)
         if scene_id:
             return scene_id
@@ -871,7 +1106,7 @@ class SceneManager:
             return scene_id
 
         if md is None:
-            md = image_metadata(url)
+            md = image_metadata(url, cache=self.metadata_cache)
         parent = md.get('parent') if md else None
         for _ in range(8):
             if not isinstance(parent, dict):
@@ -899,22 +1134,70 @@ class SceneManager:
             return img.scene_id if img is not None else None
         return None
 
-    def scenes_update(self) -> None:
+    def scenes_update(self, journal: SceneJournal | None = None) -> None:
+        """
+        Updates all scenes, or with a `SceneJournal` (see scene_watch) only the scenes whose
+        folders changed since the last take. A journal that lost changes updates all scenes.
+        """
         from .scene import Scene
 
-        for id in self.ids:
+        ids: Any = self.ids
+        if journal is not None:
+            changes, lost = journal.take()
+            if lost:
+                self._log('scene journal lost changes, updating all scenes', level='warning')
+            else:
+                ids = self._ids_from_journal(changes)
+
+        # scene.update lists its folder several times; stat each folder once per pass
+        with dir_scan_scope(), self.thumbnail_scope():
+            for id in ids:
+                try:
+                    scene = Scene(self, id)
+                except FileNotFoundError as e:
+                    self._log(str(e), level='warning')
+                    continue
+                except ValueError as e:
+                    self._log(str(e), level='warning')
+                    continue
+                scene.update()
+
+    @contextmanager
+    def thumbnail_scope(self, processes: int | None = None) -> Iterator[ThumbnailPool]:
+        """
+        Within the scope `thumbnail_submit` enqueues on a process pool (see scene_thumbs),
+        leaving it waits for the thumbnails. Nested scopes share the outer pool.
+        """
+        if self._thumbnails is not None:
+            yield self._thumbnails
+            return
+        with ThumbnailPool(processes=processes, verbose=self._verbose) as pool:
+            self._thumbnails = pool
             try:
-                scene = Scene(self, id)
-            except FileNotFoundError as e:
-                self._log(str(e), level='warning')
-                continue
-            except ValueError as e:
-                self._log(str(e), level='warning')
+                yield pool
+            finally:
+                self._thumbnails = None
+
+    def thumbnail_submit(self, url_from: str | Path, url_to: str | Path) -> bool:
+        """Writes a scene thumbnail, on the pool of an active `thumbnail_scope` if any."""
+        size = self.config.thumbs_size
+        if self._thumbnails is not None:
+            return self._thumbnails.submit(url_from, url_to, size)
+        thumbnail_to_url(url_from, url_to, size=size)
+        return True
+
+    def _ids_from_journal(self, changes: dict[Path, dict[str, str]]) -> list[str]:
+        ids = []
+        for url_dir in changes:
+            data = self.data_from_url_db(url_dir)
+            if data is None:
+                self._log(f'changed folder is no scene: {url_dir}', level='debug')
                 continue
-            scene.update()
+            ids.append(str(data.get(SceneDef.FIELD_OID, '')))
+        return ids
 
     def scene_image_manager(self) -> SceneImageManager:
-        return SceneImageManager(dbc=self._dbc)
+        return SceneImageManager(dbc=self._dbc, link_index=self.link_index)
 
     def scene_set_manager(self) -> Any:
         from .scene_set_manager import SceneSetManager
@@ -941,3 +1224,24 @@ class SceneManager:
     def _log(self, msg: str, level: str = 'info') -> None:
         if self._verbose > 0:
             print(f'[scm:{level}] {msg}', file=sys.stderr)
+
+
+def _backfill_scanner(scm: SceneManager, url_cache: Path) -> SceneManager:
+    # scans of a backfill only need the text chunks: no pixel decode
+    scm._metadata_cache = MetadataCache(url_cache, header_only=True)
+    return scm
+
+
+_backfill_scm: SceneManager | None = None  # per worker process
+
+
+def _backfill_init(config: SceneConfig, subdir_scenes: str | None, url_cache: Path) -> None:
+    global _backfill_scm
+    _backfill_scm = _backfill_scanner(
+        SceneManager(config=config, subdir_scenes=subdir_scenes, verbose=0), url_cache
+    )
+
+
+def _backfill_scan(ids: list[str]) -> dict[str, Links]:
+    assert _backfill_scm is not None
+    return {id: _backfill_scm.scene_scan_links(id) for id in ids}
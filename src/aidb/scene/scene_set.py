@@ -1,4 +1,5 @@
 import pprint
+from collections import Counter
 from typing import Final, Generator
 
 from jsonlines import jsonlines
@@ -215,6 +216,7 @@ class SceneSet:
         ratios = self.data.get(SceneDef.FIELD_RATIOS, SceneDef.DEFAULT_RATIOS)
         ratios = [float(ratio) for ratio in ratios]
         resolutions = self.data.get(SceneDef.FIELD_RESOLUTIONS, SceneDef.DEFAULT_RESOLUTIONS)
+        buckets: Counter = Counter()
 
         for img in self.imgs_for_query(effective_query):
             img: SceneImage
@@ -222,7 +224,7 @@ class SceneSet:
             if pil is None:
                 continue
             metadata.append(img.train_metadata_jsonl)
-            pil_train = train_from_image(pil, ratios=ratios, resolutions=resolutions)
+            pil_train = train_from_image(pil, ratios=ratios, resolutions=resolutions, stats=buckets)
             if pil_train is None:
                 continue
             url_trainfile = root_train / img.filename_train_from_data
@@ -232,6 +234,11 @@ class SceneSet:
         url_metafile = root_train / HFDataset.FILE_META
         with jsonlines.open(url_metafile, mode='w') as writer:
             writer.write_all(metadata)
+        self._ssm._log(
+            f'{self.name}: {buckets.total()} train imgs, '
+            + ', '.join(f'{w}x{h}: {n}' for (w, h), n in sorted(buckets.items())),
+            level='info',
+        )
 
     def __str__(self) -> str:
         ret = 'data: ' + pprint.pformat(self.data)
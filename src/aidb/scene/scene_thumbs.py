@@ -0,0 +1,72 @@
+"""Scene thumbnail regeneration on a process pool.
+
+`Scene.update` decides whether the grid thumbnail is stale (its mtime is
+the one of its source image, see `ait.tools.images.thumbnail_stale`) and
+hands the work to `SceneManager.thumbnail_submit`. Inside
+`SceneManager.thumbnail_scope()` the submit only enqueues it on a
+ThumbnailPool and the scope waits for the pool on exit; outside it the
+thumbnail is written right away. Workers write each thumbnail atomically
+(`ait.tools.images.thumbnail_to_url`), a reader never sees a partial file.
+"""
+
+import os
+import sys
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+from ait.tools.images import thumbnail_to_url
+
+
+class ThumbnailPool:
+    """
+    Writes thumbnails on up to `processes` worker processes (default cpu count), started
+    with the first submit. Usable as a context manager, leaving it waits for all of them.
+    """
+
+    def __init__(self, processes: int | None = None, verbose: int = 1) -> None:
+        self.processes = processes if processes is not None else os.cpu_count() or 1
+        self._verbose = verbose
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending: dict[Path, Future] = {}
+
+    def __enter__(self) -> 'ThumbnailPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def submit(self, url_from: str | Path, url_to: str | Path, size: int) -> bool:
+        """Enqueues a thumbnail, False if url_to is already pending."""
+        url_to = Path(url_to)
+        if url_to in self._pending:
+            return False
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.processes)
+        self._pending[url_to] = self._executor.submit(thumbnail_to_url, url_from, url_to, size)
+        return True
+
+    def wait(self) -> int:
+        """Waits for every pending thumbnail, returns the number of failed ones (logged)."""
+        failed = 0
+        for url_to, future in self._pending.items():
+            error = future.exception()
+            if error is not None:
+                failed += 1
+                self._log(f'thumbnail {url_to.name} failed: {error}', level='warning')
+        self._pending = {}
+        return failed
+
+    def close(self) -> None:
+        try:
+            self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def _log(self, msg: str, level: str = 'info') -> None:
+        if self._verbose > 0:
+            print(f'[thumbs:{level}] {msg}', file=sys.stderr)
@@ -0,0 +1,349 @@
+"""Live change journal of the scene folders.
+
+A SceneWatcher follows a scene root (all folders below it) and records every
+created, deleted or modified image, video or scene dotfile per folder in a
+SceneJournal. `SceneManager.scenes_update(journal=...)` consumes the journal
+and updates only the scenes whose folders changed, so an update pass costs
+what changed instead of the whole library.
+
+Linux inotify is used through libc (ctypes); elsewhere, or when inotify is
+not available, a poller diffs folder snapshots every `interval` seconds.
+Changes that cannot be attributed (inotify queue overflow, a watched folder
+moved out of the root, the watch limit reached) mark the journal as lost, which makes the
+next consumer run a full update. Changes before `start()` are not seen.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Final, Literal
+
+from ait.tools.files import SUFFIXES_IMG_VID
+
+from .scene_common import SceneDef
+
+POLL_INTERVAL: Final = 2.0  # seconds, poll backend
+READ_TIMEOUT: Final = 0.5  # seconds, inotify backend (stop latency)
+
+CREATED: Final = 'created'
+DELETED: Final = 'deleted'
+MODIFIED: Final = 'modified'
+
+# <sys/inotify.h>
+_IN_CLOSE_WRITE: Final = 0x00000008
+_IN_MOVED_FROM: Final = 0x00000040
+_IN_MOVED_TO: Final = 0x00000080
+_IN_CREATE: Final = 0x00000100
+_IN_DELETE: Final = 0x00000200
+_IN_DELETE_SELF: Final = 0x00000400
+_IN_MOVE_SELF: Final = 0x00000800
+_IN_Q_OVERFLOW: Final = 0x00004000
+_IN_IGNORED: Final = 0x00008000
+_IN_ONLYDIR: Final = 0x01000000
+_IN_ISDIR: Final = 0x40000000
+_IN_MASK: Final = (
+    _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+    | _IN_ONLYDIR
+)
+_EVENT: Final = struct.Struct('iIII')  # wd, mask, cookie, len; name follows
+
+
+def is_scene_file(name: str) -> bool:
+    """True for the files a scene update depends on: images, videos and the scene dotfile."""
+    return name == SceneDef.DOTFILE_SCENE or Path(name).suffix in SUFFIXES_IMG_VID
+
+
+class SceneJournal:
+    """
+    Thread-safe journal `folder -> {filename: created|deleted|modified}`.
+    Repeated changes of a file are coalesced: created+modified stays created, created+deleted
+    leaves the folder dirty without the file.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._changes: dict[Path, dict[str, str]] = {}
+        self._lost = False
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._changes)
+
+    def record(self, url_dir: str | Path, name: str, kind: str) -> None:
+        with self._lock:
+            changes = self._changes.setdefault(Path(url_dir), {})
+            prev = changes.get(name)
+            if prev == CREATED and kind == MODIFIED:
+                return
+            if prev == CREATED and kind == DELETED:
+                del changes[name]
+                return
+            changes[name] = kind
+
+    def mark_lost(self) -> None:
+        """Changes were missed; the next consumer has to run a full update."""
+        with self._lock:
+            self._lost = True
+
+    def take(self) -> tuple[dict[Path, dict[str, str]], bool]:
+        """Returns and clears (changes per folder, lost)."""
+        with self._lock:
+            changes, lost = self._changes, self._lost
+            self._changes, self._lost = {}, False
+        return changes, lost
+
+
+class _Inotify:
+    def __init__(self) -> None:
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, 'inotify is linux only')
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, url: Path) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(url), _IN_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(url))
+        return wd
+
+    def read(self, timeout: float) -> list[tuple[int, int, int, str]]:
+        """(wd, mask, cookie, name) of the pending events, waits up to timeout for the first."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(buf):
+            wd, mask, cookie, size = _EVENT.unpack_from(buf, offset)
+            offset += _EVENT.size
+            name = buf[offset : offset + size].rstrip(b'\0')
+            offset += size
+            events.append((wd, mask, cookie, os.fsdecode(name)))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _subdirs(url: Path) -> list[Path]:
+    """url and every folder below it, dot folders excluded."""
+    dirs = [url]
+    for url_dir in dirs:
+        try:
+            with os.scandir(url_dir) as it:
+                dirs += [
+                    Path(e.path)
+                    for e in it
+                    if e.is_dir(follow_symlinks=False) and not e.name.startswith('.')
+                ]
+        except OSError:
+            continue
+    return dirs
+
+
+def _snapshot(url_dir: Path) -> dict[str, tuple[int, int]]:
+    files = {}
+    try:
+        with os.scandir(url_dir) as it:
+            for e in it:
+                if is_scene_file(e.name) and e.is_file():
+                    st = e.stat()
+                    files[e.name] = (st.st_size, st.st_mtime_ns)
+    except OSError:
+        pass
+    return files
+
+
+class SceneWatcher:
+    """
+    Watches url_root and records scene file changes into journal (a new one if None).
+    backend 'auto' prefers inotify and falls back to polling every interval seconds.
+    Use as context manager or start()/stop().
+    """
+
+    def __init__(
+        self,
+        url_root: str | Path,
+        journal: SceneJournal | None = None,
+        backend: Literal['auto', 'inotify', 'poll'] = 'auto',
+        interval: float = POLL_INTERVAL,
+        verbose: int = 1,
+    ) -> None:
+        self.url_root = Path(url_root)
+        self.journal = journal if journal is not None else SceneJournal()
+        self.interval = interval
+        self._verbose = verbose
+        self._inotify: _Inotify | None = None
+        self.backend = 'poll'
+        if backend in ('auto', 'inotify'):
+            try:
+                _Inotify().close()
+                self.backend = 'inotify'
+            except (OSError, AttributeError) as e:
+                if backend == 'inotify':
+                    raise
+                self._log(f'inotify unavailable ({e}), polling', level='warning')
+        self._wds: dict[int, Path] = {}
+        self._moved_from: dict[int, Path] = {}  # cookie -> folder moved away, until its IN_MOVED_TO
+        self._snapshots: dict[Path, dict[str, tuple[int, int]]] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> 'SceneWatcher':
+        if self._thread is not None:
+            return self
+        if self.backend == 'inotify':
+            self._inotify = _Inotify()
+            self._watch_tree(self.url_root, record=False)
+            run = self._run_inotify
+        else:
+            self._snapshots = {d: _snapshot(d) for d in _subdirs(self.url_root)}
+            run = self._run_poll
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name='scene-watch', daemon=True)
+        self._thread.start()
+        self._log(f'watching {self.url_root} ({self.backend})')
+        return self
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+            self._wds.clear()
+            self._moved_from.clear()
+
+    def __enter__(self) -> 'SceneWatcher':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # inotify
+
+    def _watch_tree(self, url: Path, record: bool) -> None:
+        """Watches url and its subfolders; record=True journals their files as created."""
+        assert self._inotify is not None
+        for url_dir in _subdirs(url):
+            try:
+                self._wds[self._inotify.add_watch(url_dir)] = url_dir
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    self._log(f'cannot watch {url_dir}: {e}', level='error')
+                    self.journal.mark_lost()
+                continue
+            if record:
+                for name in _snapshot(url_dir):
+                    self.journal.record(url_dir, name, CREATED)
+
+    def _unwatch_tree(self, url: Path) -> None:
+        for wd, url_dir in list(self._wds.items()):
+            if url_dir == url or url_dir.is_relative_to(url):
+                del self._wds[wd]
+
+    def _move_tree(self, url_src: Path, url_dst: Path) -> None:
+        """Repoints the watches of a folder renamed inside the root, journals its files as moved."""
+        for wd, url_dir in list(self._wds.items()):
+            if url_dir == url_src or url_dir.is_relative_to(url_src):
+                self._wds[wd] = url_dst / url_dir.relative_to(url_src)
+        for url_dir in _subdirs(url_dst):
+            for name in _snapshot(url_dir):
+                self.journal.record(url_src / url_dir.relative_to(url_dst), name, DELETED)
+                self.journal.record(url_dir, name, CREATED)
+
+    def _run_inotify(self) -> None:
+        assert self._inotify is not None
+        while not self._stop.is_set():
+            for wd, mask, cookie, name in self._inotify.read(READ_TIMEOUT):
+                self._on_event(wd, mask, name, cookie)
+
+    def _on_event(self, wd: int, mask: int, name: str, cookie: int = 0) -> None:
+        if mask & _IN_Q_OVERFLOW:
+            self._log('inotify queue overflow, changes lost', level='warning')
+            self.journal.mark_lost()
+            return
+        url_dir = self._wds.get(wd)
+        if url_dir is None:
+            return
+        if mask & _IN_IGNORED:
+            self._wds.pop(wd, None)
+            return
+        if mask & _IN_MOVE_SELF:
+            # a rename inside the root was repointed by the parent's IN_MOVED_TO (same wd);
+            # a folder that left the root lives on elsewhere and its paths are stale
+            if url_dir.is_dir():
+                return
+            self._unwatch_tree(url_dir)
+            self._moved_from = {
+                c: url for c, url in self._moved_from.items() if not url.is_relative_to(url_dir)
+            }
+            self.journal.mark_lost()
+            return
+        if mask & _IN_DELETE_SELF:
+            return
+        if mask & _IN_ISDIR:
+            if name.startswith('.'):
+                return
+            if mask & _IN_MOVED_FROM:
+                self._moved_from[cookie] = url_dir / name
+            elif mask & _IN_MOVED_TO and cookie in self._moved_from:
+                self._move_tree(self._moved_from.pop(cookie), url_dir / name)
+            elif mask & (_IN_CREATE | _IN_MOVED_TO):
+                self._watch_tree(url_dir / name, record=True)
+            return
+        if not is_scene_file(name):
+            return
+        if mask & (_IN_CREATE | _IN_MOVED_TO):
+            self.journal.record(url_dir, name, CREATED)
+        elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+            self.journal.record(url_dir, name, DELETED)
+        elif mask & _IN_CLOSE_WRITE:
+            self.journal.record(url_dir, name, MODIFIED)
+
+    # poll
+
+    def _run_poll(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def poll(self) -> None:
+        """Diffs the folder snapshots once (poll backend)."""
+        snapshots = {d: _snapshot(d) for d in _subdirs(self.url_root)}
+        for url_dir in snapshots.keys() | self._snapshots.keys():
+            old = self._snapshots.get(url_dir, {})
+            new = snapshots.get(url_dir, {})
+            for name in new.keys() - old.keys():
+                self.journal.record(url_dir, name, CREATED)
+            for name in old.keys() - new.keys():
+                self.journal.record(url_dir, name, DELETED)
+            for name in new.keys() & old.keys():
+                if new[name] != old[name]:
+                    self.journal.record(url_dir, name, MODIFIED)
+        self._snapshots = snapshots
+
+    def _log(self, msg: str, level: str = 'info') -> None:
+        if self._verbose > 0:
+            print(f'[watch:{level}] {msg}', file=sys.stderr)
@@ -1,7 +1,11 @@
 """Helpers that write `caption_log` entries onto SceneImage documents.
 
-Each entry is appended to `SceneDef.FIELD_CAPTION_LOG` and `db_store()`d
-immediately so a crash mid-pipeline still leaves a readable trail.
+Each entry is appended to `SceneDef.FIELD_CAPTION_LOG` with a targeted
+`$push` (plus a `timestamp_caption_log` `$set`) — never a full
+`db_store()` — so logging costs O(entry), not O(history). Without a sink
+every helper pushes immediately, so a crash mid-pipeline still leaves a
+readable trail. Pass a `CaptionLogSink` to buffer the entries of one
+pipeline step and flush them in a single `bulk_write`.
 
 Three entry shapes are produced by the /imgs_caption pipeline today:
 
@@ -23,7 +27,12 @@ Storage choices (audit-trail vs noise):
   recorded.
 
 Callers pass the SceneImage instance plus the payload kwargs. The helper
-fills in `ts` and `stage`, appends, and persists.
+fills in `ts` and `stage`, appends, and persists (or buffers, with `sink=`).
+
+    with CaptionLogSink() as sink:          # one pipeline step
+        for simg in imgs:
+            log_audit(simg, when='audit_before', caption=c, sink=sink)
+    # leaving the block flushes every buffered entry in one bulk_write
 """
 from __future__ import annotations
 
@@ -31,7 +40,7 @@ import time
 from contextlib import contextmanager
 from typing import Any, Iterator, Optional, TYPE_CHECKING
 
-from aidb import SceneImage
+from aidb import SceneImage, SceneImageManager
 from aidb.scene.scene_common import SceneDef
 
 from . import joy_client
@@ -40,6 +49,82 @@ if TYPE_CHECKING:
     from .skin import Skin
 
 
+class CaptionLogSink:
+    """Buffers caption_log entries per image and flushes them in bulk.
+
+    Entries are stamped (`ts`) when appended, held until `flush()` and then
+    written per image manager with one `SceneImageManager.caption_log_push`
+    (`$push` + `$each`, optional `$slice` cap). A pending `clear()` turns
+    that image's push into a replacing `$set`. After a successful flush the
+    entries are mirrored into each SceneImage's in-memory document, so a
+    later `db_store()` re-sets the same log instead of dropping them.
+
+    Used as a context manager it flushes on exit — also when the step
+    raises, so entries logged before the failure are kept.
+    """
+
+    def __init__(self, cap: Optional[int] = None) -> None:
+        # cap: keep only the newest `cap` entries per image (`$slice`).
+        self.cap = cap
+        self._pending: dict[str, tuple[SceneImage, list[dict], bool]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(entries) for _, entries, _ in self._pending.values())
+
+    def __enter__(self) -> 'CaptionLogSink':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.flush()
+
+    def append(self, simg: SceneImage, entry: dict) -> None:
+        if not isinstance(entry, dict):
+            return
+        e = dict(entry)
+        e.setdefault('ts', SceneDef.now_ts())
+        _, entries, clear = self._pending.get(simg.id, (simg, [], False))
+        entries.append(e)
+        self._pending[simg.id] = (simg, entries, clear)
+
+    def clear(self, simg: SceneImage) -> None:
+        """Drop the image's persisted log (and anything buffered) on flush."""
+        self._pending[simg.id] = (simg, [], True)
+
+    def flush(self) -> bool:
+        """Write all buffered entries; returns False if any bulk write failed.
+        Failed batches are dropped, not retried — logging is best-effort."""
+        if not self._pending:
+            return True
+        by_im: dict[int, tuple[SceneImageManager, list[tuple[SceneImage, list[dict], bool]]]] = {}
+        for simg, entries, clear in self._pending.values():
+            im = simg._im
+            by_im.setdefault(id(im), (im, []))[1].append((simg, entries, clear))
+        self._pending = {}
+
+        ok = True
+        for im, items in by_im.values():
+            ts = SceneDef.now_ts()
+            pushes = [(simg.id, entries, clear) for simg, entries, clear in items]
+            if not im.caption_log_push(pushes, cap=self.cap, ts=ts):
+                ok = False
+                continue
+            for simg, entries, clear in items:
+                simg.caption_log_mirror(entries, clear=clear, cap=self.cap, ts=ts)
+        return ok
+
+
+def _sink_append(
+    simg: SceneImage, entry: dict, sink: Optional[CaptionLogSink], clear: bool = False
+) -> None:
+    """Route one entry through `sink`, or push it right away without one."""
+    target = sink if sink is not None else CaptionLogSink()
+    if clear:
+        target.clear(simg)
+    target.append(simg, entry)
+    if sink is None:
+        target.flush()
+
+
 def _skin_ref(skin: Optional['Skin']) -> dict[str, str]:
     """Build the {'skin_name', 'skin_source_hash'} marker stored on each
     joy-call entry, replacing the full directive text. Reads the hash
@@ -59,7 +144,13 @@ def _skin_ref(skin: Optional['Skin']) -> dict[str, str]:
     return {'skin_name': str(name), 'skin_source_hash': str(h)}
 
 
-def start_run(simg: SceneImage, *, clear: bool = True, run_tag: str = '') -> None:
+def start_run(
+    simg: SceneImage,
+    *,
+    clear: bool = True,
+    run_tag: str = '',
+    sink: Optional[CaptionLogSink] = None,
+) -> None:
     """Open a fresh caption_log run on an image.
 
     By default the prior log is cleared so the new /imgs_caption invocation
@@ -67,13 +158,11 @@ def start_run(simg: SceneImage, *, clear: bool = True, run_tag: str = '') -> Non
     A leading 'run_start' marker captures the run tag (e.g. command name)
     and timestamp so each run is delimited in the persisted history.
     """
-    if clear:
-        simg.clear_caption_log()
-    simg.append_caption_log({
+    entry = {
         'stage': 'run_start',
         'run_tag': run_tag or '',
-    })
-    simg.db_store()
+    }
+    _sink_append(simg, entry, sink, clear=clear)
 
 
 def log_joy_call(
@@ -85,6 +174,7 @@ def log_joy_call(
     response_caption: str,
     elapsed_seconds: float,
     adapter: str = 'default',
+    sink: Optional[CaptionLogSink] = None,
 ) -> None:
     """Append one joy round-trip to the image's caption_log.
 
@@ -106,8 +196,7 @@ def log_joy_call(
         'adapter': adapter,
     }
     entry.update(_skin_ref(skin))
-    simg.append_caption_log(entry)
-    simg.db_store()
+    _sink_append(simg, entry, sink)
 
 
 def log_audit(
@@ -120,6 +209,7 @@ def log_audit(
     missing_triggers: Optional[list] = None,
     extra_flags: Optional[dict[str, Any]] = None,
     fixes_applied: Optional[list] = None,
+    sink: Optional[CaptionLogSink] = None,
 ) -> None:
     """Append a Stage-3 audit snapshot.
 
@@ -143,8 +233,7 @@ def log_audit(
         entry['extra_flags'] = dict(extra_flags)
     if fixes_applied is not None:
         entry['fixes_applied'] = list(fixes_applied)
-    simg.append_caption_log(entry)
-    simg.db_store()
+    _sink_append(simg, entry, sink)
 
 
 @contextmanager
@@ -156,6 +245,7 @@ def joy_call(
     user_content: str,
     skin: Optional['Skin'],
     adapter: str = 'default',
+    sink: Optional[CaptionLogSink] = None,
 ) -> Iterator[tuple[str, str]]:
     """Context manager wrapping `joy_client.caption()` with auto-logging.
 
@@ -183,5 +273,6 @@ def joy_call(
         response_caption=caption,
         elapsed_seconds=elapsed,
         adapter=adapter,
+        sink=sink,
     )
     yield prompt, caption
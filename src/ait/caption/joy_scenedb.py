@@ -58,7 +58,7 @@ class JoySceneDB:
     # ---- public API ----
 
     def caption_image(
-        self, image_id: str
+        self, image_id: str, sink: Optional[caption_log.CaptionLogSink] = None
     ) -> tuple[Optional[str], Optional[str]]:
         """Caption a single SceneImage. Returns (prompt, caption) or (None, None).
 
@@ -68,6 +68,8 @@ class JoySceneDB:
         - routes the caption call through joy_client to the running
           joy_server,
         - runs post-caption validators as logged warnings.
+
+        The caption_log entry is pushed right away, or buffered in `sink`.
         """
         try:
             simg = cast(SceneImage, self._sim.img_from_id(image_id))
@@ -128,6 +130,7 @@ class JoySceneDB:
                 response_caption=caption or '',
                 elapsed_seconds=elapsed,
                 adapter='default',
+                sink=sink,
             )
         except Exception as e:
             self._log(f'caption_log append failed: {e}', 'warn')
@@ -143,17 +146,19 @@ class JoySceneDB:
 
     def caption_images(self, image_ids: list[str]) -> dict[str, dict[str, str]]:
         """Batch helper: returns {image_id: {prompt, caption}} for every
-        successfully captioned image.
+        successfully captioned image. The caption_log entries of the whole
+        batch are flushed with one bulk write at the end.
         """
         ret: dict[str, dict[str, str]] = {}
-        for iid in image_ids:
-            prompt, caption = self.caption_image(iid)
-            if caption is None:
-                continue
-            ret[iid] = {
-                SceneDef.FIELD_PROMPT: prompt or '',
-                SceneDef.FIELD_CAPTION: caption,
-            }
+        with caption_log.CaptionLogSink() as sink:
+            for iid in image_ids:
+                prompt, caption = self.caption_image(iid, sink=sink)
+                if caption is None:
+                    continue
+                ret[iid] = {
+                    SceneDef.FIELD_PROMPT: prompt or '',
+                    SceneDef.FIELD_CAPTION: caption,
+                }
         return ret
 
     # ---- internals ----
@@ -1,7 +1,9 @@
 from .ainstall import AInstallerDB, AInstaller, snapshot_from_db
+from .ledger import InstallLedger
 
 __all__ = [
     'AInstallerDB',
     'AInstaller',
+    'InstallLedger',
     'snapshot_from_db',
 ]
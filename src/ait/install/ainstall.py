@@ -1,27 +1,38 @@
 import os
-import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Final, Generator, Literal, Any
 import json
 from huggingface_hub import hf_hub_download, snapshot_download
 
-import requests
-from tqdm import tqdm
-from git import Repo  # pip install gitpython
-import time
+from git import InvalidGitRepositoryError, NoSuchPathError, Repo  # pip install gitpython
 import urllib.request
 from pathlib import Path
 from urllib.parse import urlparse, parse_qs, unquote
 from pprint import pprint
 
-AIT_PATH_CONF: Final = f'{os.environ["CONF_AIT"]}/models'
+from .download import download
+from .ledger import LEDGER_NAME, InstallLedger, entry_hash, files_state, hf_revision
+
 AIT_PATH_CACHE: Final = f'{os.environ["HOME"]}/.cache/ainstall'
 AIT_MODEL_PREFIXES: Final = ['models_', 'ainst_']
 
 
+def _path_conf() -> str:
+    # read from the environment on use: importing needs no CONF_AIT
+    return f'{os.environ["CONF_AIT"]}/models'
+
+
+def __getattr__(name: str) -> Any:
+    if name == 'AIT_PATH_CONF':
+        return _path_conf()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
 class AInstallerDB:
-    def __init__(self, srcdir: str = AIT_PATH_CONF, prefixes: list[str] = AIT_MODEL_PREFIXES):
+    def __init__(self, srcdir: str | None = None, prefixes: list[str] = AIT_MODEL_PREFIXES) -> None:
         self._db: dict = {}
-        self._srcdir: Path = Path(srcdir)
+        self._srcdir: Path = Path(srcdir if srcdir is not None else _path_conf())
         self._prefixes: list[str] = prefixes
 
         self._make()
@@ -85,17 +96,34 @@ def snapshot_from_db(group: str, variant: str, target: str = 'model') -> Path:
     resolved via `AInstallerDB` and downloaded through the same HF snapshot
     path (incl. `HF_TOKEN` handling) that `AInstaller` uses for file-less HF
     items — for runtime loaders (e.g. `ait.tools.images.embed`) that need the
-    files in place without an install tree to symlink into.
+    files in place without an install tree to symlink into. A snapshot recorded in
+    the install ledger with unchanged files is returned offline.
     """
     repo_ids = AInstallerDB().repo_ids(group, variant, target)
     if not repo_ids:
         raise KeyError(f'AInstallerDB: no {target} configured for {group}:{variant}')
+    ledger = InstallLedger(Path(AIT_PATH_CACHE) / LEDGER_NAME)
+    link = ledger.snapshot(repo_ids[0])
+    if link is not None:
+        return link
     hf_token = os.environ.get('HF_TOKEN') or None
-    return Path(snapshot_download(repo_id=repo_ids[0], token=hf_token))
+    link = Path(snapshot_download(repo_id=repo_ids[0], token=hf_token))
+    ledger.put(
+        f'snapshot:{repo_ids[0]}',
+        {
+            'repo_id': repo_ids[0],
+            'revision': link.name,
+            'files': files_state([link]),
+            'snapshot': repo_ids[0],
+            'snapshot_dir': str(link),
+        },
+    )
+    return link
 
 
 class AInstaller:
-    CHUNK_SIZE: Final = 1638400
+    WORKERS: Final = 4  # concurrent item installs (downloads, clones)
+    SEGMENTS: Final = 8  # concurrent Range requests per large file
     CIVITAI_RED_BASE: Final = 'https://civitai.red/api/download/models/'
     USER_AGENT: Final = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'  # noqa
 
@@ -105,6 +133,8 @@ class AInstaller:
         group: str = '',
         method: Literal['comfyui', 'diffpipe'] = 'comfyui',
         verbose: bool = False,
+        workers: int = WORKERS,
+        segments: int = SEGMENTS,
     ):
         self.db = AInstallerDB().db
         self._cache = Path(AIT_PATH_CACHE)
@@ -124,13 +154,24 @@ class AInstaller:
         self.token_cai = os.environ.get('CAI_TOKEN', '')
 
         self.verbose = verbose
+        self.workers = max(1, workers)
+        self.segments = max(1, segments)
+        self.ledger = InstallLedger(self._cache / LEDGER_NAME)
+        # items resolving to the same cache file share its .part: one download at a time per file
+        self._download_locks: dict[Path, threading.Lock] = {}
+        self._download_locks_guard = threading.Lock()
 
         self.install()
 
     def install(self):
-        for item in self._items:
+        # items are installed concurrently, results are bound in config order
+        items = list(self._items)
+        with ThreadPoolExecutor(self.workers) as executor:
+            futures = [executor.submit(self._install_item, item) for item in items]
+
+        for item, future in zip(items, futures, strict=True):
             try:
-                item = self._install_item(item)
+                item = future.result()
             except Exception as e:
                 print(f"warning: couldn't install {item}: {e}")
                 continue
@@ -271,7 +312,39 @@ class AInstaller:
             item = setup(item)
         else:
             print(f'warning: no item setup for type[{item["type"]}]')
-        return self._install_item_generic(item)
+
+        # fast path: an unchanged entry whose recorded files are still in place
+        key = entry_hash(item)
+        if not item['config'].get('force', False):
+            record = self.ledger.satisfied(key)
+            if record is not None:
+                return self._install_item_recorded(item, record)
+
+        item = self._install_item_generic(item)
+        if 'files' in item:  # set by the install methods on success only
+            self.ledger.put(key, self._ledger_record(item))
+        return item
+
+    def _install_item_recorded(self, item: dict, record: dict) -> dict:
+        method = item['config'].get('method_download', '')
+        print(f'[{method}] installed {self._descriptor_item(item)} (ledger)')
+        if record.get('link') is not None:
+            item['link'] = record['link']
+        if method == 'github':
+            self._collect_requirements(Path(item['target_dir']))
+        return item
+
+    def _ledger_record(self, item: dict) -> dict:
+        config = item['config']
+        return {
+            'entry': {k: item.get(k) for k in ('type', 'group', 'variant', 'target')},
+            'repo_id': config.get('repo_id'),
+            'link': item.get('link'),
+            'revision': item.get('revision'),
+            'files': files_state(item['files'], config.get('sha256', None)),
+            'snapshot': item.get('snapshot'),
+            'snapshot_dir': item.get('snapshot_dir'),
+        }
 
     def _install_item_generic(self, item: dict) -> dict:
         if self.verbose:
@@ -497,6 +570,11 @@ class AInstaller:
                     token=hf_token,
                 )
             )
+            item['files'] = [link]
+            item['revision'] = link.name
+            if not ignore_patterns and repo_type is None:
+                item['snapshot'] = repo_id
+                item['snapshot_dir'] = str(link)
             if action == 'link_safetensors':
                 for src in Path(link).rglob('*.safetensors'):
                     target = target_dir / Path(src).relative_to(link)
@@ -510,6 +588,8 @@ class AInstaller:
             # use hf download
             link = hf_hub_download(repo_id=repo_id, filename=file, token=hf_token)
             src = Path(link)
+            item['files'] = [src]
+            item['revision'] = hf_revision(src)
 
             if action != 'no_link':
                 target_file = src.name
@@ -528,12 +608,22 @@ class AInstaller:
         url = f'https://github.com/{repo_id}.git'
         Path(target_dir).mkdir(parents=True, exist_ok=True)
         try:
-            Repo.clone_from(url, target_dir, recursive=True)
+            try:
+                # an existing checkout (e.g. installed before the ledger) is recorded, not cloned
+                repo = Repo(target_dir)
+            except (InvalidGitRepositoryError, NoSuchPathError):
+                repo = Repo.clone_from(url, target_dir, recursive=True)
+            item['files'] = []  # the checkout changes locally, only its presence is recorded
+            item['revision'] = repo.head.commit.hexsha
         except Exception as e:
             print(f'Url git clone went wrong: {url} -> {target_dir}')
             print(e)
         finally:
             item['link'] = str(target_dir)
+        self._collect_requirements(target_dir)
+        return item
+
+    def _collect_requirements(self, target_dir: Path) -> None:
         # collect python requirements
         requirements_txt = target_dir / 'requirements.txt'
         if requirements_txt.exists():
@@ -541,7 +631,6 @@ class AInstaller:
                 while line := f.readline():
                     split = line.split('>=')
                     self.requirements.append(split[0].rstrip())
-        return item
 
     def _install_item_wget(self, item: dict) -> dict:
         url = item['config'].get('link', '')
@@ -561,33 +650,35 @@ class AInstaller:
         cache_file = (self._cache / urlname).with_suffix('.safetensors')
         target_file = (target_dir / rename).with_suffix('.safetensors')
 
-        if not cache_file.exists():
-            resp = requests.get(url, stream=True)
-            total = int(resp.headers.get('content-length', 0))
-
-            try:
-                with (
-                    cache_file.open('wb') as file,
-                    tqdm(
-                        desc=cache_file.name,
-                        total=total,
-                        unit='iB',
-                        unit_scale=True,
-                        unit_divisor=1024,
-                    ) as bar,
-                ):
-                    for data in resp.iter_content(chunk_size=1024):
-                        size = file.write(data)
-                        bar.update(size)
-            except Exception as e:
-                print(f'Url download went wrong: {url}')
-                print(e)
+        self._download(url, cache_file, item['config'])
+        item['files'] = [cache_file]
 
         self._symlink(cache_file, target_file)
 
         item['link'] = str(target_file)
         return item
 
+    def _download(self, url: str, cache_file: Path, config: dict, headers: dict | None = None):
+        # resumable (.part + Range), segmented for large files and, if the config has them,
+        # sha256/size verified; config 'segments' overrides the installer default. Concurrent
+        # items of the same cache file wait for the first one and find the finished file.
+        size = config.get('size', None)
+        with self._download_lock(cache_file):
+            download(
+                url,
+                cache_file,
+                headers=headers,
+                sha256=config.get('sha256', None),
+                size=int(size) if size is not None else None,
+                force=config.get('force', False),
+                segments=int(config.get('segments', self.segments)),
+                verbose=self.verbose or self.workers == 1,
+            )
+
+    def _download_lock(self, cache_file: Path) -> threading.Lock:
+        with self._download_locks_guard:
+            return self._download_locks.setdefault(cache_file.resolve(), threading.Lock())
+
     def _symlink(self, src: str | Path, target: str | Path, directory=False) -> None:
         src = Path(src)
         target = Path(target)
@@ -680,61 +771,19 @@ class AInstaller:
                 else:
                     raise Exception('Unable to determine filename')
 
-            # The signed CDN URL (Backblaze B2) carries its own auth in the query
-            # string, but Cloudflare 403s a bare urllib User-Agent, so send a browser one.
-            response = urllib.request.urlopen(
-                urllib.request.Request(redirect_url, headers={'User-Agent': self.USER_AGENT})
-            )
+            response.close()
         elif response.status == 404:
             raise Exception('File not found')
         else:
             raise Exception('No redirect found, something went wrong')
 
-        total_size = response.getheader('Content-Length')
-
-        if total_size is not None:
-            total_size = int(total_size)
-
-        download = False
+        # The signed CDN URL (Backblaze B2) carries its own auth in the query
+        # string, but Cloudflare 403s a bare User-Agent, so send a browser one.
         cache_file = self._cache / filename_cai
-        if not cache_file.exists():
-            download = True
-        elif total_size > cache_file.stat().st_size:
-            download = True
-        if item['config'].get('force', False):
-            download = True
-
-        if download:
-            with cache_file.open('wb') as f:
-                downloaded = 0
-
-                while True:
-                    chunk_start_time = time.time()
-                    buffer = response.read(self.CHUNK_SIZE)
-                    chunk_end_time = time.time()
-                    speed = 0
-
-                    if not buffer:
-                        break
-
-                    downloaded += len(buffer)
-                    f.write(buffer)
-                    chunk_time = chunk_end_time - chunk_start_time
-
-                    if chunk_time > 0:
-                        speed = len(buffer) / chunk_time / (1024**2)  # Speed in MB/s
-
-                    if total_size is not None:
-                        progress = downloaded / total_size
-                        sys.stdout.write(
-                            f'\rDownloading: {filename_cai} [{progress * 100:.2f}%] - {
-                                speed:.2f} MB/s'
-                        )
-            if self.verbose:
-                print(f'Download completed. File saved as: {filename_cai}')
-        else:
-            if self.verbose:
-                print('cache ok.')
+        self._download(redirect_url, cache_file, item['config'], {'User-Agent': self.USER_AGENT})
+        item['files'] = [cache_file]
+        if self.verbose:
+            print(f'cache ok: {filename_cai}')
 
         target_file = target_dir / filename_cai
         rename = item['config'].get('rename', '')
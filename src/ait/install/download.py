@@ -0,0 +1,421 @@
+"""Resumable, verified HTTP downloads for AInstaller.
+
+A download goes to `<dest>.part` with multi-megabyte buffered writes and is
+renamed to `dest` only once complete and verified (size and/or sha256 if
+known), so `dest` existing means a finished file. A dropped connection resumes
+from the end of the `.part` file with an HTTP Range request; servers that
+ignore Range restart from zero.
+
+With segments > 1 a large file is fetched over several connections at once:
+the `.part` file is preallocated, each segment is a bounded Range request
+written in place with os.pwrite and retried on its own, and the per-segment
+offsets are kept in a `<dest>.part.segments` sidecar so an interrupted run
+resumes every segment. Servers without Range support (or small files) fall
+back to the single stream; the whole file is hashed once at the end.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Final
+
+import requests
+
+CHUNK_SIZE: Final = 8 * 1024 * 1024  # write buffer and read chunk
+RETRIES: Final = 8
+BACKOFF_BASE: Final = 0.5  # seconds, doubled per retry without progress
+BACKOFF_MAX: Final = 30.0
+TIMEOUT: Final = 60.0  # connect / between two reads
+SUFFIX_PART: Final = '.part'
+SUFFIX_SEGMENTS: Final = '.segments'
+SEGMENT_MIN: Final = 64 * 1024 * 1024  # smaller segments are not worth an extra connection
+
+
+class DownloadError(Exception):
+    pass
+
+
+class _Dropped(Exception):
+    """Stream ended before the announced length; retried like a connection error."""
+
+
+def url_part(dest: Path) -> Path:
+    return dest.with_name(dest.name + SUFFIX_PART)
+
+
+def url_segments(dest: Path) -> Path:
+    return dest.with_name(dest.name + SUFFIX_PART + SUFFIX_SEGMENTS)
+
+
+def sha256_file(url: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    h = hashlib.sha256()
+    with url.open('rb') as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def download(
+    url: str,
+    dest: str | Path,
+    headers: dict[str, str] | None = None,
+    sha256: str | None = None,
+    size: int | None = None,
+    force: bool = False,
+    segments: int = 1,
+    retries: int = RETRIES,
+    chunk_size: int = CHUNK_SIZE,
+    timeout: float = TIMEOUT,
+    verbose: bool = True,
+) -> Path:
+    """
+    Downloads url to dest, resuming a previous `.part` and retrying dropped connections.
+    An existing dest is kept unless force, or its size differs from size: then it is downloaded
+    again. Without size, a dest shorter than the server's Content-Length (a truncated file from
+    before the `.part` scheme) is downloaded again. A short dest (of unknown origin, e.g. another
+    upstream version) is only resumed when sha256 verifies the result.
+    segments > 1 fetches files of at least 2 * SEGMENT_MIN bytes over that many concurrent Range
+    requests if the server supports them.
+    Raises DownloadError if the retries are exhausted or the result fails verification.
+    """
+    dest = Path(dest)
+    part = url_part(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    state = url_segments(dest)
+    if force:
+        dest.unlink(missing_ok=True)
+        part.unlink(missing_ok=True)
+        state.unlink(missing_ok=True)
+    if dest.exists():
+        have = dest.stat().st_size
+        want = size
+        if want is None:
+            want = _content_length(url, dict(headers or {}), timeout)
+            if want is None or have >= want:
+                return dest
+        if have == want:
+            return dest
+        if have < want and sha256 is not None and not part.exists():
+            os.replace(dest, part)  # a splice of two versions fails the sha256 and starts over
+        else:
+            dest.unlink()
+
+    headers = dict(headers or {})
+    total = None
+    if segments > 1 and hasattr(os, 'pwrite'):
+        try:
+            total = _probe(url, headers, timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            total = None  # the single stream below retries
+        if total is not None and size is not None and total != size:
+            raise DownloadError(f'{url}: server announces {total} bytes, expected {size}')
+    if total is not None and total >= 2 * SEGMENT_MIN:
+        segments = min(segments, total // SEGMENT_MIN)
+        _fetch_segmented(
+            url, part, state, headers, total, segments, retries, chunk_size, timeout, verbose
+        )
+        # the sidecar outlives the hash of the whole file: an interrupted _finish resumes here
+        _finish(url, dest, part, size, total, sha256, chunk_size)
+        state.unlink(missing_ok=True)
+        return dest
+    if state.exists():
+        # the part of an interrupted segmented download has holes: start over
+        part.unlink(missing_ok=True)
+        state.unlink()
+
+    attempt = 0
+    while True:
+        before = part.stat().st_size if part.exists() else 0
+        try:
+            total = _fetch(url, part, headers, size, chunk_size, timeout, verbose)
+            break
+        except (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+            _Dropped,
+        ) as e:
+            # retries count consecutive attempts without progress
+            progressed = part.exists() and part.stat().st_size > before
+            attempt = 1 if progressed else attempt + 1
+            if attempt > retries:
+                raise DownloadError(f'{url}: giving up after {retries} retries: {e}') from e
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)
+            if verbose:
+                print(
+                    f'\n{dest.name}: connection dropped ({e.__class__.__name__}), resuming in {delay:.1f}s'
+                )
+            time.sleep(delay)
+    return _finish(url, dest, part, size, total, sha256, chunk_size)
+
+
+def _finish(
+    url: str,
+    dest: Path,
+    part: Path,
+    size: int | None,
+    total: int | None,
+    sha256: str | None,
+    chunk_size: int,
+) -> Path:
+    """Verifies the complete part (size, sha256 over the whole file) and renames it to dest."""
+    have = part.stat().st_size
+    if (size is not None and have != size) or (total is not None and have != total):
+        raise DownloadError(
+            f'{url}: got {have} bytes, expected {size if size is not None else total}'
+        )
+    if sha256 is not None:
+        digest = sha256_file(part, chunk_size)
+        if digest.lower() != sha256.lower():
+            part.unlink()
+            raise DownloadError(f'{url}: sha256 mismatch {digest} != {sha256}')
+    os.replace(part, dest)
+    return dest
+
+
+def _fetch(
+    url: str,
+    part: Path,
+    headers: dict[str, str],
+    size: int | None,
+    chunk_size: int,
+    timeout: float,
+    verbose: bool,
+) -> int | None:
+    """One attempt: appends to part from its current size. Returns the total size if known."""
+    have = part.stat().st_size if part.exists() else 0
+    if size is not None and have == size:
+        return size
+    request_headers = dict(headers)
+    if have:
+        request_headers['Range'] = f'bytes={have}-'
+
+    with requests.get(url, headers=request_headers, stream=True, timeout=timeout) as resp:
+        if resp.status_code == 416 and have:
+            total = _total_from_range(resp.headers.get('Content-Range'))
+            if total is not None and have > total:
+                # stale part of another file version: start over
+                part.unlink()
+                return _fetch(url, part, headers, size, chunk_size, timeout, verbose)
+            return total if total is not None else have  # nothing left to fetch
+        resp.raise_for_status()
+        if have and resp.status_code == 206:
+            start = _start_from_range(resp.headers.get('Content-Range'))
+            if start != have:
+                raise DownloadError(f'{url}: server resumed at {start}, expected {have}')
+            total = _total_from_range(resp.headers.get('Content-Range'))
+            mode = 'ab'
+        else:
+            # no resume support (200): start over
+            have = 0
+            length = resp.headers.get('Content-Length')
+            total = int(length) if length is not None else None
+            mode = 'wb'
+
+        downloaded = have
+        t_start = t_last = time.time()
+        with part.open(mode, buffering=chunk_size) as f:
+            for data in resp.iter_content(chunk_size=chunk_size):
+                f.write(data)
+                downloaded += len(data)
+                if verbose and time.time() - t_last > 1.0:
+                    _progress(part.stem, downloaded, have, total, t_start)
+                    t_last = time.time()
+        if verbose:
+            _progress(part.stem, downloaded, have, total, t_start)
+            sys.stdout.write('\n')
+    if total is not None and downloaded < total:
+        raise _Dropped(f'{downloaded} of {total} bytes')
+    return total
+
+
+def _content_length(url: str, headers: dict[str, str], timeout: float) -> int | None:
+    """The Content-Length the server announces for url (headers only), None if unknown."""
+    try:
+        with requests.get(url, headers=headers, stream=True, timeout=timeout) as resp:
+            resp.raise_for_status()
+            length = resp.headers.get('Content-Length')
+    except requests.RequestException:
+        return None  # unreachable: keep what is there
+    return int(length) if length is not None and length.isdigit() else None
+
+
+def _probe(url: str, headers: dict[str, str], timeout: float) -> int | None:
+    """Total size if the server answers a one-byte Range request with 206, else None."""
+    request_headers = dict(headers)
+    request_headers['Range'] = 'bytes=0-0'
+    with requests.get(url, headers=request_headers, stream=True, timeout=timeout) as resp:
+        resp.raise_for_status()
+        if resp.status_code != 206:
+            return None
+        return _total_from_range(resp.headers.get('Content-Range'))
+
+
+def _segments_plan(part: Path, state: Path, total: int, segments: int) -> list[list[int]]:
+    """
+    [pos, end) per segment: resumed from the sidecar if it matches total, else the range after
+    the bytes a single-stream attempt already appended to part, split evenly. Empty if part
+    already holds all total bytes.
+    """
+    if state.exists() and part.exists():
+        try:
+            saved = json.loads(state.read_text())
+            if saved['total'] == total and part.stat().st_size == total:
+                return [[int(pos), int(end)] for pos, end in saved['segments']]
+        except (ValueError, KeyError, TypeError):
+            pass
+        part.unlink()
+    have = part.stat().st_size if part.exists() else 0
+    if have > total:
+        part.unlink()
+        have = 0
+    if have == total:
+        return []
+    step = -(-(total - have) // segments)
+    return [[pos, min(pos + step, total)] for pos in range(have, total, step)]
+
+
+def _segments_save(state: Path, total: int, plan: list[list[int]]) -> None:
+    tmp = state.with_name(state.name + '.tmp')
+    tmp.write_text(json.dumps({'total': total, 'segments': [list(seg) for seg in plan]}))
+    os.replace(tmp, state)
+
+
+def _fetch_segmented(
+    url: str,
+    part: Path,
+    state: Path,
+    headers: dict[str, str],
+    total: int,
+    segments: int,
+    retries: int,
+    chunk_size: int,
+    timeout: float,
+    verbose: bool,
+) -> None:
+    """Fetches [0, total) into a preallocated part over concurrent Range requests."""
+    plan = _segments_plan(part, state, total, segments)
+    fd = os.open(part, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if os.fstat(fd).st_size != total:
+            os.ftruncate(fd, total)
+        _segments_save(state, total, plan)
+        stop = threading.Event()
+        todo = [seg for seg in plan if seg[0] < seg[1]]
+        left_start = sum(end - pos for pos, end in plan)
+        t_start = time.time()
+        with ThreadPoolExecutor(max(1, len(todo)), thread_name_prefix='download-segment') as ex:
+            futures = {
+                ex.submit(_fetch_segment, url, fd, seg, headers, retries, chunk_size, timeout, stop)
+                for seg in todo
+            }
+            pending = futures
+            while pending:
+                finished, pending = wait(pending, timeout=1.0, return_when=FIRST_EXCEPTION)
+                # workers only advance seg[0] after pwrite: the sidecar never claims unwritten bytes
+                _segments_save(state, total, plan)
+                if verbose:
+                    left = sum(end - pos for pos, end in plan)
+                    _progress_segments(part.stem, total, left_start, left, plan, t_start)
+                if any(f.exception() is not None for f in finished):
+                    stop.set()
+            _segments_save(state, total, plan)
+            for f in futures:
+                error = f.exception()
+                if error is not None:
+                    raise error
+        if verbose:
+            sys.stdout.write('\n')
+    finally:
+        os.close(fd)
+
+
+def _fetch_segment(
+    url: str,
+    fd: int,
+    seg: list[int],
+    headers: dict[str, str],
+    retries: int,
+    chunk_size: int,
+    timeout: float,
+    stop: threading.Event,
+) -> None:
+    """Writes bytes [seg[0], seg[1]) at their offsets, advancing seg[0]; retried on its own."""
+    attempt = 0
+    while seg[0] < seg[1] and not stop.is_set():
+        before = seg[0]
+        request_headers = dict(headers)
+        request_headers['Range'] = f'bytes={seg[0]}-{seg[1] - 1}'
+        try:
+            with requests.get(url, headers=request_headers, stream=True, timeout=timeout) as resp:
+                resp.raise_for_status()
+                content_range = resp.headers.get('Content-Range')
+                if resp.status_code != 206 or _start_from_range(content_range) != seg[0]:
+                    raise DownloadError(f'{url}: range {request_headers["Range"]} not honored')
+                for data in resp.iter_content(chunk_size=chunk_size):
+                    view = memoryview(data)[: seg[1] - seg[0]]
+                    while view:
+                        n = os.pwrite(fd, view, seg[0])
+                        view = view[n:]
+                        seg[0] += n
+                    if stop.is_set() or seg[0] >= seg[1]:
+                        break
+            if seg[0] < seg[1] and not stop.is_set():
+                raise _Dropped(f'segment ended at {seg[0]} of {seg[1]}')
+        except (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+            _Dropped,
+        ) as e:
+            # retries count consecutive attempts of this segment without progress
+            attempt = 1 if seg[0] > before else attempt + 1
+            if attempt > retries:
+                raise DownloadError(f'{url}: giving up after {retries} retries: {e}') from e
+            time.sleep(min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def _start_from_range(content_range: str | None) -> int | None:
+    # 'bytes 100-199/200'
+    if not content_range or not content_range.startswith('bytes '):
+        return None
+    span = content_range[len('bytes ') :].split('/', 1)[0]
+    return int(span.split('-', 1)[0]) if '-' in span else None
+
+
+def _total_from_range(content_range: str | None) -> int | None:
+    # 'bytes 100-199/200' or 'bytes */200'
+    if not content_range or '/' not in content_range:
+        return None
+    total = content_range.rsplit('/', 1)[1]
+    return int(total) if total.isdigit() else None
+
+
+def _progress(name: str, downloaded: int, start: int, total: int | None, t_start: float) -> None:
+    elapsed = time.time() - t_start
+    speed = (downloaded - start) / elapsed / (1024**2) if elapsed > 0 else 0.0
+    if total:
+        sys.stdout.write(
+            f'\rDownloading: {name} [{downloaded / total * 100:.2f}%] - {speed:.2f} MB/s'
+        )
+    else:
+        sys.stdout.write(
+            f'\rDownloading: {name} [{downloaded / (1024**2):.0f} MB] - {speed:.2f} MB/s'
+        )
+
+
+def _progress_segments(
+    name: str, total: int, left_start: int, left: int, plan: list[list[int]], t_start: float
+) -> None:
+    elapsed = time.time() - t_start
+    speed = (left_start - left) / elapsed / (1024**2) if elapsed > 0 else 0.0
+    done = sum(1 for pos, end in plan if pos >= end)
+    sys.stdout.write(
+        f'\rDownloading: {name} [{(total - left) / total * 100:.2f}%] '
+        f'{done}/{len(plan)} segments - {speed:.2f} MB/s'
+    )
@@ -0,0 +1,145 @@
+"""Local install-state ledger for AInstaller.
+
+For every installed item the ledger records what the install resolved to:
+the model-DB entry hash (config plus where it was installed), the resolved
+revision (HF snapshot commit, git HEAD), the produced link and the backing
+files with size, mtime and hash where one is known without reading the file
+(HF blob id, configured sha256). A later run whose entry hash matches and
+whose files still have the recorded size and mtime skips the item without
+any network call; `snapshot_from_db` resolves recorded snapshots offline.
+Writers (threads, other ledger instances, other processes) merge their
+records into the file under a lock, so none loses the records of another.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Final
+
+LEDGER_NAME: Final = 'ledger.json'
+LEDGER_VERSION: Final = 1
+SUFFIX_LOCK: Final = '.lock'
+
+
+def entry_hash(item: dict) -> str:
+    """Hash of a model-DB entry and its install location; any config change is a new entry."""
+    entry = {k: item.get(k) for k in ('type', 'group', 'variant', 'target', 'target_dir', 'config')}
+    raw = json.dumps(entry, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()
+
+
+def hf_revision(path: str | Path) -> str | None:
+    # .../snapshots/<commit>/<file> in the HF cache
+    parts = Path(path).parts
+    if 'snapshots' not in parts:
+        return None
+    i = parts.index('snapshots')
+    return parts[i + 1] if i + 1 < len(parts) else None
+
+
+def file_state(path: str | Path, sha256: str | None = None) -> dict:
+    """Size and mtime of path (following symlinks) and a hash if known without reading it."""
+    path = Path(path)
+    st = path.stat()
+    if sha256 is None and path.is_symlink():
+        # HF cache: snapshot entries link to blobs/<sha256 (LFS) or git blob id>
+        blob = path.resolve()
+        if blob.parent.name == 'blobs':
+            sha256 = blob.name
+    return {'path': str(path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': sha256}
+
+
+def files_state(paths: Iterable[str | Path], sha256: str | None = None) -> list[dict]:
+    """file_state for every file, directories expanded (a single file gets sha256)."""
+    files = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files += [file_state(p) for p in sorted(path.rglob('*')) if p.is_file()]
+        else:
+            files.append(file_state(path, sha256))
+    return files
+
+
+def _unchanged(files: list[dict]) -> bool:
+    for f in files:
+        try:
+            st = os.stat(f['path'])
+        except OSError:
+            return False
+        if st.st_size != f['size'] or st.st_mtime_ns != f['mtime_ns']:
+            return False
+    return True
+
+
+class InstallLedger:
+    """
+    JSON ledger `key -> record` (key = entry_hash of the item), thread safe.
+    A record holds entry, link, revision, files, repo_id, snapshot (repo id of a complete HF
+    snapshot) and time; every put merges into the file (newest record per key wins) under a
+    cross-process lock and is persisted atomically.
+    """
+
+    def __init__(self, url: str | Path):
+        self.url = Path(url)
+        self._lock = threading.Lock()
+        self._records: dict[str, dict] = self._load()
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            data = json.loads(self.url.read_text())
+            if data.get('version') == LEDGER_VERSION:
+                return data.get('records', {})
+        except (OSError, ValueError):
+            pass  # no or unreadable ledger: everything is installed once more
+        return {}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, key: str) -> dict | None:
+        return self._records.get(key)
+
+    def satisfied(self, key: str) -> dict | None:
+        """The record of key if its link and files are still present with unchanged size/mtime."""
+        record = self._records.get(key)
+        if record is None:
+            return None
+        link = record.get('link')
+        if link is not None and not os.path.exists(link):
+            return None
+        if not _unchanged(record.get('files', [])):
+            return None
+        return record
+
+    def put(self, key: str, record: dict) -> None:
+        with self._lock:
+            self.url.parent.mkdir(parents=True, exist_ok=True)
+            url_lock = self.url.with_name(self.url.name + SUFFIX_LOCK)
+            with url_lock.open('a') as f_lock:
+                fcntl.flock(f_lock, fcntl.LOCK_EX)  # released on close
+                records = self._load()
+                for k, r in self._records.items():
+                    if r.get('time', 0) > records.get(k, {}).get('time', 0):
+                        records[k] = r
+                records[key] = record | {'time': time.time()}
+                self._records = records
+                self._save()
+
+    def snapshot(self, repo_id: str) -> Path | None:
+        """Directory of a recorded, unchanged complete HF snapshot of repo_id (newest first)."""
+        records = [(key, r) for key, r in self._records.items() if r.get('snapshot') == repo_id]
+        for key, record in sorted(records, key=lambda kr: kr[1].get('time', 0), reverse=True):
+            if self.satisfied(key) is not None and record.get('snapshot_dir'):
+                return Path(record['snapshot_dir'])
+        return None
+
+    def _save(self) -> None:
+        tmp = self.url.with_name(f'{self.url.name}.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps({'version': LEDGER_VERSION, 'records': self._records}, indent=1))
+        os.replace(tmp, self.url)
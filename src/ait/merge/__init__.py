@@ -1,5 +1,7 @@
-from .merger import merge_lora_with_checkpoint
+from .merger import merge_lora_with_checkpoint, stream_full_merge, stream_selective_merge
 
 __all__ = [
     'merge_lora_with_checkpoint',
+    'stream_full_merge',
+    'stream_selective_merge',
 ]
@@ -0,0 +1,162 @@
+"""Adapters (LoRA, LoKr) merged into a base checkpoint in a single streaming pass.
+
+Planning only reads safetensors headers: every adapter is resolved to the base
+keys it modifies and validated against their shapes before any tensor data is
+touched. The factors themselves are memory-mapped; deltas are computed in fp32 per
+row chunk of a base tensor when that tensor is streamed (see
+merger.stream_adapters_merge).
+
+Supported formats, as in script/merge_lora_into_fp8.py and
+script/merge_lokr_into_bf16.py:
+  lora  PEFT `{module}.lora_A.weight` / `.lora_B.weight`, delta = B @ A * alpha/rank
+        (alpha from an optional `{module}.alpha` tensor, otherwise alpha == rank)
+  lokr  full-form LyCORIS `{module}.lokr_w1` / `.lokr_w2`, delta = kron(w1, w2)
+        (alpha is ignored for full factors, matching ComfyUI)
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Final
+
+import torch
+from safetensors import safe_open
+
+from .safetensors_header import SafetensorsHeader, numel
+
+KIND_LORA: Final = 'lora'
+KIND_LOKR: Final = 'lokr'
+PREFIX_MODEL: Final = 'diffusion_model.'
+
+_LOKR_DECOMPOSED: Final = ('.lokr_w1_a', '.lokr_w1_b', '.lokr_w2_a', '.lokr_w2_b', '.lokr_t2')
+
+
+@dataclass(frozen=True)
+class AdapterSpec:
+    url: Path
+    kind: str
+    strength: float
+
+    @staticmethod
+    def from_arg(arg: str) -> 'AdapterSpec':
+        """'path:kind:strength', e.g. 'loras/gts3.safetensors:lora:0.8'."""
+        url, kind, strength = arg.rsplit(':', 2)
+        if kind not in (KIND_LORA, KIND_LOKR):
+            raise ValueError(f'{arg}: adapter type must be {KIND_LORA} or {KIND_LOKR}')
+        return AdapterSpec(Path(url), kind, float(strength))
+
+
+class Adapter:
+    """An adapter planned against a base header: base key -> factor keys, validated shapes."""
+
+    def __init__(self, spec: AdapterSpec, base: SafetensorsHeader):
+        self.spec = spec
+        self.header = SafetensorsHeader(spec.url)
+        if spec.kind == KIND_LORA:
+            self.plan = self._plan_lora()
+        else:
+            self.plan = self._plan_lokr()
+
+        missing = [k for k in self.plan if k not in base]
+        if missing:
+            raise ValueError(
+                f'{spec.url.name}: {len(missing)} targets absent in base, e.g. {missing[:3]}'
+            )
+        for k in self.plan:
+            shape = self._delta_shape(k)
+            if (spec.kind == KIND_LORA and shape != base[k].shape) or (
+                spec.kind == KIND_LOKR and numel(shape) != base[k].numel
+            ):
+                raise ValueError(
+                    f'{spec.url.name}: {k} delta {shape} does not fit base {base[k].shape}'
+                )
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.plan
+
+    def __len__(self) -> int:
+        return len(self.plan)
+
+    def _plan_lora(self) -> dict[str, tuple[str, str, float]]:
+        plan = {}
+        for k in self.header:
+            if not k.endswith('.lora_A.weight'):
+                continue
+            module = k.removesuffix('.lora_A.weight')
+            b_k = f'{module}.lora_B.weight'
+            if b_k not in self.header:
+                raise ValueError(f'{self.spec.url.name}: {module} has lora_A without lora_B')
+            plan[f'{module.removeprefix(PREFIX_MODEL)}.weight'] = (
+                k,
+                b_k,
+                self._lora_scale(module, k),
+            )
+        return plan
+
+    def _lora_scale(self, module: str, a_k: str) -> float:
+        # the alpha tensor is a scalar, read once at planning
+        alpha_k = f'{module}.alpha'
+        if alpha_k not in self.header:
+            return 1.0
+        with safe_open(self.spec.url, framework='pt') as f:
+            alpha = f.get_tensor(alpha_k).float().item()
+        return alpha / self.header[a_k].shape[0]
+
+    def _plan_lokr(self) -> dict[str, tuple[str, str, float]]:
+        decomposed = [k for k in self.header if k.endswith(_LOKR_DECOMPOSED)]
+        if decomposed:
+            raise ValueError(
+                f'{self.spec.url.name}: LoKr has decomposed factors ({len(decomposed)} tensors, '
+                f'e.g. {decomposed[0]}); only full w1/w2 is supported'
+            )
+        plan = {}
+        for k in self.header:
+            if not k.endswith('.lokr_w1'):
+                continue
+            module = k.removesuffix('.lokr_w1')
+            w2_k = f'{module}.lokr_w2'
+            if w2_k not in self.header:
+                raise ValueError(f'{self.spec.url.name}: {module} has lokr_w1 without lokr_w2')
+            plan[f'{module.removeprefix(PREFIX_MODEL)}.weight'] = (k, w2_k, 1.0)
+        return plan
+
+    def _delta_shape(self, key: str) -> tuple[int, ...]:
+        k1, k2, _ = self.plan[key]
+        s1, s2 = self.header[k1].shape, self.header[k2].shape
+        if len(s1) != 2 or len(s2) != 2:
+            raise ValueError(f'{self.spec.url.name}: {key} factors are not 2-D: {s1}, {s2}')
+        if self.spec.kind == KIND_LORA:
+            # A: [rank, in], B: [out, rank] -> delta: [out, in]
+            if s1[0] != s2[1]:
+                raise ValueError(f'{self.spec.url.name}: {key} rank mismatch {s1} / {s2}')
+            return (s2[0], s1[1])
+        return (s1[0] * s2[0], s1[1] * s2[1])
+
+    def delta(
+        self, key: str, factor, shape: tuple[int, ...], rows: slice = slice(None)
+    ) -> torch.Tensor:
+        """
+        fp32 delta for the rows (dim 0 slice) of base key, scaled by strength; factor(name)
+        returns the factor tensors. Only those rows are computed.
+        """
+        k1, k2, scale = self.plan[key]
+        f1, f2 = factor(k1), factor(k2)
+        if self.spec.kind == KIND_LORA:
+            delta = f2[rows].to(torch.float32) @ f1.to(torch.float32)
+        else:
+            delta = _kron_rows(f1.to(torch.float32), f2.to(torch.float32), shape, rows)
+        return delta.mul_(self.spec.strength * scale)
+
+
+def _kron_rows(w1: torch.Tensor, w2: torch.Tensor, shape: tuple[int, ...], rows: slice):
+    """rows of kron(w1, w2).reshape(shape), from the kron rows covering them"""
+    if len(shape) < 2 or rows == slice(None) or numel(shape) == 0:
+        return torch.kron(w1, w2).reshape(shape)
+    start, stop, _ = rows.indices(shape[0])
+    row = numel(shape[1:])
+    cols = w1.shape[1] * w2.shape[1]
+    begin, end = start * row // cols, -(-stop * row // cols)
+    i = torch.arange(begin, end)
+    # kron(w1, w2)[i1 * m2 + i2, j1 * n2 + j2] = w1[i1, j1] * w2[i2, j2]
+    block = w1[i // w2.shape[0], :, None] * w2[i % w2.shape[0], None, :]
+    flat = block.reshape(-1)[start * row - begin * cols : stop * row - begin * cols]
+    return flat.reshape((stop - start, *shape[1:]))
@@ -1,6 +1,14 @@
+import mmap
+from collections.abc import Callable
+from contextlib import contextmanager
 from pathlib import Path
+
+import torch
 from tqdm import tqdm
-from safetensors.torch import load_file, save_file
+
+from .adapters import Adapter
+from .quantize import CHUNK_BYTES, as_bytes, cast_fp8, chunk_generator, row_chunks
+from .safetensors_header import SafetensorsHeader, TensorInfo, header_encode
 
 FOLDER_MODELS_COMFY = Path('/workspace/ComfyUI/models')
 FOLDER_MODELS_LOCAL = Path('/Volumes/data/Project/AI/models/000_local')
@@ -26,22 +34,18 @@ def merge_lora_with_checkpoint(stem_ckpt: str, stem_lora: str, ratio: float):
     if not file_lora.exists():
         raise FileExistsError(f"{str(file_lora)} doesn't exist!")
 
-    lora_data = load_file(file_lora)
-    checkpoint_data = load_file(file_ckpt)
+    s = file_lora.stem.split('_')
+    file_model_out = FOLDER_OUTPUT / f'{file_ckpt.stem}_{s[1]}{int(ratio * 100.0)}'
+    file_model_out = file_model_out.with_suffix(model_suffix)
+    print(f'\n\t saving {str(file_model_out)}')
 
     do_full_merge = True
     # Merge based on the selected strategy
     if do_full_merge:
-        merged_model = full_merge(lora_data, checkpoint_data, ratio)
+        stream_full_merge(file_lora, file_ckpt, file_model_out, ratio)
     else:
         pass
-        # merged_model = selective_merge(lora_data, checkpoint_data, config['merge_weights'])
-
-    s = file_lora.stem.split('_')
-    file_model_out = FOLDER_OUTPUT / f'{file_ckpt.stem}_{s[1]}{int(ratio * 100.0)}'
-    file_model_out = file_model_out.with_suffix(model_suffix)
-    print(f'\n\t saving {str(file_model_out)}')
-    save_file(merged_model, FOLDER_OUTPUT / file_model_out)
+        # stream_selective_merge(file_lora, file_ckpt, file_model_out, config['merge_weights'])
 
     print('Merge completed successfully!')
 
@@ -75,3 +79,248 @@ def selective_merge(lora_data, checkpoint_data, merge_weights):
             merged[layer] = checkpoint_data.get(layer, lora_data.get(layer))
 
     return merged
+
+
+# Streaming merges: same results as full_merge / selective_merge + save_file, but the inputs are
+# memory-mapped and merged one tensor at a time straight into the output file, so peak RAM stays
+# around the largest tensor instead of 2-3x the checkpoint.
+def stream_full_merge(file_lora: Path, file_ckpt: Path, file_out: Path, ratio: float) -> None:
+    def op(ckpt, lora):
+        if ckpt is not None and lora is not None:
+            return ckpt + (ratio * lora)
+        elif ckpt is not None:
+            return ckpt
+        return ratio * lora
+
+    stream_merge(file_lora, file_ckpt, file_out, lambda _: op, desc='Merging Layers')
+
+
+def stream_selective_merge(
+    file_lora: Path, file_ckpt: Path, file_out: Path, merge_weights: dict[str, float]
+) -> None:
+    def op_for(layer: str):
+        if layer not in merge_weights:
+            return lambda ckpt, lora: ckpt if ckpt is not None else lora
+        ratio = merge_weights[layer]
+        return lambda ckpt, lora: (
+            (0 if ckpt is None else ckpt) + (ratio * (0 if lora is None else lora))
+        )
+
+    stream_merge(file_lora, file_ckpt, file_out, op_for, desc='Selective Merging')
+
+
+DTYPE_TORCH = {
+    'F64': torch.float64,
+    'F32': torch.float32,
+    'F16': torch.float16,
+    'BF16': torch.bfloat16,
+    'F8_E4M3': torch.float8_e4m3fn,
+    'F8_E5M2': torch.float8_e5m2,
+    'I64': torch.int64,
+    'I32': torch.int32,
+    'I16': torch.int16,
+    'I8': torch.int8,
+    'U8': torch.uint8,
+    'BOOL': torch.bool,
+    'C64': torch.complex64,
+}
+# spec dtypes only newer torch versions have (sub-byte F4 / F6_* have none)
+DTYPE_TORCH |= {
+    name: getattr(torch, attr)
+    for name, attr in (
+        ('U16', 'uint16'),
+        ('U32', 'uint32'),
+        ('U64', 'uint64'),
+        ('F8_E8M0', 'float8_e8m0fnu'),
+    )
+    if hasattr(torch, attr)
+}
+DTYPE_NAME = {v: k for k, v in DTYPE_TORCH.items()}
+
+
+def dtype_torch(dtype: str, key: str) -> torch.dtype:
+    """The torch dtype of safetensors dtype for tensor key; ValueError if torch has none."""
+    if dtype not in DTYPE_TORCH:
+        raise ValueError(f'{key}: safetensors dtype {dtype} is not supported by this torch')
+    return DTYPE_TORCH[dtype]
+
+
+def stream_merge(
+    file_lora: Path,
+    file_ckpt: Path,
+    file_out: Path,
+    op_for: Callable[[str], Callable],
+    desc: str = 'Merging Layers',
+) -> None:
+    """
+    Writes op_for(layer)(ckpt, lora) for every layer of the checkpoint and the lora (None where a
+    file lacks the layer) to file_out. The output header is computed up front by running each op
+    on meta tensors, the file is pre-sized and the tensors are written one at a time. file_out
+    is written as a temp file replacing it when complete, so it may be one of the inputs.
+    """
+    hdr_ckpt = SafetensorsHeader(file_ckpt)
+    hdr_lora = SafetensorsHeader(file_lora)
+    layers = hdr_ckpt.keys() + [k for k in hdr_lora if k not in hdr_ckpt]
+
+    def meta(hdr: SafetensorsHeader, layer: str) -> torch.Tensor | None:
+        if layer not in hdr:
+            return None
+        dtype = dtype_torch(hdr[layer].dtype, layer)
+        return torch.empty(hdr[layer].shape, dtype=dtype, device='meta')
+
+    layout = []
+    for layer in layers:
+        t = torch.as_tensor(op_for(layer)(meta(hdr_ckpt, layer), meta(hdr_lora, layer)))
+        layout.append((layer, DTYPE_NAME[t.dtype], tuple(t.shape)))
+    header, size = header_encode(layout)
+
+    file_out = Path(file_out)
+    with (
+        _open_replacing(file_out) as f,
+        _MappedTensors(hdr_ckpt) as ckpt,
+        _MappedTensors(hdr_lora) as lora,
+    ):
+        f.write(header)
+        f.truncate(len(header) + size)
+        for layer, dtype, shape in tqdm(layout, desc=desc, unit='layer'):
+            t = op_for(layer)(ckpt.get(layer), lora.get(layer))
+            t = torch.as_tensor(t).to(DTYPE_TORCH[dtype]).contiguous()
+            if tuple(t.shape) != shape:
+                raise ValueError(
+                    f'{layer}: merged shape {tuple(t.shape)} differs from the plan {shape}'
+                )
+            f.write(t.reshape(-1).view(torch.uint8).numpy().data)
+            del t
+            ckpt.release(layer)
+            lora.release(layer)
+        if f.tell() != len(header) + size:
+            raise ValueError(f'{file_out}: wrote {f.tell()} bytes, expected {len(header) + size}')
+
+
+def stream_adapters_merge(
+    file_base: Path,
+    adapters: list[Adapter],
+    file_out: Path,
+    dtype_for: Callable[[str, TensorInfo], str],
+    stochastic: bool = False,
+    seed: int = 42,
+    metadata: dict[str, str] | None = None,
+    chunk_bytes: int = CHUNK_BYTES,
+) -> dict[str, int]:
+    """
+    Merges all adapters into the base in one pass: per row chunk of a base tensor the deltas of
+    every adapter targeting it are summed in fp32 and cast once to dtype_for(key, info) (a
+    safetensors dtype name). Merged fp8 tensors use stochastic rounding if asked, seeded per
+    chunk as in the quantize pipeline (reproducible). file_out is written as a temp file
+    replacing it when complete, so it may be file_base. Returns counts of merged and copied
+    tensors.
+    """
+    hdr_base = SafetensorsHeader(file_base)
+    layout = [(k, dtype_for(k, hdr_base[k]), hdr_base[k].shape) for k in hdr_base]
+    for k, dtype, _ in layout:
+        dtype_torch(hdr_base[k].dtype, k)
+        dtype_torch(dtype, k)
+    header, size = header_encode(layout, metadata)
+
+    counts = {'merged': 0, 'copied': 0, 'deltas': 0}
+    file_out = Path(file_out)
+    with (
+        _open_replacing(file_out) as f,
+        _MappedTensors(hdr_base) as base,
+        _MappedTensorsList([a.header for a in adapters]) as factors,
+    ):
+        f.write(header)
+        f.truncate(len(header) + size)
+        for key, dtype, shape in tqdm(layout, desc='Merging adapters', unit='layer'):
+            t = base.get(key)
+            targeting = [(i, a) for i, a in enumerate(adapters) if key in a]
+            if targeting:
+                counts['merged'] += 1
+                counts['deltas'] += len(targeting)
+            else:
+                counts['copied'] += 1
+            seed_chunks = seed if stochastic and targeting else None
+            for index, rows in enumerate(row_chunks(shape, chunk_bytes)):
+                c = t[rows] if t.dim() else t
+                if targeting:
+                    c = c.to(torch.float32, copy=True)
+                    for i, adapter in targeting:
+                        c += adapter.delta(key, factors[i].get, shape, rows)
+                if DTYPE_TORCH[dtype] == torch.float8_e4m3fn and c.dtype != torch.float8_e4m3fn:
+                    c = cast_fp8(c.to(torch.float32), chunk_generator(seed_chunks, key, index))
+                else:
+                    c = c.to(DTYPE_TORCH[dtype])
+                f.write(as_bytes(c))
+                del c
+            del t
+            base.release(key)
+        if f.tell() != len(header) + size:
+            raise ValueError(f'{file_out}: wrote {f.tell()} bytes, expected {len(header) + size}')
+    return counts
+
+
+@contextmanager
+def _open_replacing(file_out: Path):
+    """Binary file written next to file_out, replacing it on success (removed on error)."""
+    file_tmp = file_out.with_name(f'{file_out.name}.tmp')
+    try:
+        with file_tmp.open('wb') as f:
+            yield f
+    except BaseException:
+        file_tmp.unlink(missing_ok=True)
+        raise
+    file_tmp.replace(file_out)
+
+
+class _MappedTensorsList(list):
+    def __init__(self, hdrs: list[SafetensorsHeader]):
+        super().__init__(_MappedTensors(hdr) for hdr in hdrs)
+
+    def __enter__(self):
+        for mapped in self:
+            mapped.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        for mapped in self:
+            mapped.__exit__(*exc)
+
+
+class _MappedTensors:
+    """Zero-copy tensors over a memory-mapped safetensors file (private copy-on-write mapping)."""
+
+    def __init__(self, hdr: SafetensorsHeader):
+        self._hdr = hdr
+        self._file = None
+        self._mm = None
+
+    def __enter__(self):
+        self._file = self._hdr.url.open('rb')
+        if self._hdr.nbytes:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_COPY)
+        return self
+
+    def __exit__(self, *exc):
+        if self._mm is not None:
+            self._mm.close()
+        self._file.close()
+
+    def get(self, layer: str) -> torch.Tensor | None:
+        if layer not in self._hdr:
+            return None
+        info = self._hdr[layer]
+        dtype = dtype_torch(info.dtype, layer)
+        if info.numel == 0:
+            return torch.empty(info.shape, dtype=dtype)
+        t = torch.frombuffer(self._mm, dtype=dtype, count=info.numel, offset=info.begin)
+        return t.reshape(info.shape)
+
+    def release(self, layer: str) -> None:
+        """Drops the pages of a merged layer from RSS (they stay in the page cache)."""
+        if layer not in self._hdr or self._mm is None or not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        info: TensorInfo = self._hdr[layer]
+        start = info.begin - info.begin % mmap.PAGESIZE
+        length = info.end - start
+        if length > 0:
+            self._mm.madvise(mmap.MADV_DONTNEED, start, min(length, len(self._mm) - start))
@@ -0,0 +1,144 @@
+"""Chunked, thread-parallel fp8 quantization for streaming checkpoint writers.
+
+Tensors are processed in row chunks of a fixed fp32 working-set size, so peak
+memory is bounded by a few chunks instead of whole-tensor temporaries. Chunk
+boundaries and the RNG seed of each chunk only depend on the tensor shape, the
+key and the base seed, never on the worker count: results are reproducible.
+
+StreamPipeline overlaps the three stages: a reader thread prefetches the next
+tensors, a thread pool runs the chunk tasks (torch releases the GIL), and the
+caller's thread writes the finished chunks in order.
+"""
+
+import hashlib
+import os
+import queue
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Final
+
+import torch
+
+FP8_MAX: Final = 448.0  # float8_e4m3fn max representable
+CHUNK_BYTES: Final = 32 * 1024 * 1024  # fp32 working set of one chunk
+
+
+def row_chunks(shape: Iterable[int], chunk_bytes: int = CHUNK_BYTES) -> list[slice]:
+    """Slices over dim 0 with at most chunk_bytes of fp32 each (one slice for 0-/1-D tensors)."""
+    shape = tuple(shape)
+    if len(shape) < 2 or shape[0] == 0:
+        return [slice(None)]
+    row = 4
+    for s in shape[1:]:
+        row *= s
+    rows = max(1, chunk_bytes // max(row, 1))
+    return [slice(i, min(i + rows, shape[0])) for i in range(0, shape[0], rows)]
+
+
+def chunk_seed(seed: int, key: str, index: int) -> int:
+    digest = hashlib.blake2b(f'{seed}:{key}:{index}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') & ((1 << 63) - 1)
+
+
+def chunk_generator(seed: int | None, key: str, index: int) -> torch.Generator | None:
+    if seed is None:
+        return None
+    return torch.Generator().manual_seed(chunk_seed(seed, key, index))
+
+
+def cast_fp8(t32: torch.Tensor, generator: torch.Generator | None = None) -> torch.Tensor:
+    """
+    fp32 -> fp8 e4m3fn, saturating. With a generator the rounding is stochastic: uniform noise of
+    one local quantization step (|v|/8, 3 mantissa bits) keeps small deltas in expectation instead
+    of rounding them back to the unmerged fp8 value.
+    """
+    t32 = t32.clamp(-FP8_MAX, FP8_MAX)
+    if generator is not None:
+        step = (t32.abs() / 8.0).clamp_(min=1e-12)
+        noise = torch.rand(t32.shape, generator=generator, dtype=torch.float32) - 0.5
+        t32 = (t32 + noise.mul_(step)).clamp_(-FP8_MAX, FP8_MAX)
+    return t32.to(torch.float8_e4m3fn)
+
+
+def amax(
+    t: torch.Tensor, executor: ThreadPoolExecutor | None = None, chunk_bytes: int = CHUNK_BYTES
+) -> float:
+    """max |t| over row chunks (exact, independent of chunking)."""
+    chunks = row_chunks(t.shape, chunk_bytes)
+
+    def chunk_amax(rows: slice) -> float:
+        return t[rows].abs().max().item() if t.numel() else 0.0
+
+    if executor is None:
+        return max(map(chunk_amax, chunks))
+    return max(executor.map(chunk_amax, chunks))
+
+
+def as_bytes(t: torch.Tensor):
+    """Raw bytes of a tensor as a writable buffer (no copy for contiguous tensors)."""
+    return t.contiguous().reshape(-1).view(torch.uint8).numpy().data
+
+
+class StreamPipeline:
+    """
+    Ordered reader -> chunk pool -> writer pipeline.
+
+    run() loads every key on a reader thread (at most `prefetch` tensors ahead), asks
+    tasks(key, obj) for the chunk callables of that tensor, runs them on `workers` threads and
+    passes each result to write() in key and chunk order.
+    """
+
+    def __init__(self, workers: int | None = None, prefetch: int = 2, inflight: int | None = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.prefetch = prefetch
+        self.inflight = inflight or 2 * self.workers
+
+    def run(
+        self,
+        keys: Iterable[str],
+        load: Callable[[str], Any],
+        tasks: Callable[[str, Any], list[Callable[[], Any]]],
+        write: Callable[[Any], None],
+    ) -> None:
+        loaded: queue.Queue = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        done = object()
+
+        def reader() -> None:
+            try:
+                for key in keys:
+                    if stop.is_set():
+                        return
+                    loaded.put((key, load(key)))
+            except BaseException as e:  # surfaced in the writer loop
+                loaded.put((None, e))
+                return
+            loaded.put((done, None))
+
+        thread = threading.Thread(target=reader, name='stream-reader', daemon=True)
+        thread.start()
+        pending: deque[Future] = deque()
+        try:
+            with ThreadPoolExecutor(self.workers, thread_name_prefix='stream-chunk') as executor:
+                while True:
+                    key, obj = loaded.get()
+                    if key is done:
+                        break
+                    if key is None:
+                        raise obj
+                    for task in tasks(key, obj):
+                        pending.append(executor.submit(task))
+                    del obj
+                    while len(pending) > self.inflight:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+        finally:
+            stop.set()
+            while thread.is_alive():  # unblock a reader waiting on a full queue
+                try:
+                    loaded.get_nowait()
+                except queue.Empty:
+                    thread.join(0.05)
@@ -0,0 +1,159 @@
+"""Header-only access to safetensors files.
+
+A safetensors file is an 8-byte little-endian header length, a JSON header
+(name -> dtype, shape, data_offsets relative to the data section, plus an
+optional `__metadata__` str->str map) and the raw tensor data. Reading just
+the header answers every planning question (which keys, which dtypes, how
+many bytes, where) in milliseconds, without touching tensor data.
+"""
+
+import json
+import struct
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Final
+
+KEY_METADATA: Final = '__metadata__'
+HEADER_MAX: Final = 100 * 1024 * 1024  # same sanity limit as the safetensors reference impl
+
+# the byte sized dtypes of the spec; sub-byte ones (F4, F6_*) and later additions are read
+# without the byte range check
+DTYPE_BYTES: Final = {
+    'F64': 8,
+    'F32': 4,
+    'F16': 2,
+    'BF16': 2,
+    'F8_E4M3': 1,
+    'F8_E5M2': 1,
+    'F8_E8M0': 1,
+    'C64': 8,
+    'I64': 8,
+    'I32': 4,
+    'I16': 2,
+    'I8': 1,
+    'U64': 8,
+    'U32': 4,
+    'U16': 2,
+    'U8': 1,
+    'BOOL': 1,
+}
+
+
+def numel(shape: Iterable[int]) -> int:
+    n = 1
+    for s in shape:
+        n *= s
+    return n
+
+
+@dataclass(frozen=True)
+class TensorInfo:
+    dtype: str
+    shape: tuple[int, ...]
+    begin: int  # absolute byte offsets in the file
+    end: int
+
+    @property
+    def numel(self) -> int:
+        return numel(self.shape)
+
+    @property
+    def nbytes(self) -> int:
+        return self.end - self.begin
+
+
+class SafetensorsHeader:
+    """
+    Parsed header of a safetensors file: name -> TensorInfo, in file order, plus `metadata`.
+    Only the header is read; the layout is validated against the file size.
+    """
+
+    def __init__(self, url: str | Path):
+        self.url = Path(url)
+        with self.url.open('rb') as f:
+            raw = f.read(8)
+            if len(raw) != 8:
+                raise ValueError(f'{self.url}: not a safetensors file (truncated)')
+            n = struct.unpack('<Q', raw)[0]
+            if n > HEADER_MAX:
+                raise ValueError(f'{self.url}: header length {n} exceeds {HEADER_MAX}')
+            header = f.read(n)
+            if len(header) != n:
+                raise ValueError(f'{self.url}: truncated header')
+        header = json.loads(header)
+
+        self.data_start: int = 8 + n
+        self.metadata: dict[str, str] = header.pop(KEY_METADATA, None) or {}
+        entries = sorted(header.items(), key=lambda kv: kv[1]['data_offsets'][0])
+        self.tensors: dict[str, TensorInfo] = {
+            k: TensorInfo(
+                v['dtype'],
+                tuple(v['shape']),
+                self.data_start + v['data_offsets'][0],
+                self.data_start + v['data_offsets'][1],
+            )
+            for k, v in entries
+        }
+        self._validate()
+
+    def _validate(self) -> None:
+        size = self.url.stat().st_size
+        pos = self.data_start
+        for k, t in self.tensors.items():
+            if t.begin != pos:
+                raise ValueError(f'{self.url}: {k} does not start at {pos - self.data_start}')
+            if t.end < t.begin:
+                raise ValueError(f'{self.url}: {k} ends before it starts')
+            if t.dtype in DTYPE_BYTES and t.nbytes != DTYPE_BYTES[t.dtype] * t.numel:
+                raise ValueError(
+                    f'{self.url}: {k} byte range does not match {t.dtype}{list(t.shape)}'
+                )
+            pos = t.end
+        if pos > size:
+            raise ValueError(f'{self.url}: data section ends at {pos}, file has {size} bytes')
+
+    def __getitem__(self, key: str) -> TensorInfo:
+        return self.tensors[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.tensors
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.tensors)
+
+    def __len__(self) -> int:
+        return len(self.tensors)
+
+    def keys(self) -> list[str]:
+        return list(self.tensors)
+
+    def keys_by_dtype(self, dtype: str) -> set[str]:
+        return {k for k, t in self.tensors.items() if t.dtype == dtype}
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the data section."""
+        return sum(t.nbytes for t in self.tensors.values())
+
+
+def header_encode(
+    layout: Iterable[tuple[str, str, Iterable[int]]], metadata: dict[str, str] | None = None
+) -> tuple[bytes, int]:
+    """
+    Encodes a header for tensors (name, dtype, shape) written back to back in this order.
+    Returns the bytes to write before the data (length prefix and 8-byte aligned JSON) and the
+    size of the data section.
+    """
+    entries: dict[str, dict] = {}
+    off = 0
+    for k, dtype, shape in layout:
+        shape = list(shape)
+        nb = DTYPE_BYTES[dtype] * numel(shape)
+        entries[k] = {'dtype': dtype, 'shape': shape, 'data_offsets': [off, off + nb]}
+        off += nb
+    if metadata is not None:
+        entries[KEY_METADATA] = metadata
+    hb = json.dumps(entries, separators=(',', ':')).encode('utf-8')
+    hb += b' ' * ((8 - (len(hb) % 8)) % 8)  # keeps the tensor data 8-byte aligned
+    return struct.pack('<Q', len(hb)) + hb, off
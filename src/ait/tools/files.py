@@ -1,10 +1,18 @@
 import os
 import shutil
+import stat
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Any, Final
 
 SUFFIX_IMG: Final = ['png', 'webp', 'jpg', 'jpeg', 'gif']
 SUFFIX_VID: Final = ['mov', 'mp4']
+DIR_CACHE_MAX: Final = 4096  # cached directory listings
+DIR_CACHE_RACY_NS: Final = 2 * 10**9  # listings younger than this are not cached
 
 
 def suffix_img() -> list[str]:
@@ -23,33 +31,34 @@ def suffix_vid() -> list[str]:
     return [f'.{pf}' for pf in ret]
 
 
+SUFFIXES_IMG: Final = frozenset(suffix_img())
+SUFFIXES_VID: Final = frozenset(suffix_vid())
+SUFFIXES_IMG_VID: Final = SUFFIXES_IMG | SUFFIXES_VID
+
+
+def _exists_not_dir(url: Path) -> bool:
+    try:
+        return not stat.S_ISDIR(url.stat().st_mode)
+    except (OSError, ValueError):
+        return False
+
+
 def is_img_or_vid(url: Any) -> bool:
     """True if url:str|Path is an image or video, otherwise False"""
     if not (isinstance(url, str) or isinstance(url, Path)):
         return False
-    return is_img(url) or is_vid(url)
+    url = Path(url)
+    return url.suffix in SUFFIXES_IMG_VID and _exists_not_dir(url)
 
 
 def is_img(url: str | Path) -> bool:
     url = Path(url)
-    if not url.exists():
-        return False
-    elif url.is_dir():
-        return False
-    if url.suffix in suffix_img():
-        return True
-    return False
+    return url.suffix in SUFFIXES_IMG and _exists_not_dir(url)
 
 
 def is_vid(url: str | Path) -> bool:
     url = Path(url)
-    if not url.exists():
-        return False
-    elif url.is_dir():
-        return False
-    elif url.suffix in suffix_vid():
-        return True
-    return False
+    return url.suffix in SUFFIXES_VID and _exists_not_dir(url)
 
 
 def is_dotfile(url: str | Path) -> bool:
@@ -81,10 +90,79 @@ def is_file(url: str | Path) -> bool:
     return False
 
 
+_dir_cache: OrderedDict[str, tuple[int, tuple[os.DirEntry, ...]]] = OrderedDict()
+_dir_cache_lock = threading.Lock()
+_dir_scope = threading.local()
+
+
+def dir_entries(url: str | Path) -> tuple[os.DirEntry, ...]:
+    """
+    The entries of directory url, cached until the directory mtime changes.
+
+    The DirEntry objects are kept, so their is_file()/is_dir()/stat() results are memoized as
+    well: a file rewritten in place (directory mtime unchanged) keeps its first stat.
+    Raises OSError like os.scandir.
+    """
+    key = os.fspath(url)
+    checked: set[str] | None = getattr(_dir_scope, 'checked', None)
+    with _dir_cache_lock:
+        cached = _dir_cache.get(key)
+    if cached is not None and checked is not None and key in checked:
+        return cached[1]
+
+    mtime_ns = os.stat(key).st_mtime_ns
+    if checked is not None:
+        checked.add(key)
+    if cached is not None and cached[0] == mtime_ns:
+        with _dir_cache_lock:
+            if key in _dir_cache:
+                _dir_cache.move_to_end(key)
+        return cached[1]
+
+    with os.scandir(key) as it:
+        entries = tuple(it)
+    # a change within the same mtime tick would go unnoticed, so only settled listings are cached
+    if time.time_ns() - mtime_ns > DIR_CACHE_RACY_NS:
+        with _dir_cache_lock:
+            _dir_cache[key] = (mtime_ns, entries)
+            _dir_cache.move_to_end(key)
+            while len(_dir_cache) > DIR_CACHE_MAX:
+                _dir_cache.popitem(last=False)
+    return entries
+
+
+@contextmanager
+def dir_scan_scope() -> Iterator[None]:
+    """
+    Within the scope (per thread) every cached directory listing is validated against its
+    directory mtime once. For bulk passes that do not change the folders they list.
+    """
+    if getattr(_dir_scope, 'checked', None) is not None:
+        yield
+        return
+    _dir_scope.checked = set()
+    try:
+        yield
+    finally:
+        _dir_scope.checked = None
+
+
+def dir_cache_clear() -> None:
+    with _dir_cache_lock:
+        _dir_cache.clear()
+
+
+def _entries_with_suffix(url: str | Path, suffixes: frozenset[str]) -> list[Path]:
+    urls = []
+    for entry in dir_entries(url):
+        url_entry = Path(entry.path)
+        if url_entry.suffix in suffixes and entry.is_file():
+            urls.append(url_entry)
+    return urls
+
+
 def subdirs(url: str | Path) -> list[Path]:
-    url = str(url)
-    fu = [Path(f.path) for f in os.scandir(url) if f.is_dir()]
-    return fu
+    return [Path(f.path) for f in dir_entries(url) if f.is_dir()]
 
 
 def subdir_max(url: str | Path) -> tuple[int, Path] | None:
@@ -134,24 +212,21 @@ def urls_to_dir(_urls: list[str] | list[Path] | str | Path, to_dir: str | Path)
 
 
 def imgs_and_vids_from_url(url: str | Path) -> list[Path]:
-    urls = [Path(f.path) for f in os.scandir(url) if is_img_or_vid(f.path)]
-    return urls
+    return _entries_with_suffix(url, SUFFIXES_IMG_VID)
 
 
 def imgs_from_url(url: str | Path) -> list[Path]:
-    urls = [Path(f.path) for f in os.scandir(url) if is_img(f.path)]
-    return urls
+    return _entries_with_suffix(url, SUFFIXES_IMG)
 
 
 def dotfiles_from_url(url: str | Path) -> list[Path]:
-    urls = [Path(f.path) for f in os.scandir(url) if is_dotfile(f.path)]
-    return urls
+    return [Path(f.path) for f in dir_entries(url) if Path(f.name).stem[:1] == '.' and f.is_file()]
 
 
 def img_latest_from_url(url: str | Path) -> Path | None:
-    urls_img = imgs_from_url(url)
-    if urls_img:
-        return max(urls_img, key=lambda x: x.stat().st_ctime)
+    entries = [f for f in dir_entries(url) if Path(f.name).suffix in SUFFIXES_IMG and f.is_file()]
+    if entries:
+        return Path(max(entries, key=lambda f: f.stat().st_ctime).path)
     else:
         return None
 
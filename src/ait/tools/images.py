@@ -1,11 +1,19 @@
 import json
+import os
+import struct
+import zlib
+from collections import Counter
 from pathlib import Path
-from typing import Final, Optional
+from typing import TYPE_CHECKING, Any, Callable, Final, Literal, Optional
+
 from PIL import Image as PILImage
 
 from ait.tools.files import is_img
 
 THUMBNAIL_SIZE: Final = 256
+THUMBNAIL_REDUCING_GAP: Final = 2  # decode at >= gap x thumbnail size before the resample
+TRAIN_REDUCING_GAP: Final = 1.5  # LANCZOS resamples from >= gap x the train size
+TRAIN_RESIZE_PSNR_MIN: Final = 40.0  # dB against a plain LANCZOS resize (tested)
 RESOLUTIONS: Final = [512, 768, 1024]
 RATIOS: Final = [1.0, 3.0 / 4.0, 2.0 / 3.0]
 THRESHOLD_RATIO_SQUARE: Final = 0.25
@@ -18,6 +26,14 @@ METADATA_SCHEMA: Final = 'ait.image.metadata.v1'
 # clipboard payloads) exists only at execution time and never appears in the graph.
 PARENT_METADATA_CHUNK: Final = 'parent_metadata'
 
+if TYPE_CHECKING:
+    from ait.tools.metadata_cache import MetadataCache
+
+TrainResizeBackend = Literal['auto', 'cv2', 'pillow']
+
+# source-chain link of an image: (own embedded payload, queue-time source image), None if unreadable
+ChainLink = tuple[Optional[dict], Optional[Path]]
+
 
 def image_from_url(url: str | Path, verbose: bool = False) -> PILImage.Image | None:
     url = Path(url)
@@ -45,7 +61,57 @@ def image_from_url(url: str | Path, verbose: bool = False) -> PILImage.Image | N
         return None
 
 
-def metadata(url: Path | str) -> dict | None:
+def image_header_from_url(url: str | Path, verbose: bool = False) -> PILImage.Image | None:
+    """`image_from_url` without decoding pixels. PIL reads only the header and
+    the chunks ahead of the image data on open; PNG text chunks stored behind
+    IDAT are read by seeking past the image data, so `info` equals that of a
+    loaded image."""
+    pil = image_from_url(url, verbose=verbose)
+    if pil is not None and pil.format == 'PNG':
+        try:
+            pil.info.update(_png_text_after_idat(Path(url)))
+        except (OSError, ValueError, zlib.error):
+            pass
+    return pil
+
+
+def _png_text_after_idat(url: Path) -> dict[str, str]:
+    """tEXt / zTXt / iTXt chunks behind the first IDAT, decoded like PIL does."""
+    text: dict[str, str] = {}
+    seen_idat = False
+    with open(url, 'rb') as f:
+        if f.read(len(_PNG_SIG)) != _PNG_SIG:
+            return text
+        while head := f.read(8):
+            if len(head) < 8:
+                break
+            length, ctype = struct.unpack('>I', head[:4])[0], head[4:]
+            if ctype == b'IEND':
+                break
+            if ctype == b'IDAT':
+                seen_idat = True
+            if not seen_idat or ctype not in (b'tEXt', b'zTXt', b'iTXt'):
+                f.seek(length + 4, 1)
+                continue
+            data = f.read(length)
+            f.seek(4, 1)
+            key, _, value = data.partition(b'\x00')
+            if ctype == b'zTXt':
+                value = zlib.decompress(value[1:])
+            elif ctype == b'iTXt':
+                compressed, value = value[0], value[2:]
+                value = value.split(b'\x00', 2)[-1]
+                if compressed:
+                    value = zlib.decompress(value)
+                text[key.decode('latin-1')] = value.decode('utf-8')
+                continue
+            text[key.decode('latin-1')] = value.decode('latin-1')
+    return text
+
+
+def metadata(
+    url: Path | str, cache: 'MetadataCache | None' = None, header_only: bool = False
+) -> dict | None:
     """Single schematized entry point for image-embedded metadata.
 
     Opens the image once and returns the `ait.image.metadata.v1` dict; the
@@ -114,8 +180,18 @@ def metadata(url: Path | str) -> dict | None:
     embeds it, with this render's `prompt_offset` applied. Own trustworthy
     data always wins; inherited fields are listed in `inherited`; the
     `parent` envelope itself stays verbatim.
+
+    With a `MetadataCache` the result comes from its (path, mtime, size)
+    keyed store when the file and its source chain are unchanged.
+    `header_only` reads the metadata without decoding pixels
+    (`image_header_from_url`); a truncated image then still yields its dict.
     """
+    if cache is not None:
+        return cache.metadata(url)
     url = Path(url)
+    if header_only:
+        pil = image_header_from_url(url)
+        return _metadata_from_pil(url, pil) if pil is not None else None
     pil = image_from_url(url)
     if pil is None:
         return None
@@ -126,9 +202,12 @@ def metadata(url: Path | str) -> dict | None:
     return _metadata_from_pil(url, pil)
 
 
-def _metadata_from_pil(url: Path, pil: PILImage.Image) -> dict:
+def _metadata_from_pil(
+    url: Path, pil: PILImage.Image, link: Callable[[Path], ChainLink | None] | None = None
+) -> dict:
     """Core of `metadata()`: build the v1 schema dict from an opened image.
-    Shared with the `image_info_from_url` adapter so the file is opened once."""
+    Shared with the `image_info_from_url` adapter so the file is opened once.
+    `link` resolves source-chain hops (default: open the file)."""
     info_ext = pil.info or {}
 
     prompt_graph = _parse_json_chunk(info_ext.get('prompt'))
@@ -170,7 +249,7 @@ def _metadata_from_pil(url: Path, pil: PILImage.Image) -> dict:
             # Stored-mode renders: the clipspace input is the SOURCE IMAGE
             # PATH (queue-time), the payload only lives at the root of that
             # source chain. This run's `prompt_offset` applies to it.
-            cand = _enhancer_payload_from_source_chain(prompt_graph)
+            cand = _enhancer_payload_from_source_chain(prompt_graph, link=link)
             if cand is not None:
                 own_index = _rendered_index_from_graph(cand, prompt_graph)
         if cand is not None:
@@ -212,7 +291,7 @@ def _metadata_from_pil(url: Path, pil: PILImage.Image) -> dict:
         # Renders without a resolvable payload: legacy graph paths — named
         # display marker, positive walk, display-cache fallback.
         try:
-            prompt = _image_extract_prompt_from_info_ext(info_ext, verbose=False)
+            prompt = _image_extract_prompt_from_info_ext(info_ext, verbose=False, link=link)
         except Exception:
             pass
 
@@ -320,13 +399,13 @@ def image_info_from_url(url: Path | str, include_info_ext: bool = False) -> dict
     Creates an info struct if image exists, otherwise returns None.
 
     Thin adapter over `metadata()` (same extraction, legacy flat key layout).
-    The given url is stored in ['url_src'].
+    The given url is stored in ['url_src']. Reads the header only
+    (`image_header_from_url`), the pixels are never decoded.
     """
     url = Path(url)
-    pil = image_from_url(url)
+    pil = image_header_from_url(url)
     if pil is None:
         return None
-    pil.load()
     md = _metadata_from_pil(url, pil)
 
     info = {
@@ -353,19 +432,72 @@ def image_info_from_url(url: Path | str, include_info_ext: bool = False) -> dict
     return info
 
 
+def _reducible(pil: PILImage.Image) -> PILImage.Image:
+    """pil in a mode Image.reduce supports: palette to RGB(A), bilevel to L, 16 bit to I."""
+    if pil.mode == 'P':
+        return pil.convert('RGBA' if 'transparency' in pil.info else 'RGB')
+    if pil.mode == '1':
+        return pil.convert('L')
+    if pil.mode.startswith('I;16'):
+        return pil.convert('I')
+    return pil
+
+
+def thumbnail_from_pil(pil: PILImage.Image, size: int = THUMBNAIL_SIZE) -> PILImage.Image:
+    """
+    Downsizes an opened (not yet loaded) image to fit size x size. The decode is cut down
+    before the final resample: a JPEG is drafted to the smallest DCT scale still at least
+    THUMBNAIL_REDUCING_GAP x size, a large image of any other format is box-reduced by the
+    integer factor that keeps that margin.
+    """
+    box = (size * THUMBNAIL_REDUCING_GAP, size * THUMBNAIL_REDUCING_GAP)
+    if pil.format == 'JPEG':
+        pil.draft(None, box)
+    factor = min(pil.width // box[0], pil.height // box[1])
+    if factor > 1:
+        pil = _reducible(pil).reduce(factor)
+    pil.thumbnail((size, size), reducing_gap=None)
+    return pil
+
+
+def thumbnail_stale(url_from: Path | str, url_to: Path | str) -> bool:
+    """A thumbnail carries the mtime of its source (see thumbnail_to_url): stale if missing or
+    differing, so a changed source or a different source both regenerate it. False without
+    a source."""
+    try:
+        mtime_from = os.stat(url_from).st_mtime_ns
+    except OSError:
+        return False
+    try:
+        return os.stat(url_to).st_mtime_ns != mtime_from
+    except OSError:
+        return True
+
+
 def thumbnail_to_url(url_from: Path | str, url_to: Path | str, size: int = THUMBNAIL_SIZE) -> None:
-    """Will create url_to parent and overrides url_to. url_from stoic"""
+    """Will create url_to parent and overrides url_to atomically. url_from stoic.
+    The thumbnail gets the mtime of url_from (see thumbnail_stale)."""
     if not is_img(url_from):
         return None
 
     url_to = Path(url_to)
     url_to.parent.mkdir(exist_ok=True, parents=True)
-    pil = PILImage.open(url_from)
-    pil.thumbnail((size, size))
-    pil.save(url_to)
+    with PILImage.open(url_from) as pil:
+        st = os.stat(url_from)
+        thumb = thumbnail_from_pil(pil, size)
+        # temp file next to the target, so readers never see a half-written thumbnail
+        tmp = url_to.with_name(f'.{url_to.name}.{os.getpid()}.tmp')
+        try:
+            thumb.save(tmp, format=PILImage.registered_extensions()[url_to.suffix.lower()])
+            os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+            tmp.replace(url_to)
+        finally:
+            tmp.unlink(missing_ok=True)
 
 
-def _image_extract_prompt_from_info_ext(info_ext: dict, verbose=False) -> str | None:
+def _image_extract_prompt_from_info_ext(
+    info_ext: dict, verbose=False, link: Callable[[Path], ChainLink | None] | None = None
+) -> str | None:
     info_prompt = info_ext.get('prompt', None)
     if info_prompt is None:
         return None
@@ -377,7 +509,7 @@ def _image_extract_prompt_from_info_ext(info_ext: dict, verbose=False) -> str |
     # display-cache path below: display widgets (the 'string pos' marker
     # included) are serialized one run stale (board #30), so on
     # payload-bearing renders they show the previous run's prompt.
-    iteration = _prompt_from_enhancer_iteration(info_ext, verbose)
+    iteration = _prompt_from_enhancer_iteration(info_ext, verbose, link=link)
     if iteration:
         return iteration
 
@@ -540,36 +672,56 @@ def _source_image_path_from_graph(data: dict) -> Path | None:
     return None
 
 
-def _enhancer_payload_from_source_chain(data: dict, max_depth: int = 8) -> dict | None:
+def _chain_link_from_info(info: dict) -> ChainLink:
+    """Source-chain facts of one image from its chunks: the payload its own
+    chunks embed (prompt-graph copy, else `parent_metadata` envelope) and the
+    queue-time source image its graph references."""
+    graph = _parse_json_chunk(info.get('prompt'))
+    if graph:
+        payload = _enhancer_payload_from_graph(graph)
+        if payload is not None:
+            return payload, None
+    parent = _parse_json_chunk(info.get(PARENT_METADATA_CHUNK))
+    if parent:
+        payload = _iteration_payload_from_obj(parent)
+        if payload is not None:
+            return payload, None
+    return None, _source_image_path_from_graph(graph) if graph else None
+
+
+def _chain_link(path: Path) -> ChainLink | None:
+    try:
+        pil = PILImage.open(path)
+        pil.load()
+    except Exception:
+        return None
+    return _chain_link_from_info(pil.info or {})
+
+
+def _enhancer_payload_from_source_chain(
+    data: dict, max_depth: int = 8, link: Callable[[Path], ChainLink | None] | None = None
+) -> dict | None:
     """Recover the iteration payload of a stored-mode render (board #30
     follow-up): its own graph carries only the queue-time source-image PATH.
     Follow that reference — transitively, since the source may itself be a
     stored-mode render — to the first file whose own chunks embed the payload
     (prompt-graph copy, else `parent_metadata` envelope). Depth-capped and
-    cycle-guarded; any unreadable link ends the walk (honest None)."""
+    cycle-guarded; any unreadable link ends the walk (honest None). `link`
+    yields each hop's facts (default `_chain_link` opens the file; the
+    metadata cache serves them from its rows)."""
+    link = link or _chain_link
     seen: set[str] = set()
-    graph: dict | None = data
+    path = _source_image_path_from_graph(data)
     for _ in range(max_depth):
-        path = _source_image_path_from_graph(graph) if graph else None
         if path is None or str(path) in seen:
             return None
         seen.add(str(path))
-        try:
-            pil = PILImage.open(path)
-            pil.load()
-        except Exception:
+        facts = link(path)
+        if facts is None:
             return None
-        info = pil.info or {}
-        graph = _parse_json_chunk(info.get('prompt'))
-        if graph:
-            payload = _enhancer_payload_from_graph(graph)
-            if payload is not None:
-                return payload
-        parent = _parse_json_chunk(info.get(PARENT_METADATA_CHUNK))
-        if parent:
-            payload = _iteration_payload_from_obj(parent)
-            if payload is not None:
-                return payload
+        payload, path = facts
+        if payload is not None:
+            return payload
     return None
 
 
@@ -597,7 +749,9 @@ def _prompt_offset_from_graph(data: dict) -> int | None:
     return None
 
 
-def _prompt_from_enhancer_iteration(info_ext: dict, verbose=False) -> str | None:
+def _prompt_from_enhancer_iteration(
+    info_ext: dict, verbose=False, link: Callable[[Path], ChainLink | None] | None = None
+) -> str | None:
     """Recover the positive prompt from the trustworthy embedded 1xlasm-enhancer
     iteration payload: the API prompt-graph copy only (queue-time input, see
     `_enhancer_payload_from_graph`). Workflow-chunk display-widget copies are
@@ -607,7 +761,7 @@ def _prompt_from_enhancer_iteration(info_ext: dict, verbose=False) -> str | None
     prompt_graph = _parse_json_chunk(info_ext.get('prompt'))
     payload = _enhancer_payload_from_graph(prompt_graph) if prompt_graph else None
     if payload is None and prompt_graph:
-        payload = _enhancer_payload_from_source_chain(prompt_graph)
+        payload = _enhancer_payload_from_source_chain(prompt_graph, link=link)
     if payload is None:
         return None
     # Same rendered-index derivation as metadata(): stamped index, else
@@ -849,8 +1003,16 @@ def _image_extract_loras_from_info_ext(info_ext: dict, verbose: bool = False) ->
 
 
 def train_from_image(
-    pil: PILImage.Image, ratios: list[float] = RATIOS, resolutions: list[int] = RESOLUTIONS
+    pil: PILImage.Image,
+    ratios: list[float] = RATIOS,
+    resolutions: list[int] = RESOLUTIONS,
+    stats: Counter | None = None,
+    backend: TrainResizeBackend = 'auto',
 ) -> Optional[PILImage.Image]:
+    """
+    Center-crops pil to the closest of ratios and resizes it to the largest resolution below
+    the crop (see resize_train). stats counts the resulting (width, height) buckets.
+    """
     width, height = pil.size  # Get dimensions
     minwh = min(width, height)
     maxwh = max(width, height)
@@ -886,12 +1048,12 @@ def train_from_image(
     right = (width + new_width) / 2
     bottom = (height + new_height) / 2
 
-    # make square by crop around center
-    pil_train = pil.crop((left, top, right, bottom))
+    # crop around center (rounded like Image.crop), done by the resize
+    box = tuple(int(round(v)) for v in (left, top, right, bottom))
 
     # resize
     resolution_target = resolutions[0]
-    width_crop, height_crop = pil_train.size
+    width_crop, height_crop = box[2] - box[0], box[3] - box[1]
     maxwh_crop = max(width_crop, height_crop)
     for resolution_check in resolutions:
         if maxwh_crop > resolution_check:
@@ -906,12 +1068,63 @@ def train_from_image(
         width_train = train_min
         height_train = train_max
 
-    print(
-        f'train img resize: [{width},{height}] -> [{width_crop},{height_crop}] -> [{width_train},{height_train}]'
-    )
-    pil_train = pil_train.resize((width_train, height_train), PILImage.Resampling.LANCZOS)
+    if stats is not None:
+        stats[(width_train, height_train)] += 1
+    return resize_train(pil, (width_train, height_train), box=box, backend=backend)
+
+
+_cv2_module: Any = None  # None: not probed yet, False: not installed
+
+
+def _cv2() -> Any:
+    global _cv2_module
+    if _cv2_module is None:
+        try:
+            import cv2
 
-    return pil_train
+            _cv2_module = cv2
+        except ImportError:
+            _cv2_module = False
+    return _cv2_module or None
+
+
+def resize_train(
+    pil: PILImage.Image,
+    size: tuple[int, int],
+    box: tuple[int, int, int, int] | None = None,
+    backend: TrainResizeBackend = 'auto',
+) -> PILImage.Image:
+    """
+    Resizes the box region of pil (default: all of it) to size.
+
+    Downscales go through OpenCV INTER_AREA when installed (backend 'auto' or 'cv2', RGB / RGBA
+    / L only), else Pillow: an integer box reduce() first, so the final LANCZOS only resamples
+    from TRAIN_REDUCING_GAP x the target size. Against a plain LANCZOS resize both keep a PSNR
+    of at least TRAIN_RESIZE_PSNR_MIN. A pillow-simd install speeds up the Pillow path as is.
+    """
+    if box is None:
+        box = (0, 0, pil.width, pil.height)
+    width_box, height_box = box[2] - box[0], box[3] - box[1]
+    downscale = width_box >= size[0] and height_box >= size[1]
+
+    cv2 = _cv2() if backend in ('auto', 'cv2') else None
+    if cv2 is not None and downscale and pil.mode in ('RGB', 'RGBA', 'L'):
+        import numpy as np
+
+        arr = np.asarray(pil)[box[1] : box[3], box[0] : box[2]]
+        return PILImage.fromarray(cv2.resize(arr, size, interpolation=cv2.INTER_AREA))
+
+    if downscale:
+        factor = int(
+            min(
+                width_box // (size[0] * TRAIN_REDUCING_GAP),
+                height_box // (size[1] * TRAIN_REDUCING_GAP),
+            )
+        )
+        if factor > 1:
+            pil = _reducible(pil).reduce(factor, box=box)
+            box = (0, 0, pil.width, pil.height)
+    return pil.resize(size, PILImage.Resampling.LANCZOS, box=box)
 
 
 EMBED_MODEL_DEFAULT: Final = 'dinov2:small'
@@ -965,9 +1178,6 @@ def _png_text_chunk_upsert(url: Path, key: str, text: str) -> bool:
     every other chunk (prompt graph, workflow, parent_metadata provenance)
     stay byte-identical; a stale chunk under the same key is replaced. Atomic
     via temp file + rename. Returns False (no write) on any non-PNG input."""
-    import struct
-    import zlib
-
     try:
         raw = url.read_bytes()
     except OSError:
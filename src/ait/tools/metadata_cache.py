@@ -0,0 +1,198 @@
+"""Persistent cache of `ait.tools.images.metadata()` results.
+
+One sqlite row per image, keyed by its real path and validated against the
+file's (mtime_ns, size). A row keeps the parsed metadata dict and the file's
+source-chain facts (own embedded enhancer payload, queue-time source image),
+so resolving a stored-mode render's source chain walks cached rows instead
+of opening an image at every hop. A metadata dict that was completed from
+the source chain records the (path, mtime_ns, size) of every hop it used and
+is recomputed when one of them changes. A `header_only` cache parses misses
+without decoding pixels (`ait.tools.images.image_header_from_url`).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Final
+
+from PIL import Image as PILImage
+
+from ait.tools.images import (
+    ChainLink,
+    _chain_link_from_info,
+    _metadata_from_pil,
+    image_from_url,
+    image_header_from_url,
+)
+
+CACHE_VERSION: Final = 1
+LOOKUP_CHUNK: Final = 500  # paths per SELECT
+
+_SCHEMA: Final = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    md TEXT,        -- metadata() dict as JSON, 'null' if unreadable, NULL if not computed
+    link TEXT,      -- [payload, source] as JSON, 'null' if unreadable, NULL if not computed
+    deps TEXT       -- [[path, mtime_ns, size], ...] of the source-chain hops md used
+)
+"""
+
+Key = tuple[str, int, int] | tuple[str, None, None]
+
+
+def _key(url: str | Path) -> Key:
+    path = os.path.realpath(url)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return path, None, None
+    return path, st.st_mtime_ns, st.st_size
+
+
+def _link_dump(link: ChainLink | None) -> str:
+    if link is None:
+        return 'null'
+    payload, source = link
+    return json.dumps([payload, str(source) if source is not None else None])
+
+
+def _link_load(raw: str) -> ChainLink | None:
+    data = json.loads(raw)
+    if data is None:
+        return None
+    payload, source = data
+    return payload, Path(source) if source is not None else None
+
+
+class MetadataCache:
+    """
+    sqlite cache of image metadata at url (default ~/.cache/ait/metadata.sqlite3), thread safe.
+    metadata() / metadata_many() return what `ait.tools.images.metadata()` returns.
+    """
+
+    def __init__(self, url: str | Path | None = None, header_only: bool = False) -> None:
+        if url is None:
+            url = Path.home() / '.cache' / 'ait' / 'metadata.sqlite3'
+        self.url = Path(url)
+        self.header_only = header_only
+        self.url.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(self.url, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        if self._db.execute('PRAGMA user_version').fetchone()[0] != CACHE_VERSION:
+            self._db.execute('DROP TABLE IF EXISTS files')
+            self._db.execute(f'PRAGMA user_version={CACHE_VERSION}')
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _rows(self, paths: list[str]) -> dict[str, tuple]:
+        rows = {}
+        with self._lock:
+            for i in range(0, len(paths), LOOKUP_CHUNK):
+                chunk = paths[i : i + LOOKUP_CHUNK]
+                marks = ','.join('?' * len(chunk))
+                for row in self._db.execute(
+                    f'SELECT path, mtime_ns, size, md, link, deps FROM files WHERE path IN ({marks})',
+                    chunk,
+                ):
+                    rows[row[0]] = row
+        return rows
+
+    def _put(self, rows: list[tuple]) -> None:
+        with self._lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO files (path, mtime_ns, size, md, link, deps) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                rows,
+            )
+            self._db.commit()
+
+    @staticmethod
+    def _fresh(row: tuple | None, key: Key) -> bool:
+        return row is not None and row[1] == key[1] and row[2] == key[2]
+
+    @staticmethod
+    def _deps_fresh(deps: str | None) -> bool:
+        return all(tuple(_key(dep[0])) == tuple(dep) for dep in json.loads(deps or '[]'))
+
+    def link(self, url: str | Path) -> ChainLink | None:
+        """Source-chain facts of url (cached), None if unreadable."""
+        key = _key(url)
+        if key[1] is None:
+            return None
+        row = self._rows([key[0]]).get(key[0])
+        if self._fresh(row, key) and row[4] is not None:
+            return _link_load(row[4])
+        try:
+            if self.header_only:
+                pil = image_header_from_url(key[0])
+            else:
+                pil = PILImage.open(key[0])
+                pil.load()
+            link = _chain_link_from_info(pil.info or {}) if pil is not None else None
+        except Exception:
+            link = None
+        md = row[3] if self._fresh(row, key) else None
+        deps = row[5] if self._fresh(row, key) else None
+        self._put([(*key, md, _link_dump(link), deps)])
+        return link
+
+    def _compute(self, url: Path, key: Key) -> tuple[dict | None, tuple]:
+        deps: list[Key] = []
+
+        def link(path: Path) -> ChainLink | None:
+            deps.append(_key(path))
+            return self.link(path)
+
+        md = None
+        facts: ChainLink | None = None
+        pil = image_header_from_url(url) if self.header_only else image_from_url(url)
+        if pil is not None:
+            try:
+                if not self.header_only:
+                    pil.load()
+                md = _metadata_from_pil(url, pil, link=link)
+                facts = _chain_link_from_info(pil.info or {})
+            except Exception:
+                md = None
+        row = (*key, json.dumps(md), _link_dump(facts), json.dumps(deps))
+        return md, row
+
+    def metadata(self, url: str | Path) -> dict | None:
+        return self.metadata_many([url])[Path(url)]
+
+    def metadata_many(self, urls: Iterable[str | Path]) -> dict[Path, dict | None]:
+        """metadata() of every url: one lookup for all, misses parsed and stored in one commit."""
+        urls = [Path(url) for url in urls]
+        keys = {url: _key(url) for url in urls}
+        rows = self._rows(list({key[0] for key in keys.values()}))
+        result: dict[Path, dict | None] = {}
+        new_rows = []
+        for url, key in keys.items():
+            if key[1] is None:
+                result[url] = None
+                continue
+            row = rows.get(key[0])
+            if self._fresh(row, key) and row[3] is not None and self._deps_fresh(row[5]):
+                md = json.loads(row[3])
+            else:
+                md, row = self._compute(url, key)
+                new_rows.append(row)
+            if md is not None:
+                # the row is shared by every spelling of the path; ctime is not part of the key
+                md['url'] = str(url)
+                md['image']['timestamp_created'] = os.stat(key[0]).st_ctime
+            result[url] = md
+        if new_rows:
+            self._put(new_rows)
+        return result
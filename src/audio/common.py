@@ -7,6 +7,7 @@ EXT_VIDEOS: Final = [".mp4",".3gp",".wmv"]
 EXT_AUDIO: Final = ".mp3"
 EXT_JSON_TRANSCRIBE: Final = ".json_transcribe"
 DIR_METADATA: Final = "___metadata"
+SAMPLE_RATE: Final = 16000 # whisper input rate
 
 def _ofile_attach_metadata(file: Path) -> Path:
     opath = Path(file.parent, DIR_METADATA)
@@ -1,13 +1,32 @@
 import subprocess
 import os
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 
-from audio.common import _ofile_attach_metadata, _file_link_metadata, EXT_VIDEOS
+import numpy as np
 
-def _extract_audio_fiorfo(fiorfo: str, output_ext: str =".mp3", force=False):
+from audio.common import _ofile_attach_metadata, _file_link_metadata, EXT_VIDEOS, SAMPLE_RATE
+
+def _workers_default() -> int:
+    # ffmpeg is multi threaded on its own, a few concurrent decodes saturate the cpu
+    return min(4, os.cpu_count() or 1)
+
+def _extract_audio_file(ifile: Path, ofile: Path):
+    print(f"{ifile} -> {ofile}")
+    subprocess.call(
+        ["ffmpeg", "-nostdin", "-vn", "-y", "-i", str(ifile), str(ofile)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.STDOUT,
+        )
+
+def _extract_audio_fiorfo(fiorfo: str, output_ext: str =".mp3", force=False, workers: int | None = None):
 
     ipath = Path(fiorfo)
 
+    jobs = {}
     for ext_video in EXT_VIDEOS:
         ifiles = [ipath]
         if not ipath.is_file():
@@ -22,9 +41,34 @@ def _extract_audio_fiorfo(fiorfo: str, output_ext: str =".mp3", force=False):
                 if not force:
                     continue
 
-            print(f"{ifile} -> {ofile}")
-            subprocess.call(
-                ["ffmpeg", "-vn", "-y", "-i", str(ifile), str(ofile)],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.STDOUT,
-                )
\ No newline at end of file
+            jobs[ofile] = ifile
+
+    with ThreadPoolExecutor(workers or _workers_default()) as executor:
+        list(executor.map(_extract_audio_file, jobs.values(), jobs.keys()))
+
+def _decode_pcm(ifile: Path, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decodes the audio track of ifile to mono float32 PCM, streamed from ffmpeg's stdout (no temp file)."""
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", str(ifile), "-vn",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-",
+    ]
+    proc = subprocess.run(cmd, capture_output=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed decoding {ifile}: {proc.stderr.decode(errors='replace')[-500:]}")
+    return np.frombuffer(proc.stdout, np.int16).astype(np.float32) / 32768.0
+
+def _decode_prefetch(ifiles: Iterable[Path], workers: int | None = None) -> Iterator[Future]:
+    """
+    Decodes ifiles on a bounded pool, yields one future per file in input order.
+    At most 2*workers decoded files are held in memory ahead of the consumer.
+    """
+    workers = workers or _workers_default()
+    it = iter(ifiles)
+    with ThreadPoolExecutor(workers) as executor:
+        pending = deque(executor.submit(_decode_pcm, ifile) for ifile in islice(it, 2 * workers))
+        while pending:
+            future = pending.popleft()
+            ifile = next(it, None)
+            if ifile is not None:
+                pending.append(executor.submit(_decode_pcm, ifile))
+            yield future
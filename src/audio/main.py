@@ -1,7 +1,12 @@
 from audio.extract import _extract_audio_fiorfo
 from audio.transcribe import _transcribe_fiorfo
 
-def transcribe(fiorfo: str, extract_audio=True, subtitles=True, force=False):
+def transcribe(fiorfo: str, extract_audio=True, subtitles=True, force=False, model="base", workers: int | None = None):
+    """
+    Transcribes a video file or all videos of a folder with whisper.
+    extract_audio: keep the audio track as mp3 in the metadata folder, otherwise the videos are decoded directly.
+    workers: number of concurrent ffmpeg processes, the whisper model is loaded once and shared.
+    """
     if extract_audio:
-        _extract_audio_fiorfo(fiorfo, force=force)
-    _transcribe_fiorfo(fiorfo, subtitles=subtitles, force=force)
\ No newline at end of file
+        _extract_audio_fiorfo(fiorfo, force=force, workers=workers)
+    _transcribe_fiorfo(fiorfo, subtitles=subtitles, force=force, model=model, workers=workers)
\ No newline at end of file
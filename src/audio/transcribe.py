@@ -1,12 +1,15 @@
 import whisper
 #import soundfile as sf
-import torch
 import json
+import os
+import numpy as np
+from functools import cache
 from whisper.utils import get_writer
 from pathlib import Path
 from typing import Final
 
-from audio.common import _ofile_wo_audio_ext, _ofile_w_ext, _ofile_attach_metadata, EXT_JSON_TRANSCRIBE, EXT_AUDIO, DIR_METADATA
+from audio.common import _ofile_wo_audio_ext, _ofile_w_ext, _ofile_attach_metadata, EXT_JSON_TRANSCRIBE, EXT_AUDIO, EXT_VIDEOS, DIR_METADATA
+from audio.extract import _decode_pcm, _decode_prefetch
 
 def _subtitles(ifile: Path, result: dict, format="srt"):
     opath = ifile.parent
@@ -15,40 +18,74 @@ def _subtitles(ifile: Path, result: dict, format="srt"):
     writer = get_writer("srt", str(opath)) # get srt,tsv,vtt writer for the current directory
     writer(result, ofile, {}) # add empty dictionary for 'options
 
-def _transcribe_file(ifile: Path, model="medium.en", subtitles=True, force=False):
+class TranscribeWorker:
+    """Long lived whisper model, loaded once and fed with decoded PCM (see _transcribe_worker)."""
+
+    def __init__(self, model="base", device="cpu", language="en"):
+        #torch.cuda.init()
+        #print(f"num mps devices: {torch.mps.device_count()}")
+        #device = torch.device("mps")
+        self.model = model
+        self.device = device
+        self.language = language
+        self.fp16 = device != "cpu"
+        print(f"loading whisper model {model} on {device}")
+        self.model_whisper = whisper.load_model(model, device=device)
+
+    def __call__(self, audio: np.ndarray | str) -> dict:
+        return self.model_whisper.transcribe(audio, language=self.language, fp16=self.fp16)
+
+@cache
+def _transcribe_worker(model="base", device="cpu") -> TranscribeWorker:
+    """One TranscribeWorker per process and model."""
+    return TranscribeWorker(model, device)
+
+def _store_result(ifile: Path, result: dict, subtitles=True):
+    if subtitles:
+        _subtitles(ifile, result)
+
+    # the json marks ifile as done: written last and atomically, a crash never leaves a partial one
+    ofile_json = _ofile_w_ext(ifile, EXT_JSON_TRANSCRIBE)
+    ofile_tmp = ofile_json.with_name(f"{ofile_json.name}.tmp")
+    with ofile_tmp.open("wt") as f:
+        json.dump(result, f, indent=2)
+    os.replace(ofile_tmp, ofile_json)
+
+def _transcribe_file(ifile: Path, model="base", subtitles=True, force=False):
     ofile_json = _ofile_w_ext(ifile, EXT_JSON_TRANSCRIBE)
 
     if ofile_json.exists():
         if not force:
             return
 
-    #torch.cuda.init()
-    #print(f"num mps devices: {torch.mps.device_count()}")
-    #device = torch.device("mps")
-    device = "cpu"
-    #model = "tiny"
-    model = "base"
-    #model = "medium"
-    #model = "large"
-
-    fp16 = True
-    if device == "cpu":
-        model_whisper = whisper.load_model(model)
-        fp16 = False
-    else:
-        model_whisper = whisper.load_model(model).to(device)
-
-    result = model_whisper.transcribe(str(ifile), language="en", fp16=fp16)
-
-    with ofile_json.open("+wt") as f:
-        json.dump(result, f, indent=2)
-
-    if subtitles:
-        _subtitles(ifile, result)
+    result = _transcribe_worker(model)(_decode_pcm(ifile))
+    _store_result(ifile, result, subtitles=subtitles)
 
     return result
 
+def _transcribe_files(jobs: dict[Path, Path], model="base", subtitles=True, force=False, workers: int | None = None):
+    """
+    Transcribes jobs {ifile: source}: source is decoded on a pool of ffmpeg processes, feeding a single whisper model.
+    Results of ifile are stored as soon as done; files with a stored result are skipped unless forced, so an
+    interrupted run resumes where it stopped.
+    """
+    if not force:
+        jobs = {ifile: src for ifile, src in jobs.items() if not _ofile_w_ext(ifile, EXT_JSON_TRANSCRIBE).exists()}
+    if not jobs:
+        return
+
+    worker = _transcribe_worker(model)
+    for (ifile, src), future in zip(jobs.items(), _decode_prefetch(jobs.values(), workers), strict=True):
+        try:
+            audio = future.result()
+        except RuntimeError as e:
+            print(f"skipping {src}: {e}")
+            continue
+        print(f"{src} -> {_ofile_w_ext(ifile, EXT_JSON_TRANSCRIBE)}")
+        _store_result(ifile, worker(audio), subtitles=subtitles)
+
 def _get_model_whisper():
+    import torch
     import whisper
 
     # specify the path to the input audio file
@@ -78,17 +115,22 @@ def _get_model_whisper():
     #with torch.cuda.device(device):
     #     result = model.transcribe(audio_data, language=language, fp16=True, word_timestamps=True)
 
-def _transcribe_fiorfo(fiorfo: str, subtitles=True, force=False):
+def _transcribe_fiorfo(fiorfo: str, subtitles=True, force=False, model="base", workers: int | None = None):
 
     ifiorfo = Path(fiorfo)
 
-    ifiles = []
+    # result files are keyed by the (extracted) audio file in the metadata folder, videos without one are decoded directly
+    jobs = {}
     if ifiorfo.is_file():
         ifile = _ofile_attach_metadata(ifiorfo).with_suffix(EXT_AUDIO)
-        ifiles = [ifile]
+        jobs[ifile] = ifile if ifile.exists() else ifiorfo
     else:
+        for ext_video in EXT_VIDEOS:
+            for ivideo in sorted(ifiorfo.glob(f"*{ext_video}")):
+                ifile = _ofile_attach_metadata(ivideo).with_suffix(EXT_AUDIO)
+                jobs[ifile] = ifile if ifile.exists() else ivideo
         ipath = Path(ifiorfo, DIR_METADATA)
-        ifiles = ipath.glob(f"*{EXT_AUDIO}")
+        for ifile in sorted(ipath.glob(f"*{EXT_AUDIO}")):
+            jobs[ifile] = ifile
 
-    for ifile in ifiles:
-        _transcribe_file(ifile, subtitles=subtitles, force=force)
+    _transcribe_files(jobs, model=model, subtitles=subtitles, force=force, workers=workers)
@@ -0,0 +1,150 @@
+"""Shared dataset builder for the trainers.
+
+A training dataset is a folder of image symlinks (or copies) with one `.txt`
+caption per image. Building it is planned in the calling process (sampling,
+captions, trigger) and executed by DatasetBuilder:
+
+- only entries whose source file (size, mtime), caption or mode changed since
+  the last build are touched, tracked in a manifest inside the folder;
+- the remaining entries are sorted largest source first and cut into small
+  batches that a process pool pulls one at a time, so a slow batch does not
+  hold back a statically assigned share of the work;
+- every task writes the captions of its whole batch, results come back per
+  entry and the manifest is saved once per build.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Final
+
+from ait.tools.files import url_symlink_to
+
+FILE_MANIFEST: Final = '.manifest.json'
+BATCH_SIZE: Final = 32  # entries per pool task
+POOL_MIN: Final = 2 * BATCH_SIZE  # fewer changed entries are built inline
+
+
+@dataclass(frozen=True)
+class DatasetEntry:
+    src: Path
+    caption: str | None  # None: image without caption file
+
+
+def _caption_hash(caption: str | None) -> str | None:
+    if caption is None:
+        return None
+    return hashlib.sha256(caption.encode('utf-8')).hexdigest()[:16]
+
+
+def _build_batch(dir_dataset: str | Path, batch: list[tuple[str, str | None]], copy: bool) -> list:
+    """Pool task: links/copies a batch of sources and writes their captions. Returns errors."""
+    url_dataset = Path(dir_dataset)
+    errors = []
+    for src, caption in batch:
+        img_file = url_dataset / Path(src).name
+        try:
+            if copy:
+                if img_file.is_symlink():
+                    img_file.unlink()
+                shutil.copyfile(src, img_file)
+            else:
+                # a copy from an earlier copy=True build: url_symlink_to refuses to replace it
+                if img_file.exists() and not img_file.is_symlink():
+                    img_file.unlink()
+                url_symlink_to(src, img_file)
+            if caption is not None:
+                img_file.with_suffix('.txt').write_text(caption, encoding='utf-8')
+        except OSError as e:
+            errors.append((img_file.name, str(e)))
+    return errors
+
+
+class DatasetBuilder:
+    """
+    Builds dataset entries into dir_dataset. workers=1 builds inline, None uses one process per
+    cpu. copy=True copies the images instead of symlinking them.
+    """
+
+    def __init__(self, dir_dataset: str | Path, workers: int | None = None, copy: bool = False):
+        self.dir_dataset = Path(dir_dataset)
+        self.workers = workers or os.cpu_count() or 1
+        self.copy = copy
+        self._url_manifest = self.dir_dataset / FILE_MANIFEST
+
+    def _load_manifest(self) -> dict[str, dict]:
+        try:
+            return json.loads(self._url_manifest.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest: dict[str, dict]) -> None:
+        tmp = self._url_manifest.with_name(FILE_MANIFEST + '.tmp')
+        tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True))
+        os.replace(tmp, self._url_manifest)
+
+    def _present(self, name: str, record: dict) -> bool:
+        img_file = self.dir_dataset / name
+        if not img_file.exists() or img_file.is_symlink() == record['copy']:
+            return False
+        return record['caption'] is None or img_file.with_suffix('.txt').exists()
+
+    def build(self, entries: list[DatasetEntry]) -> dict[str, int]:
+        """
+        Builds entries (sources missing on disk are skipped). Returns counts of built, unchanged,
+        missing and failed entries.
+        """
+        self.dir_dataset.mkdir(parents=True, exist_ok=True)
+        manifest = self._load_manifest()
+        counts = {'built': 0, 'unchanged': 0, 'missing': 0, 'failed': 0}
+
+        todo: list[tuple[int, str, dict, DatasetEntry]] = []
+        for entry in entries:
+            try:
+                st = os.stat(entry.src)
+            except OSError:
+                counts['missing'] += 1
+                continue
+            name = entry.src.name
+            record = {
+                'src': str(entry.src),
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+                'caption': _caption_hash(entry.caption),
+                'copy': self.copy,
+            }
+            if manifest.get(name) == record and self._present(name, record):
+                counts['unchanged'] += 1
+                continue
+            todo.append((st.st_size, name, record, entry))
+
+        # largest first: the long tasks start early and the small ones fill the gaps
+        todo.sort(key=lambda t: t[0], reverse=True)
+        batches = [todo[i : i + BATCH_SIZE] for i in range(0, len(todo), BATCH_SIZE)]
+        args = [[(str(entry.src), entry.caption) for _, _, _, entry in batch] for batch in batches]
+        dir_dataset = str(self.dir_dataset)
+        if self.workers == 1 or len(todo) < POOL_MIN:
+            results = [_build_batch(dir_dataset, batch, self.copy) for batch in args]
+        else:
+            with ProcessPoolExecutor(min(self.workers, len(batches))) as executor:
+                futures = [
+                    executor.submit(_build_batch, dir_dataset, batch, self.copy) for batch in args
+                ]
+                results = [future.result() for future in futures]
+
+        for batch, errors in zip(batches, results, strict=True):
+            failed = dict(errors)
+            for _, name, record, _ in batch:
+                if name in failed:
+                    print(f'dataset: {name} failed: {failed[name]}')
+                    manifest.pop(name, None)
+                    counts['failed'] += 1
+                else:
+                    manifest[name] = record
+                    counts['built'] += 1
+        self._save_manifest(manifest)
+        return counts
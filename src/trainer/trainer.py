@@ -1,15 +1,13 @@
 import os
 from pathlib import Path
 from typing import Final
-import threading
 import random
 
-from more_itertools import chunked_even
-
 from aidb import HFDataset
 from ait.install import AInstaller
 from templater import Templater
-from ait.tools.files import url_symlink_to
+
+from .dataset import DatasetBuilder, DatasetEntry
 
 
 class Trainer:
@@ -109,7 +107,8 @@ class Trainer:
         return self.root / self.DIR_DATASET
 
     def _make_dataset(self, multithread: bool = False) -> None:
-        self.dir_dataset.mkdir(parents=True, exist_ok=True)
+        # multithread: build on a process pool (one worker per cpu), else inline
+        builder = DatasetBuilder(self.dir_dataset, workers=None if multithread else 1)
         for item in self._repo_ids_hfd:
             repo_id = ''
             max_imgs = 0
@@ -129,27 +128,20 @@ class Trainer:
                 if len(item) >= 3 and item[2]:
                     ids_filter = list(item[2])
             hfd = HFDataset(repo_id, force_meta_dl=True)
-            hfd.cache()
-            if len(hfd) < 60 or ids_filter is not None:
-                # Multithreading chunks `hfd.ids` into 8 buckets and assumes
-                # >= 8 images; small filtered pools (e.g. 25) break that.
-                multithread = False
-
-            self._make_dataset_hfd(
-                hfd,
-                multithread=multithread,
-                max_imgs=max_imgs,
-                ids_filter=ids_filter,
+
+            entries = self._make_dataset_hfd(hfd, max_imgs=max_imgs, ids_filter=ids_filter)
+            counts = builder.build(entries)
+            print(
+                f'dataset {repo_id}: {counts["built"]} built, {counts["unchanged"]} unchanged, '
+                f'{counts["missing"]} missing, {counts["failed"]} failed'
             )
 
     def _make_dataset_hfd(
         self,
         hfd: HFDataset,
-        multithread: bool = False,
         max_imgs: int = 0,
         ids_filter: list[str] | None = None,
-    ) -> None:
-        # non multi-threaded
+    ) -> list[DatasetEntry]:
         if ids_filter is not None:
             allowed = set(ids_filter)
             ids_img = [iid for iid in hfd.ids if iid in allowed]
@@ -161,38 +153,16 @@ class Trainer:
                 )
         else:
             ids_img = [id for id in hfd.ids]
-        if not multithread:
-            self._process_imgs(ids_img, hfd, max_imgs=max_imgs)
-        else:
-            # multi-threaded
-            n = 8
-            m = len(hfd)
-            ids = []
-            for batch in chunked_even(ids_img, (m // n) + 1):
-                ids.append(batch)
-            if len(ids) != n:
-                raise ValueError('dataset multithreading failed!')
-
-            threads = []
-            for i in range(n):
-                thread = threading.Thread(
-                    target=self._process_imgs,
-                    args=[
-                        ids[i],
-                        hfd,
-                        max_imgs,
-                    ],
-                )
-                print(f' dataset thread[{i}]: {len(ids[i])} imgs')
-                threads.append(thread)
-                thread.start()
-            for i in range(n):
-                threads[i].join()
-                print(f' dataset thread[{i}]: joined.')
-
-    def _process_imgs(self, ids: list[str], hfd: HFDataset, max_imgs: int = 0) -> None:
+        return self._entries_imgs(ids_img, hfd, max_imgs=max_imgs)
+
+    def _entries_imgs(
+        self, ids: list[str], hfd: HFDataset, max_imgs: int = 0
+    ) -> list[DatasetEntry]:
+        # samples the pool, fetches just the picked images and resolves image file and caption
+        # of every picked id; the files are written by DatasetBuilder
+        entries: list[DatasetEntry] = []
         if not ids:
-            return
+            return entries
         # pick_chance against the iteration pool (which may be filtered
         # smaller than the full HF dataset via ids_filter). max_imgs=0 means
         # "take everything in the pool".
@@ -203,6 +173,7 @@ class Trainer:
         lost = 0
         success = 0
         not_picked = 0
+        picked = []
         for id in ids:
             pick = False
             if random.random() < pick_chance:
@@ -212,23 +183,25 @@ class Trainer:
                 continue
             if not id:
                 continue
+            picked.append(id)
 
+        files_img = hfd.prefetch(picked)
+        for id in picked:
             #
             # image
             #
-            url_img = hfd.url_file_from_id(id)
+            url_img = files_img.get(id, None)
             if url_img is None:
+                lost += 1
                 continue
 
-            # symlink file to dataset folder
-            img_file = self.dir_dataset / url_img.name
-            url_symlink_to(url_img, img_file)
-
             #
             # caption
             #
             caption = hfd.caption_from_id(id)
             if not caption:
+                # the image is still linked, without caption file
+                entries.append(DatasetEntry(url_img, None))
                 lost += 1
                 print(f'caption missing for {id}!')
                 continue
@@ -236,18 +209,13 @@ class Trainer:
             if self._trigger is not None:
                 caption = f'{self._trigger},' + caption
 
-            # write caption to file
-            cap_file = img_file.with_suffix('.txt')
-            with cap_file.open('w', encoding='utf-8') as f:
-                f.write(caption)
-
             #
             # ok
             #
+            entries.append(DatasetEntry(url_img, caption))
             success += 1
-        print(
-            f'dataset thread finished: {success} successes, {lost} losses, {not_picked} not picked'
-        )
+        print(f'dataset planned: {success} successes, {lost} losses, {not_picked} not picked')
+        return entries
 
     def _make_file_train_script(self) -> None:
         str_file = f"""
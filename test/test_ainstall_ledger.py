@@ -0,0 +1,189 @@
+"""Tests for AInstaller's install-state ledger (`ait.install.ledger`).
+
+Items are installed into a tmp tree with the download stubbed out; a second
+install of an unchanged entry must come from the ledger without a download,
+while a changed file or config installs again. No network, no DB.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('git')  # ait.install pulls in gitpython
+os.environ.setdefault('CONF_AIT', str(Path(__file__).resolve().parent.parent / 'conf'))
+
+from ait.install import ainstall  # noqa: E402
+from ait.install.ledger import InstallLedger, entry_hash, files_state, hf_revision  # noqa: E402
+
+
+@pytest.fixture
+def installer(tmp_path, monkeypatch):
+    # an AInstaller without config DB and without running install() on construction
+    inst = object.__new__(ainstall.AInstaller)
+    inst._cache = tmp_path / 'cache'
+    inst._cache.mkdir()
+    inst.base_dir = tmp_path / 'base'
+    inst.type = 'comfyui'
+    inst.verbose = False
+    inst.workers = inst.segments = 1
+    inst.requirements = []
+    inst.ledger = InstallLedger(inst._cache / 'ledger.json')
+    inst._download_locks = {}
+    inst._download_locks_guard = threading.Lock()
+    inst.downloads = []
+
+    def fake_download(url, cache_file, config, headers=None):
+        inst.downloads.append(url)
+        cache_file.write_bytes(b'weights')
+
+    monkeypatch.setattr(inst, '_download', fake_download)
+    return inst
+
+
+def _item(config: dict) -> dict:
+    return {
+        'group': 'comfyui',
+        'variant': 'common',
+        'target': 'lora',
+        'config': {'method_download': 'wget'} | config,
+        'type': 'comfyui',
+    }
+
+
+WGET = {'link': 'https://example.org/files/style.safetensors', 'rename': 'style'}
+
+
+def test_second_install_comes_from_ledger(installer):
+    first = installer._install_item(_item(WGET))
+    second = installer._install_item(_item(WGET))
+
+    assert installer.downloads == [WGET['link']]
+    assert second['link'] == first['link']
+    assert Path(second['link']).read_bytes() == b'weights'
+    # the ledger survives the process
+    assert len(InstallLedger(installer.ledger.url)) == 1
+
+
+def test_changed_file_installs_again(installer):
+    installer._install_item(_item(WGET))
+    (installer._cache / 'style.safetensors').write_bytes(b'truncated')
+
+    installer._install_item(_item(WGET))
+
+    assert len(installer.downloads) == 2
+
+
+def test_changed_config_or_force_installs_again(installer):
+    installer._install_item(_item(WGET))
+
+    installer._install_item(_item(WGET | {'size': 7}))
+    installer._install_item(_item(WGET | {'force': True}))
+
+    assert len(installer.downloads) == 3
+
+
+def test_missing_link_installs_again(installer):
+    link = installer._install_item(_item(WGET))['link']
+    os.unlink(link)
+
+    installer._install_item(_item(WGET))
+
+    assert len(installer.downloads) == 2
+
+
+def test_same_cache_file_downloads_one_at_a_time(installer, monkeypatch):
+    # two items of one link (renamed differently) resolve to the same cache file and .part
+    monkeypatch.delattr(installer, '_download')
+    lock = threading.Lock()
+    running = {'now': 0, 'max': 0}
+
+    def download(url, dest, **kwargs):
+        with lock:
+            running['now'] += 1
+            running['max'] = max(running['max'], running['now'])
+        time.sleep(0.05)
+        if not dest.exists():
+            installer.downloads.append(url)
+            dest.write_bytes(b'weights')
+        with lock:
+            running['now'] -= 1
+        return dest
+
+    monkeypatch.setattr(ainstall, 'download', download)
+    items = [_item(WGET), _item(WGET | {'rename': 'style_copy'})]
+    with ThreadPoolExecutor(2) as executor:
+        links = list(executor.map(installer._install_item, items))
+
+    assert running['max'] == 1
+    assert installer.downloads == [WGET['link']]
+    assert [Path(item['link']).read_bytes() for item in links] == [b'weights'] * 2
+
+
+def test_existing_checkout_is_recorded_without_clone(installer, monkeypatch):
+    item = _item({'method_download': 'github', 'repo_id': 'org/node'}) | {'target': 'custom_node'}
+    item = installer._setup_item_comfyui(item)
+    repo = ainstall.Repo.init(item['target_dir'])
+    (Path(item['target_dir']) / 'node.py').write_text('')
+    repo.index.add(['node.py'])
+    commit = repo.index.commit('init')
+
+    def no_clone(*args, **kwargs):
+        raise AssertionError('clone_from called')
+
+    monkeypatch.setattr(ainstall.Repo, 'clone_from', no_clone)
+    installer._install_item(item)
+
+    assert installer.ledger.satisfied(entry_hash(item))['revision'] == commit.hexsha
+
+
+def _put_many(url: Path, prefix: str) -> None:
+    ledger = InstallLedger(url)
+    for i in range(20):
+        ledger.put(f'{prefix}{i}', {'link': None, 'files': []})
+
+
+def test_ledgers_on_one_file_keep_each_others_records(tmp_path):
+    url = tmp_path / 'ledger.json'
+    first, second = InstallLedger(url), InstallLedger(url)
+
+    first.put('a', {'link': None, 'files': []})
+    second.put('b', {'link': None, 'files': []})
+    first.put('c', {'link': None, 'files': []})
+
+    assert set(InstallLedger(url)._records) == {'a', 'b', 'c'}
+    with ProcessPoolExecutor(4) as executor:
+        list(executor.map(_put_many, [url] * 4, 'wxyz'))
+    assert len(InstallLedger(url)) == 3 + 4 * 20
+
+
+def test_entry_hash_ignores_install_results():
+    item = _item(WGET)
+    key = entry_hash(item)
+
+    assert entry_hash(item | {'link': '/tmp/x', 'files': []}) == key
+    assert entry_hash(item | {'target_dir': '/other'}) != key
+
+
+def test_snapshot_lookup_and_hf_blob_ids(tmp_path):
+    repo = tmp_path / 'models--org--repo'
+    blob = repo / 'blobs' / ('a' * 64)
+    snapshot = repo / 'snapshots' / 'c0ffee'
+    blob.parent.mkdir(parents=True)
+    snapshot.mkdir(parents=True)
+    blob.write_bytes(b'tensor data')
+    (snapshot / 'model.safetensors').symlink_to(blob)
+
+    ledger = InstallLedger(tmp_path / 'ledger.json')
+    files = files_state([snapshot])
+    ledger.put('k', {'files': files, 'snapshot': 'org/repo', 'snapshot_dir': str(snapshot)})
+
+    assert files[0]['sha256'] == 'a' * 64
+    assert hf_revision(snapshot / 'model.safetensors') == 'c0ffee'
+    assert InstallLedger(tmp_path / 'ledger.json').snapshot('org/repo') == snapshot
+    assert ledger.snapshot('org/other') is None
+    blob.write_bytes(b'tensor data, changed')
+    assert ledger.snapshot('org/repo') is None
@@ -0,0 +1,159 @@
+"""Tests for the audio decode pool and whisper worker (`audio.extract._decode_prefetch`,
+`audio.transcribe._transcribe_files`): decodes run at most `workers` at a time, stay
+bounded ahead of the consumer and come back in input order; files with a stored
+result are skipped on resume, and the whisper model is loaded once per process.
+
+ffmpeg is a fake script on PATH writing a per-file PCM marker, whisper is a stub
+module. No network, no DB.
+"""
+
+import importlib
+import json
+import os
+import sys
+import time
+import types
+
+import numpy as np
+import pytest
+
+FAKE_FFMPEG = """#!{python}
+import array, os, sys, time
+from pathlib import Path
+
+url_log = Path(os.environ['FAKE_FFMPEG_LOG'])
+ifile = Path(sys.argv[sys.argv.index('-i') + 1])
+if 'broken' in ifile.name:
+    sys.stderr.write('invalid data')
+    sys.exit(1)
+idx = int(ifile.stem.split('_')[-1])
+running = url_log.parent / 'running'
+marker = running / f'{{ifile.name}}.{{os.getpid()}}'
+marker.touch()
+with url_log.open('a') as f:
+    f.write(f'{{ifile.name}} {{len(list(running.iterdir()))}}\\n')
+time.sleep(0.15 if idx % 2 == 0 else 0.02)  # later files finish first
+marker.unlink()
+sys.stdout.buffer.write(array.array('h', [100 * idx] * 16).tobytes())
+"""
+
+
+@pytest.fixture
+def ffmpeg(tmp_path, monkeypatch):
+    """Fake ffmpeg on PATH; returns a reader of its log [(file name, decodes running)]."""
+    url_bin = tmp_path / 'bin'
+    url_bin.mkdir()
+    url_ffmpeg = url_bin / 'ffmpeg'
+    url_ffmpeg.write_text(FAKE_FFMPEG.format(python=sys.executable))
+    url_ffmpeg.chmod(0o755)
+    url_log = tmp_path / 'ffmpeg' / 'log'
+    (url_log.parent / 'running').mkdir(parents=True)
+    url_log.touch()
+    monkeypatch.setenv('PATH', f'{url_bin}{os.pathsep}{os.environ["PATH"]}')
+    monkeypatch.setenv('FAKE_FFMPEG_LOG', str(url_log))
+
+    def log() -> list[tuple[str, int]]:
+        lines = url_log.read_text().split()
+        return [(name, int(n)) for name, n in zip(lines[::2], lines[1::2], strict=True)]
+
+    return log
+
+
+@pytest.fixture
+def audio(monkeypatch):
+    """The audio package imported over a stub whisper module counting model loads (the
+    package imports whisper eagerly); the stub transcribes to the PCM marker."""
+    loads = []
+
+    class Model:
+        def transcribe(self, audio, language=None, fp16=None):
+            return {'text': f'marker {int(round(audio[0] * 32768))}', 'segments': []}
+
+    def load_model(name, device=None):
+        loads.append((name, device))
+        return Model()
+
+    def get_writer(output_format, output_dir):
+        def writer(result, name, options):
+            with open(os.path.join(output_dir, f'{name}.{output_format}'), 'w') as f:
+                f.write(result['text'])
+
+        return writer
+
+    whisper = types.ModuleType('whisper')
+    whisper.load_model = load_model
+    utils = types.ModuleType('whisper.utils')
+    utils.get_writer = get_writer
+    whisper.utils = utils
+    monkeypatch.setitem(sys.modules, 'whisper', whisper)
+    monkeypatch.setitem(sys.modules, 'whisper.utils', utils)
+    # fresh modules: the per process worker cache starts empty
+    for name in ['audio', 'audio.main', 'audio.extract', 'audio.transcribe']:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    return types.SimpleNamespace(
+        extract=importlib.import_module('audio.extract'),
+        transcribe=importlib.import_module('audio.transcribe'),
+        loads=loads,
+    )
+
+
+def _audio_files(url, n: int, ext='.mp3') -> list:
+    url.mkdir(parents=True, exist_ok=True)
+    urls = [url / f'audio_{i}{ext}' for i in range(n)]
+    for u in urls:
+        u.write_bytes(b'')
+    return urls
+
+
+def test_decode_prefetch_bounded_in_order(tmp_path, ffmpeg, audio):
+    ifiles = _audio_files(tmp_path / 'audio', 10)
+    workers = 2
+
+    futures = audio.extract._decode_prefetch(ifiles, workers=workers)
+    first = next(futures).result()
+    time.sleep(1.0)
+    # the consumer holds one result: the pool ran ahead by 2 * workers, not further
+    assert len(ffmpeg()) <= 2 * workers + 1
+
+    pcms = [first] + [future.result() for future in futures]
+    assert [int(round(pcm[0] * 32768)) for pcm in pcms] == [100 * i for i in range(10)]
+    assert {pcm.dtype for pcm in pcms} == {np.dtype(np.float32)}
+    assert sorted(name for name, _ in ffmpeg()) == sorted(u.name for u in ifiles)
+    assert max(n for _, n in ffmpeg()) <= workers
+
+
+def _result(ifile) -> dict:
+    return json.loads(ifile.with_suffix('.json_transcribe').read_text())
+
+
+def test_resume_skips_stored_and_loads_model_once(tmp_path, ffmpeg, audio):
+    transcribe = audio.transcribe
+    ifiles = _audio_files(tmp_path / 'audio', 4)
+    done = ifiles[1].with_suffix('.json_transcribe')
+    done.write_text(json.dumps({'text': 'stored'}))
+    broken = _audio_files(tmp_path / 'audio', 1, ext='.broken.mp3')[0]
+    jobs = {ifile: ifile for ifile in [*ifiles, broken]}
+
+    transcribe._transcribe_files(jobs, workers=2)
+
+    assert sorted(name for name, _ in ffmpeg()) == ['audio_0.mp3', 'audio_2.mp3', 'audio_3.mp3']
+    assert [_result(u)['text'] for u in ifiles] == [
+        'marker 0',
+        'stored',
+        'marker 200',
+        'marker 300',
+    ]
+    assert (tmp_path / 'audio' / 'audio_2.srt').read_text() == 'marker 200'
+    assert not list((tmp_path / 'audio').glob('*.tmp'))
+    assert not broken.with_suffix('.json_transcribe').exists()
+
+    # resumed run: nothing left to decode
+    n_decodes = len(ffmpeg())
+    transcribe._transcribe_files(jobs, workers=2)
+    assert len(ffmpeg()) == n_decodes
+
+    # forced run and single file path share the process' model
+    transcribe._transcribe_files(jobs, force=True, workers=2)
+    transcribe._transcribe_file(ifiles[1], force=True)
+    assert _result(ifiles[1])['text'] == 'marker 100'
+    assert audio.loads == [('base', 'cpu')]
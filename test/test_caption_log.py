@@ -0,0 +1,67 @@
+"""Tests for the append-only caption_log sink (`$push` instead of a full
+`db_store()`). Needs the reachable test MongoDB
+(conf/aidb/dbc_scenes_test.yaml); a bare image document is inserted per test
+and deleted afterwards."""
+
+import pytest
+
+from aidb import SceneManager
+from aidb.scene.scene_common import SceneDef
+from ait.caption import caption_log
+
+
+@pytest.fixture
+def simg():
+    scm = SceneManager(config='test', verbose=0)
+    sim = scm.scene_image_manager()
+    id = scm._dbc.insert_document(
+        SceneDef.COLLECTION_IMAGES,
+        {SceneDef.FIELD_URL_SRC: '/nonexistent/caption_log.png', SceneDef.FIELD_RATING: 0},
+    )
+    yield sim.img_from_id(id)
+    scm._dbc.delete_document(SceneDef.COLLECTION_IMAGES, {SceneDef.FIELD_OID: scm._dbc.to_oid(id)})
+
+
+def _log_db(simg) -> list[dict]:
+    return simg._im.data_from_id(simg.id).get(SceneDef.FIELD_CAPTION_LOG, [])
+
+
+class TestCaptionLogSink:
+    def test_unbuffered_pushes_immediately(self, simg):
+        caption_log.start_run(simg, run_tag='t')
+        caption_log.log_audit(simg, when='audit_before', caption='a')
+
+        stages = [e['stage'] for e in _log_db(simg)]
+        assert stages == ['run_start', 'audit_before']
+        assert simg.caption_log == _log_db(simg)
+
+    def test_buffered_until_flush(self, simg):
+        with caption_log.CaptionLogSink() as sink:
+            caption_log.start_run(simg, run_tag='t', sink=sink)
+            for when in ('audit_before', 'audit_after'):
+                caption_log.log_audit(simg, when=when, caption='c', sink=sink)
+            assert len(sink) == 3
+            assert _log_db(simg) == []
+
+        assert [e['stage'] for e in _log_db(simg)] == ['run_start', 'audit_before', 'audit_after']
+
+    def test_push_does_not_touch_other_fields(self, simg):
+        simg.set_rating(3)  # in-memory only, never stored
+        caption_log.log_audit(simg, when='audit_before', caption='a')
+
+        data = simg._im.data_from_id(simg.id)
+        assert data[SceneDef.FIELD_RATING] == 0
+        assert SceneDef.FIELD_TIMESTAMP_CAPTION_LOG in data
+
+    def test_cap_keeps_newest(self, simg):
+        with caption_log.CaptionLogSink(cap=2) as sink:
+            for i in range(4):
+                caption_log.log_audit(simg, when=f'probe{i}', caption='c', sink=sink)
+
+        assert [e['stage'] for e in _log_db(simg)] == ['probe2', 'probe3']
+
+    def test_store_after_flush_keeps_entries(self, simg):
+        caption_log.log_audit(simg, when='audit_before', caption='a')
+        simg.db_store()
+
+        assert [e['stage'] for e in _log_db(simg)] == ['audit_before']
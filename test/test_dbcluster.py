@@ -0,0 +1,110 @@
+"""Tests for the incremental DBSCAN state over focus vectors
+(`aidb.dbcluster.FocusClusterState`): after a fit and after every incremental
+update (inserts, changed vectors, removals) core flags, the core-point
+partition and the noise set must equal a from-scratch sklearn DBSCAN on the
+same standardized data. No DB needed."""
+
+import numpy as np
+import pytest
+from sklearn.cluster import DBSCAN
+
+from aidb.dbcluster import FocusClusterState
+from aidb.tagger_defines import TaggerDef
+
+DIM = len(TaggerDef.TAGS_FOCUS)
+
+
+def _points(rng: np.random.Generator, n: int, centers: np.ndarray) -> np.ndarray:
+    which = rng.integers(0, len(centers), n)
+    return centers[which] + rng.normal(0.0, 0.05, (n, DIM)) * (centers[which] > 0)
+
+
+def _assert_dbscan(state: FocusClusterState, ids: list[str], X: np.ndarray) -> None:
+    ref = DBSCAN(eps=state.eps, min_samples=state.min_samples).fit(state._scaled(X))
+    core_ref = np.zeros(len(ids), dtype=bool)
+    core_ref[ref.core_sample_indices_] = True
+
+    pos = {id: i for i, id in enumerate(state.ids)}
+    order = [pos[id] for id in ids]
+    core = state.core[order]
+    labels = state.labels[order]
+
+    def partition(labels: np.ndarray, core: np.ndarray) -> set[frozenset[str]]:
+        groups: dict[int, set[str]] = {}
+        for id, label in zip(np.array(ids)[core], labels[core], strict=True):
+            groups.setdefault(int(label), set()).add(str(id))
+        return {frozenset(g) for g in groups.values()}
+
+    assert (core == core_ref).all()
+    assert partition(labels, core) == partition(ref.labels_, core_ref)
+    assert ((labels == -1) == (ref.labels_ == -1)).all()
+
+
+@pytest.mark.parametrize('eps', [3.0, 12.0])  # clustered and all-in-one eps-neighborhoods
+def test_incremental_equals_from_scratch(eps):
+    rng = np.random.default_rng(0)
+    centers = rng.random((20, DIM)) * (rng.random((20, DIM)) < 0.05)
+    X = _points(rng, 800, centers)
+    ids = [f'i{i}' for i in range(len(X))]
+
+    state = FocusClusterState(eps=eps, min_samples=5)
+    state.fit(ids, X)
+    _assert_dbscan(state, ids, X)
+
+    for step in range(8):
+        keep = rng.random(len(ids)) > 0.02
+        ids = [id for id, k in zip(ids, keep, strict=True) if k]
+        X = X[keep].copy()
+        X[rng.integers(0, len(ids), 3)] = _points(rng, 3, centers)
+        ids += [f's{step}_{i}' for i in range(25)]
+        X = np.vstack([X, _points(rng, 25, centers)])
+
+        assert state.update(ids, X)
+        _assert_dbscan(state, ids, X)
+
+    assert not state.update(ids, X)
+
+
+def test_persistence_and_version(tmp_path):
+    rng = np.random.default_rng(1)
+    X = rng.random((50, DIM))
+    ids = [f'i{i}' for i in range(len(X))]
+    state = FocusClusterState(eps=3.0, min_samples=3)
+    state.fit(ids, X)
+    url = tmp_path / 'clusters.npz'
+    state.save(url)
+
+    loaded = FocusClusterState.load(url, eps=3.0, min_samples=3)
+    assert loaded is not None
+    assert loaded.ids == state.ids
+    assert (loaded.labels == state.labels).all()
+    assert (loaded.counts == state.counts).all()
+    assert FocusClusterState.load(url, eps=2.0, min_samples=3) is None
+    assert FocusClusterState.load(tmp_path / 'missing.npz') is None
+
+
+def test_small_updates_use_pivot_index(monkeypatch):
+    rng = np.random.default_rng(2)
+    centers = rng.random((40, DIM)) * (rng.random((40, DIM)) < 0.05)
+    X = _points(rng, 800, centers)
+    ids = [f'i{i}' for i in range(len(X))]
+    state = FocusClusterState(eps=3.0, min_samples=5)
+    state.fit(ids, X)
+
+    pivots = []
+    eps_pairs_pivots = state._eps_pairs_pivots
+    monkeypatch.setattr(
+        state, '_eps_pairs_pivots', lambda Q, Dq: pivots.append(len(Q)) or eps_pairs_pivots(Q, Dq)
+    )
+    for step in range(10):
+        if step % 3 == 2:
+            del ids[0]
+            X = X[1:]
+        else:
+            ids.append(f's{step}')
+            X = np.vstack([X, _points(rng, 1, centers)])
+
+        assert state.update(ids, X)
+        _assert_dbscan(state, ids, X)
+
+    assert pivots and max(pivots) <= state.PIVOT_ROWS
@@ -0,0 +1,92 @@
+"""Tests for the vectorized focus-vector paths of the legacy `Statistics`: the
+blocked neighborhood computation must reproduce the pairwise python loop it
+replaced (distances and tie order), and the document matrix must match
+`img_calc_focus_vector`'s TAGS_FOCUS lookup. No DB needed — fixture documents
+are built in memory."""
+
+import numpy as np
+import pytest
+
+from aidb.dbstatistics import Statistics
+from aidb.tagger_defines import TaggerDef
+
+TAGS = list(TaggerDef.TAGS_FOCUS.keys())
+
+
+def _docs(n: int, seed: int = 0, coarse: bool = True) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    docs = []
+    for i in range(n):
+        picked = rng.choice(len(TAGS), size=5, replace=False)
+        # coarse probabilities -> plenty of exact distance ties; fine ones -> rounded sums
+        if coarse:
+            tags_wd = {TAGS[j]: float(rng.integers(1, 4)) / 4 for j in picked}
+        else:
+            tags_wd = {TAGS[j]: float(rng.random()) for j in picked}
+        docs.append({'_id': f'{i:024x}', 'tags': {'tags_wd': tags_wd}})
+    docs.append({'_id': f'{n:024x}'})  # untagged image -> zero vector
+    docs.append({'_id': f'{n + 1:024x}', 'tags': dict(docs[0]['tags'])})  # duplicate
+    return docs
+
+
+def _neighborhood_loop(ids: list[str], X: np.ndarray, size: int) -> dict[str, dict[str, float]]:
+    # the pairwise loop neighborhood_from_matrix replaced, with its np.linalg.norm distance
+    ret = {}
+    for i, id_i in enumerate(ids):
+        dists = {id_j: np.linalg.norm(X[i] - X[j]) for j, id_j in enumerate(ids) if i != j}
+        ret[id_i] = dict(sorted(dists.items(), key=lambda item: item[1])[:size])
+    return ret
+
+
+def test_focus_vectors_from_docs():
+    docs = _docs(20)
+    X = Statistics.focus_vectors_from_docs(docs)
+
+    assert X.shape == (len(docs), len(TAGS))
+    for doc, row in zip(docs, X, strict=True):
+        tags_wd = doc.get('tags', {}).get('tags_wd', {})
+        assert row.tolist() == [tags_wd.get(tag, 0.0) for tag in TAGS]
+
+
+@pytest.mark.parametrize(
+    'size,block,coarse', [(10, 256, True), (5, 7, True), (500, 16, True), (10, 64, False)]
+)
+def test_neighborhood_equals_pairwise_loop(size, block, coarse):
+    docs = _docs(300, coarse=coarse)
+    ids = [doc['_id'] for doc in docs]
+    X = Statistics.focus_vectors_from_docs(docs)
+
+    got = Statistics.neighborhood_from_matrix(ids, X, size=size, block=block)
+    expected = _neighborhood_loop(ids, X, size)
+
+    assert list(got) == ids
+    for id in ids:
+        assert list(got[id].items()) == list(expected[id].items())
+
+
+def test_neighborhood_tie_heavy():
+    # a third of the images untagged: every zero row ties with every other one
+    docs = _docs(200) + [{'_id': f'{i:024x}'} for i in range(1000, 1100)]
+    ids = [doc['_id'] for doc in docs]
+    X = Statistics.focus_vectors_from_docs(docs)
+
+    got = Statistics.neighborhood_from_matrix(ids, X, size=10, block=64)
+    expected = _neighborhood_loop(ids, X, 10)
+
+    for id in ids:
+        assert list(got[id].items()) == list(expected[id].items())
+    assert list(got[ids[-1]]) == ids[200:201] + ids[202:211]  # zero rows, by position
+
+
+def test_neighborhood_degenerate():
+    assert Statistics.neighborhood_from_matrix([], np.zeros((0, 3))) == {}
+    assert Statistics.neighborhood_from_matrix(['a'], np.zeros((1, 3))) == {'a': {}}
+
+
+def test_dist_focus_vectors():
+    X = Statistics.focus_vectors_from_docs(_docs(200, coarse=False))
+    got = Statistics.dist_focus_vectors(X[3], X)
+
+    expected = [np.linalg.norm(X[3] - x) for x in X]
+    assert got.tolist() == expected
+    assert [Statistics.dist_focus_vector(X[3], x) for x in X] == expected
@@ -0,0 +1,93 @@
+"""Tests for the mtime-keyed directory listing cache in `ait.tools.files`.
+
+Folders are created in tmp and their mtime is set into the past, so the
+listings are outside the racy window and get cached. No network, no DB.
+"""
+
+import os
+
+import pytest
+
+from ait.tools import files
+from ait.tools.files import (
+    dir_cache_clear,
+    dir_scan_scope,
+    img_latest_from_url,
+    imgs_and_vids_from_url,
+    imgs_from_url,
+)
+
+
+def _settle(url, ts: float = 1_000_000.0) -> None:
+    os.utime(url, (ts, ts))
+
+
+@pytest.fixture
+def scene_dir(tmp_path):
+    dir_cache_clear()
+    for i, name in enumerate(['a.png', 'b.JPG', 'c.mp4', 'notes.txt', '.hidden.png']):
+        (tmp_path / name).write_bytes(b'x')
+        _settle(tmp_path / name, 1_000_000.0 + i)
+    (tmp_path / 'sub.png').mkdir()
+    _settle(tmp_path)
+    yield tmp_path
+    dir_cache_clear()
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    counts = {'scandir': 0}
+    scandir = os.scandir
+
+    def counting(path):
+        counts['scandir'] += 1
+        return scandir(path)
+
+    monkeypatch.setattr(files.os, 'scandir', counting)
+    return counts
+
+
+def test_listings_match_suffix_and_type(scene_dir):
+    names = sorted(url.name for url in imgs_from_url(scene_dir))
+    names_all = sorted(url.name for url in imgs_and_vids_from_url(scene_dir))
+
+    assert names == ['.hidden.png', 'a.png', 'b.JPG']
+    assert names_all == ['.hidden.png', 'a.png', 'b.JPG', 'c.mp4']
+    assert img_latest_from_url(scene_dir).name in names
+
+
+def test_listing_cached_until_dir_mtime_changes(scene_dir, scans):
+    imgs_from_url(scene_dir)
+    imgs_from_url(scene_dir)
+    img_latest_from_url(scene_dir)
+    assert scans['scandir'] == 1
+
+    (scene_dir / 'd.webp').write_bytes(b'x')
+    _settle(scene_dir, 2_000_000.0)
+
+    assert 'd.webp' in {url.name for url in imgs_from_url(scene_dir)}
+    assert scans['scandir'] == 2
+
+
+def test_recent_listing_not_cached(scene_dir, scans):
+    (scene_dir / 'e.png').write_bytes(b'x')  # dir mtime is now
+
+    imgs_from_url(scene_dir)
+    imgs_from_url(scene_dir)
+
+    assert scans['scandir'] == 2
+
+
+def test_scan_scope_stats_each_dir_once(scene_dir, monkeypatch):
+    imgs_from_url(scene_dir)
+    stats = []
+    stat = os.stat
+    monkeypatch.setattr(files.os, 'stat', lambda path: stats.append(path) or stat(path))
+
+    with dir_scan_scope():
+        imgs_from_url(scene_dir)
+        imgs_and_vids_from_url(scene_dir)
+        img_latest_from_url(scene_dir)
+    imgs_from_url(scene_dir)
+
+    assert stats == [str(scene_dir), str(scene_dir)]
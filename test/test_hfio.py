@@ -0,0 +1,88 @@
+"""Tests for selective HF dataset prefetch (`aidb.hfio`, `HFDataset.prefetch`).
+
+The HF hub is replaced by a fake cache dir: metadata and image downloads are
+counted, so sampling a few ids must fetch exactly those files, at most
+`workers` at a time. No network.
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from aidb import hfio
+from aidb.scene import hfdataset
+
+N_IMGS = 200
+
+
+@pytest.fixture
+def hub(tmp_path, monkeypatch):
+    meta = tmp_path / 'metadata.jsonl'
+    with meta.open('w') as f:
+        for i in range(N_IMGS):
+            line = {'file_name': f'train___img{i:04d}.jpg', 'caption': f'caption {i}'}
+            f.write(json.dumps(line) + '\n')
+
+    state = {'downloads': [], 'active': 0, 'active_max': 0, 'cached': set()}
+    lock = threading.Lock()
+
+    def fake_download(repo_id, filename, repo_type=None, **kwargs):
+        if filename.endswith('metadata.jsonl'):
+            return str(meta)
+        with lock:
+            state['downloads'].append(filename)
+            state['active'] += 1
+            state['active_max'] = max(state['active_max'], state['active'])
+        time.sleep(0.01)
+        url = tmp_path / 'cache' / filename
+        url.parent.mkdir(parents=True, exist_ok=True)
+        url.write_bytes(b'jpg')
+        with lock:
+            state['active'] -= 1
+        return str(url)
+
+    def fake_cached(repo_id, filename, repo_type=None):
+        if filename in state['cached']:
+            return str(tmp_path / 'cache' / filename)
+        return None
+
+    monkeypatch.setattr(hfio, 'hf_hub_download', fake_download)
+    monkeypatch.setattr(hfio, 'try_to_load_from_cache', fake_cached)
+    monkeypatch.setattr(hfdataset, 'hf_hub_download', fake_download)
+    return state
+
+
+def test_prefetch_fetches_only_selected_ids_in_parallel(hub):
+    hfd = hfdataset.HFDataset('org/set')
+    ids = list(hfd.ids)[::20]
+
+    files = hfd.prefetch(ids, workers=4)
+
+    assert sorted(files) == sorted(ids)
+    assert len(hub['downloads']) == len(ids)
+    assert 1 < hub['active_max'] <= 4
+    assert hfd.url_file_from_id(ids[0]) == files[ids[0]]
+    assert hfd.caption_from_id(ids[0]) == 'caption 0'
+
+
+def test_prefetch_resolves_cached_files_without_download(hub):
+    hub['cached'] = {'train/train___img0000.jpg'}
+    files = hfio.prefetch_files(
+        'org/set', ['train/train___img0000.jpg', 'train/train___img0001.jpg']
+    )
+
+    assert hub['downloads'] == ['train/train___img0001.jpg']
+    assert set(files) == {'train/train___img0000.jpg', 'train/train___img0001.jpg'}
+
+
+def test_iter_jsonl_is_lazy(tmp_path):
+    url = tmp_path / 'm.jsonl'
+    url.write_text('{"a": 1}\n{"a": 2}\n')
+
+    lines = hfio.iter_jsonl(url)
+
+    assert not isinstance(lines, list)
+    assert next(lines) == {'a': 1}
+    assert [line['a'] for line in lines] == [2]
@@ -0,0 +1,106 @@
+"""Tests for batched image registration (`SceneImageManager.register_from_urls`).
+
+Runs against an in-memory mongomock database with images in tmp; pixel
+decoding is made to fail so only header reads can pass. No network, no
+MongoDB server.
+"""
+
+from pathlib import Path
+
+import pytest
+from PIL import Image, ImageFile
+
+mongomock = pytest.importorskip('mongomock')
+
+from aidb.scene.db_connect import DBConnection  # noqa: E402
+from aidb.scene.scene_common import SceneDef  # noqa: E402
+from aidb.scene.scene_image_manager import SceneImageManager  # noqa: E402
+from aidb.scene.scene_link_index import SceneLinkIndex  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def mongomock_bulk_sort(monkeypatch):
+    # pymongo >= 4.11 passes sort= to bulk update builders, mongomock 4.3 does not take it
+    builder = mongomock.collection.BulkOperationBuilder
+    add_update = builder.add_update
+
+    def _add_update(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    monkeypatch.setattr(builder, 'add_update', _add_update)
+
+
+@pytest.fixture
+def im(monkeypatch):
+    dbc = object.__new__(DBConnection)
+    dbc.db = mongomock.MongoClient().db
+    dbc._verbose = 0
+
+    def no_single_inserts(*args, **kwargs):
+        raise AssertionError('insert_document called')
+
+    monkeypatch.setattr(dbc, 'insert_document', no_single_inserts)
+    return SceneImageManager(dbc=dbc)
+
+
+@pytest.fixture
+def no_decode(monkeypatch):
+    def load(self):
+        raise AssertionError('pixels decoded')
+
+    monkeypatch.setattr(ImageFile.ImageFile, 'load', load)
+
+
+def _png(path: Path, size: tuple[int, int]) -> Path:
+    Image.new('RGB', size).save(path)
+    return path
+
+
+def test_register_from_urls(im, tmp_path, no_decode):
+    urls = [_png(tmp_path / f'{i}.png', (8 + i, 4)) for i in range(5)]
+    registered = tmp_path / f'{SceneDef.filename_orig_from_id("0" * 24)}.png'
+    registered.write_bytes(b'x')
+    (tmp_path / 'notes.txt').write_text('no image')
+
+    ids = im.register_from_urls([*urls, registered, tmp_path / 'notes.txt'])
+
+    assert ids[str(registered)] is None
+    assert ids[str(tmp_path / 'notes.txt')] is None
+    for i, url in enumerate(urls):
+        data = im.data_from_id(ids[str(url)])
+        assert (data['width'], data['height']) == (8 + i, 4)
+        assert data[SceneDef.FIELD_URL_PARENT] == str(tmp_path)
+        assert not url.exists()
+        assert (tmp_path / f'{SceneDef.filename_orig_from_id(ids[str(url)])}.png').exists()
+
+
+def test_register_from_url_single(im, tmp_path, no_decode):
+    url = _png(tmp_path / 'a.png', (16, 8))
+
+    id = im.register_from_url(url)
+
+    assert im.data_from_id(id)['size'] == 128
+    assert im.register_from_url(url) is None  # gone: moved to its registered name
+
+
+def test_register_moves_link_rows_in_one_bulk_write(im, tmp_path, monkeypatch):
+    urls = [_png(tmp_path / f'{i}.png', (8, 4)) for i in range(3)]
+    ensured = []
+    monkeypatch.setattr(SceneLinkIndex, 'ensure_indexes', lambda self: ensured.append(self))
+    im.link_index.put([{SceneDef.FIELD_URL: str(url)} for url in urls])
+    moves = []
+    move_many = SceneLinkIndex.move_many
+    monkeypatch.setattr(
+        SceneLinkIndex, 'move_many', lambda self, m: (moves.append(m), move_many(self, m))
+    )
+
+    ids = im.register_from_urls(urls)
+    im.register_from_url(_png(tmp_path / 'late.png', (8, 4)))
+
+    assert len(ensured) == 1
+    assert [len(m) for m in moves] == [3, 1]
+    for url in urls:
+        url_orig = tmp_path / f'{SceneDef.filename_orig_from_id(ids[str(url)])}.png'
+        row = im.link_index.row_from_url(url_orig)
+        assert row[SceneDef.FIELD_LINK_IMAGE_ID] == ids[str(url)]
+        assert im.link_index.row_from_url(url) is None
@@ -0,0 +1,66 @@
+"""Import-cost regression test for the core path of the CLI
+(`script/aidb_scene.py` minus its clipboard dependency): the `aidb` scene API
+and the file tools. `python -X importtime` runs in a subprocess; heavy
+packages must stay out, the import time stays under a budget. No network,
+no DB.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / 'src'
+CORE = (
+    'from aidb import Scene, SceneConfig, SceneImage, SceneImageManager, SceneManager, SceneWatcher'
+    '; from ait.tools.files import is_dir, is_img_or_vid'
+)
+HEAVY = (
+    'torch',
+    'transformers',
+    'gradio',
+    'onnxruntime',
+    'ultralytics',
+    'cv2',
+    'pandas',
+    'huggingface_hub',
+)
+BUDGET_S = 1.0  # typically ~0.2 s
+
+
+def _importtime(code: str) -> list[tuple[str, int, bool]]:
+    """(module, cumulative us, imported by code itself) per module, in import order."""
+    out = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        env=os.environ | {'PYTHONPATH': str(SRC)},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    rows = []
+    for line in out.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        rows.append((name.strip(), int(cumulative), not name.startswith('  ')))
+    return rows
+
+
+def _imported(code: str) -> tuple[set[str], int]:
+    """Modules code imports beyond interpreter startup, and their import time in us."""
+    startup = {name for name, _, _ in _importtime('pass')}
+    rows = [row for row in _importtime(code) if row[0] not in startup]
+    return {name for name, _, _ in rows}, sum(us for _, us, top in rows if top)
+
+
+def test_import_aidb_loads_nothing():
+    modules, _ = _imported('import aidb')
+
+    assert not {name.split('.')[0] for name in modules} & {'pymongo', 'PIL', *HEAVY}
+
+
+def test_core_path_budget():
+    modules, us = _imported(CORE)
+
+    assert not {name.split('.')[0] for name in modules} & set(HEAVY)
+    assert us < BUDGET_S * 1e6, f'core path imports in {us / 1e6:.2f}s'
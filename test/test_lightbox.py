@@ -0,0 +1,155 @@
+"""Tests for the lightbox derived-image cache, its Cache-Control middleware and
+the original file middleware (only validated image files are served, never
+their folders).
+
+Renditions are written to a tmp cache root; the middlewares are driven with a
+hand-built ASGI scope. No network, no DB.
+"""
+
+import asyncio
+
+import pytest
+from PIL import Image as PILImage
+
+pytest.importorskip('gradio')
+
+from aidb.app import lightbox  # noqa: E402
+from aidb.app.lightbox import (  # noqa: E402
+    CACHE_CONTROL_DERIVED,
+    CACHE_CONTROL_FILE,
+    URL_ORIGINAL,
+    CacheControlMiddleware,
+    DerivedImageCache,
+    OriginalFileMiddleware,
+    file_url,
+)
+
+
+@pytest.fixture
+def served(monkeypatch):
+    # static paths are only recorded, no Gradio app is running
+    monkeypatch.setattr(lightbox.gr, 'set_static_paths', lambda paths: None)
+    monkeypatch.setattr(lightbox, '_served', set())
+
+
+def test_screen_rendition_is_progressive_and_cached(tmp_path, served):
+    url = tmp_path / 'big.png'
+    PILImage.new('RGBA', (3000, 1500), (200, 10, 10, 255)).save(url)
+    cache = DerivedImageCache(tmp_path / 'derived', max_side=1024)
+
+    urls = cache.urls(url)
+    url_screen = cache.screen(url)
+
+    with PILImage.open(url_screen) as pil:
+        assert pil.format == 'JPEG'
+        assert pil.size == (1024, 512)
+        assert pil.info.get('progressive') == 1
+    assert urls == {'src': file_url(url_screen), 'src_full': f'{URL_ORIGINAL}{url_screen.stem}.png'}
+    assert url_screen.is_relative_to(tmp_path / 'derived')
+    # only the derived root is a static path, not the original's folder
+    assert lightbox._served == {tmp_path / 'derived'}
+    assert cache.original(urls['src_full'][len(URL_ORIGINAL) :]) == url
+
+
+def test_only_images_below_roots(tmp_path, served):
+    scenes = tmp_path / 'scenes'
+    scenes.mkdir()
+    cache = DerivedImageCache(tmp_path / 'derived', roots=[scenes])
+    inside, outside = scenes / 'img.png', tmp_path / 'img.png'
+    for url in (inside, outside):
+        PILImage.new('RGB', (16, 16)).save(url)
+    (scenes / 'notes.txt').write_text('secret')
+    (scenes / 'link.png').symlink_to(outside)
+
+    assert cache.urls(inside) is not None
+    assert cache.urls(outside) is None
+    assert cache.urls(scenes / 'notes.txt') is None
+    assert cache.urls(scenes / 'link.png') is None
+    assert cache.urls(scenes) is None
+    assert cache.original('../notes.txt') is None
+
+
+def test_changed_source_gets_new_rendition(tmp_path, served):
+    url = tmp_path / 'img.jpg'
+    PILImage.new('RGB', (64, 64)).save(url)
+    cache = DerivedImageCache(tmp_path / 'derived')
+    first = cache.screen(url)
+
+    PILImage.new('RGB', (80, 64)).save(url)
+
+    assert cache.screen(url) != first
+    assert cache.screen(tmp_path / 'missing.jpg') is None
+
+
+def _headers(middleware, path, status=200):
+    sent = []
+
+    async def app(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': status, 'headers': []})
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(app)({'type': 'http', 'path': path}, None, send))
+    return dict(sent[0]['headers'])
+
+
+def _response(middleware, path, method='GET'):
+    sent = []
+
+    async def app(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 299, 'headers': []})
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'path': path, 'method': method, 'headers': []}
+    asyncio.run(middleware(app)(scope, receive, send))
+    body = b''.join(m.get('body', b'') for m in sent if m['type'] == 'http.response.body')
+    return sent[0]['status'], dict(sent[0]['headers']), body
+
+
+def test_original_file_middleware(tmp_path, served):
+    scenes = tmp_path / 'scenes'
+    scenes.mkdir()
+    url = scenes / 'img.png'
+    PILImage.new('RGB', (16, 16)).save(url)
+    (scenes / '.env').write_text('secret')
+    cache = DerivedImageCache(tmp_path / 'derived', roots=[scenes])
+    src_full = cache.urls(url)['src_full']
+
+    def middleware(app):
+        return OriginalFileMiddleware(app, cache=cache)
+
+    status, headers, body = _response(middleware, src_full)
+    assert (status, body) == (200, url.read_bytes())
+    assert headers[b'cache-control'] == CACHE_CONTROL_FILE.encode()
+    assert _response(middleware, src_full, method='POST')[0] == 404
+    assert _response(middleware, f'{URL_ORIGINAL}.env')[0] == 404
+    assert _response(middleware, f'{URL_ORIGINAL}{src_full[-44:-4]}.txt')[0] == 404
+    assert _response(middleware, '/gradio_api/queue/join')[0] == 299
+
+    # a removed original is no longer served
+    url.unlink()
+    assert _response(middleware, src_full)[0] == 404
+
+
+def test_cache_control_headers(tmp_path):
+    root = tmp_path / 'derived'
+    root.mkdir()
+
+    def middleware(app):
+        return CacheControlMiddleware(app, root_derived=root)
+
+    derived = _headers(middleware, file_url(root / 'ab' / 'abcd.jpg'))
+    original = _headers(middleware, file_url(tmp_path / 'img.png'))
+    other = _headers(middleware, '/gradio_api/queue/join')
+    missing = _headers(middleware, file_url(root / 'ab' / 'abcd.jpg'), status=404)
+
+    assert derived[b'cache-control'] == CACHE_CONTROL_DERIVED.encode()
+    assert original[b'cache-control'] == CACHE_CONTROL_FILE.encode()
+    assert b'cache-control' not in other
+    assert b'cache-control' not in missing
@@ -0,0 +1,277 @@
+"""Tests for the streaming merge engine (`ait.merge.merger.stream_*`): on small
+synthetic checkpoints it must reproduce the in-memory full_merge /
+selective_merge + save_file results bit for bit. Needs torch; no DB."""
+
+import pytest
+
+torch = pytest.importorskip('torch')
+
+from safetensors.torch import load_file, save_file  # noqa: E402
+
+from ait.merge import merger  # noqa: E402
+from ait.merge.safetensors_header import SafetensorsHeader, header_encode  # noqa: E402
+
+
+@pytest.fixture
+def files(tmp_path):
+    g = torch.Generator().manual_seed(0)
+    ckpt = {
+        'blocks.0.weight': torch.randn(64, 32, generator=g).to(torch.bfloat16),
+        'blocks.0.bias': torch.randn(64, generator=g).to(torch.bfloat16),
+        'blocks.1.weight': torch.randn(64, 64, generator=g).to(torch.bfloat16),
+        'norm.weight': torch.randn(64, generator=g),
+        'scale': torch.tensor(1.5),
+        'ckpt_only': torch.randn(3, 3, generator=g).to(torch.float16),
+    }
+    lora = {
+        'blocks.0.weight': torch.randn(64, 32, generator=g).to(torch.bfloat16),
+        'blocks.1.weight': torch.randn(64, 64, generator=g),  # f32 delta on a bf16 weight
+        'norm.weight': torch.randn(64, generator=g).to(torch.bfloat16),
+        'lora_only': torch.randn(8, 4, generator=g).to(torch.bfloat16),
+    }
+    file_ckpt, file_lora = tmp_path / 'ckpt.safetensors', tmp_path / 'lora.safetensors'
+    save_file(ckpt, file_ckpt)
+    save_file(lora, file_lora)
+    return file_ckpt, file_lora, ckpt, lora
+
+
+def _assert_bitwise(file_out, expected: dict):
+    merged = load_file(file_out)
+    assert set(merged) == set(expected)
+    for k, t in expected.items():
+        assert merged[k].dtype == t.dtype, k
+        assert merged[k].shape == t.shape, k
+        assert torch.equal(
+            merged[k].reshape(-1).view(torch.uint8), t.reshape(-1).view(torch.uint8)
+        ), k
+    SafetensorsHeader(file_out)  # layout validates
+
+
+def test_full_merge_bitwise(files, tmp_path):
+    file_ckpt, file_lora, ckpt, lora = files
+    file_out = tmp_path / 'out.safetensors'
+    merger.stream_full_merge(file_lora, file_ckpt, file_out, 0.3)
+    _assert_bitwise(file_out, merger.full_merge(lora, ckpt, 0.3))
+
+
+def test_selective_merge_bitwise(files, tmp_path):
+    file_ckpt, file_lora, ckpt, lora = files
+    weights = {'blocks.0.weight': 0.5, 'norm.weight': -1.25, 'ckpt_only': 0.7, 'lora_only': 2.0}
+    file_out = tmp_path / 'out.safetensors'
+    merger.stream_selective_merge(file_lora, file_ckpt, file_out, weights)
+    _assert_bitwise(file_out, merger.selective_merge(lora, ckpt, weights))
+
+
+def test_adapters_single_pass(files, tmp_path):
+    from ait.merge.adapters import Adapter, AdapterSpec
+
+    file_ckpt, _, ckpt, _ = files
+    g = torch.Generator().manual_seed(1)
+    lora = {
+        'diffusion_model.blocks.0.lora_A.weight': torch.randn(4, 32, generator=g).to(
+            torch.bfloat16
+        ),
+        'diffusion_model.blocks.0.lora_B.weight': torch.randn(64, 4, generator=g).to(
+            torch.bfloat16
+        ),
+    }
+    lokr = {
+        'blocks.0.lokr_w1': torch.randn(8, 4, generator=g),
+        'blocks.0.lokr_w2': torch.randn(8, 8, generator=g),
+        'blocks.1.lokr_w1': torch.randn(8, 8, generator=g),
+        'blocks.1.lokr_w2': torch.randn(8, 8, generator=g),
+    }
+    save_file(lora, tmp_path / 'lora.safetensors')
+    save_file(lokr, tmp_path / 'lokr.safetensors')
+    base = SafetensorsHeader(file_ckpt)
+    adapters = [
+        Adapter(AdapterSpec.from_arg(f'{tmp_path / "lora.safetensors"}:lora:0.8'), base),
+        Adapter(AdapterSpec.from_arg(f'{tmp_path / "lokr.safetensors"}:lokr:0.5'), base),
+    ]
+
+    file_out = tmp_path / 'out.safetensors'
+    counts = merger.stream_adapters_merge(file_ckpt, adapters, file_out, lambda k, info: info.dtype)
+    assert counts == {'merged': 2, 'copied': 4, 'deltas': 3}
+
+    w0 = ckpt['blocks.0.weight'].float()
+    w0 += (
+        lora['diffusion_model.blocks.0.lora_B.weight'].float()
+        @ lora['diffusion_model.blocks.0.lora_A.weight'].float()
+    ) * 0.8
+    w0 += torch.kron(lokr['blocks.0.lokr_w1'], lokr['blocks.0.lokr_w2']) * 0.5
+    w1 = (
+        ckpt['blocks.1.weight'].float()
+        + torch.kron(lokr['blocks.1.lokr_w1'], lokr['blocks.1.lokr_w2']) * 0.5
+    )
+    expected = dict(
+        ckpt, **{'blocks.0.weight': w0.to(torch.bfloat16), 'blocks.1.weight': w1.to(torch.bfloat16)}
+    )
+    _assert_bitwise(file_out, expected)
+
+
+def test_full_merge_in_place(files, tmp_path):
+    file_ckpt, file_lora, ckpt, lora = files
+    merger.stream_full_merge(file_lora, file_ckpt, file_ckpt, 0.3)
+    _assert_bitwise(file_ckpt, merger.full_merge(lora, ckpt, 0.3))
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_adapters_row_chunks_in_place(files, tmp_path):
+    from ait.merge.adapters import Adapter, AdapterSpec
+
+    file_ckpt, _, ckpt, _ = files
+    g = torch.Generator().manual_seed(2)
+    # quarter steps: B[rows] @ A is exact whatever matmul kernel a chunk gets
+    lora = {
+        'blocks.0.lora_A.weight': (torch.randn(4, 32, generator=g) * 4).round() / 4,
+        'blocks.0.lora_B.weight': (torch.randn(64, 4, generator=g) * 4).round() / 4,
+    }
+    # kron is 32 x 128, reshaped onto the 64 x 64 base: one-row chunks cut kron rows
+    lokr = {
+        'blocks.1.lokr_w1': torch.randn(4, 16, generator=g),
+        'blocks.1.lokr_w2': torch.randn(8, 8, generator=g),
+    }
+    save_file(lora, tmp_path / 'lora.safetensors')
+    save_file(lokr, tmp_path / 'lokr.safetensors')
+    base = SafetensorsHeader(file_ckpt)
+    adapters = [
+        Adapter(AdapterSpec(tmp_path / 'lora.safetensors', 'lora', 0.8), base),
+        Adapter(AdapterSpec(tmp_path / 'lokr.safetensors', 'lokr', 0.5), base),
+    ]
+
+    merger.stream_adapters_merge(
+        file_ckpt, adapters, file_ckpt, lambda k, info: info.dtype, chunk_bytes=256
+    )
+
+    w0 = (
+        ckpt['blocks.0.weight'].float()
+        + (lora['blocks.0.lora_B.weight'] @ lora['blocks.0.lora_A.weight']) * 0.8
+    )
+    w1 = (
+        ckpt['blocks.1.weight'].float()
+        + torch.kron(lokr['blocks.1.lokr_w1'], lokr['blocks.1.lokr_w2']).reshape(64, 64) * 0.5
+    )
+    expected = dict(
+        ckpt, **{'blocks.0.weight': w0.to(torch.bfloat16), 'blocks.1.weight': w1.to(torch.bfloat16)}
+    )
+    _assert_bitwise(file_ckpt, expected)
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_adapters_fp8_row_chunks(files, tmp_path):
+    from ait.merge import quantize
+    from ait.merge.adapters import Adapter, AdapterSpec
+
+    file_ckpt, _, ckpt, _ = files
+    g = torch.Generator().manual_seed(4)
+    lokr = {
+        'blocks.1.lokr_w1': torch.randn(4, 16, generator=g),
+        'blocks.1.lokr_w2': torch.randn(8, 8, generator=g),
+    }
+    save_file(lokr, tmp_path / 'lokr.safetensors')
+    adapters = [
+        Adapter(
+            AdapterSpec(tmp_path / 'lokr.safetensors', 'lokr', 0.5), SafetensorsHeader(file_ckpt)
+        )
+    ]
+
+    def merged(stochastic: bool, seed=42, chunk_bytes=256) -> bytes:
+        file_out = tmp_path / 'out.safetensors'
+        merger.stream_adapters_merge(
+            file_ckpt,
+            adapters,
+            file_out,
+            lambda k, info: 'F8_E4M3' if k.startswith('blocks.') else info.dtype,
+            stochastic=stochastic,
+            seed=seed,
+            chunk_bytes=chunk_bytes,
+        )
+        out = load_file(file_out)
+        assert {out[k].dtype for k in out if k.startswith('blocks.')} == {torch.float8_e4m3fn}
+        assert torch.equal(
+            out['blocks.0.bias'].float(), quantize.cast_fp8(ckpt['blocks.0.bias'].float()).float()
+        )
+        return quantize.as_bytes(out['blocks.1.weight']).tobytes()
+
+    w1 = (
+        ckpt['blocks.1.weight'].float()
+        + torch.kron(lokr['blocks.1.lokr_w1'], lokr['blocks.1.lokr_w2']).reshape(64, 64) * 0.5
+    )
+    nearest = merged(False)
+    assert nearest == quantize.as_bytes(quantize.cast_fp8(w1)).tobytes()
+    assert merged(False, chunk_bytes=quantize.CHUNK_BYTES) == nearest
+
+    stochastic = merged(True)
+    assert stochastic != nearest
+    assert merged(True) == stochastic
+    assert merged(True, seed=43) != stochastic
+
+
+def test_adapters_rejects_shape_mismatch(files, tmp_path):
+    from ait.merge.adapters import Adapter, AdapterSpec
+
+    file_ckpt = files[0]
+    save_file(
+        {'blocks.0.lokr_w1': torch.ones(3, 3), 'blocks.0.lokr_w2': torch.ones(3, 3)},
+        tmp_path / 'bad.safetensors',
+    )
+    with pytest.raises(ValueError, match='does not fit'):
+        Adapter(
+            AdapterSpec(tmp_path / 'bad.safetensors', 'lokr', 1.0), SafetensorsHeader(file_ckpt)
+        )
+
+
+def test_unsupported_dtype_is_named(files, tmp_path):
+    head = header_encode([('packed', 'U8', [2])])[0].replace(
+        b'"U8","shape":[2]', b'"F4","shape":[4]'
+    )
+    url = tmp_path / 'f4.safetensors'
+    url.write_bytes(head + bytes(2))
+
+    with pytest.raises(ValueError, match='packed: safetensors dtype F4'):
+        merger.stream_full_merge(url, files[0], tmp_path / 'out.safetensors', 0.3)
+
+
+def _quantize_stream(t: torch.Tensor, workers: int, seed: int | None) -> bytes:
+    from ait.merge import quantize
+
+    out = bytearray()
+
+    def tasks(key, t):
+        return [
+            lambda i=i, rows=rows: quantize.as_bytes(
+                quantize.cast_fp8(t[rows].float(), quantize.chunk_generator(seed, key, i))
+            )
+            for i, rows in enumerate(quantize.row_chunks(t.shape, chunk_bytes=4096))
+        ]
+
+    quantize.StreamPipeline(workers, prefetch=1).run(['a', 'b'], lambda k: t, tasks, out.extend)
+    return bytes(out)
+
+
+def test_chunked_quantize_reproducible_across_workers():
+    from ait.merge import quantize
+
+    t = torch.randn(300, 64, generator=torch.Generator().manual_seed(3)) * 100
+    nearest = _quantize_stream(t, 1, None)
+    whole = quantize.as_bytes(quantize.cast_fp8(t)).tobytes()
+    assert nearest == whole * 2
+
+    stochastic = _quantize_stream(t, 1, 42)
+    assert stochastic != nearest
+    assert _quantize_stream(t, 4, 42) == stochastic
+    assert _quantize_stream(t, 4, 43) != stochastic
+
+
+def test_header_reads_every_spec_dtype(tmp_path):
+    layout = [('u16', 'U16', [3]), ('u32', 'U32', [3]), ('u64', 'U64', [2]), ('e8', 'F8_E8M0', [5])]
+    head, n = header_encode(layout)
+    url = tmp_path / 'dtypes.safetensors'
+    url.write_bytes(head + bytes(n))
+    # a sub-byte dtype: two F4 values per byte, no byte range check
+    head = header_encode([('f4', 'U8', [2])])[0].replace(b'"U8","shape":[2]', b'"F4","shape":[4]')
+    url_f4 = tmp_path / 'f4.safetensors'
+    url_f4.write_bytes(head + bytes(2))
+
+    assert [t.nbytes for t in SafetensorsHeader(url).tensors.values()] == [6, 12, 16, 5]
+    assert SafetensorsHeader(url_f4)['f4'].dtype == 'F4'
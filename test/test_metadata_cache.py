@@ -0,0 +1,126 @@
+"""Tests for the sqlite image metadata cache (`ait.tools.metadata_cache`).
+
+PNG renders with ComfyUI text chunks are written to tmp: a root carrying an
+enhancer payload and two stored-mode renders chained to it by source path.
+Cached results must equal `metadata()` without cache, hit without opening
+files, and follow changes anywhere along the chain. Header-only reads must
+see text chunks stored behind the image data. No network, no DB.
+"""
+
+import json
+import os
+import struct
+import zlib
+
+import pytest
+from PIL import Image as PILImage
+from PIL.PngImagePlugin import PngInfo
+
+from ait.tools import images
+from ait.tools.images import metadata
+from ait.tools.metadata_cache import MetadataCache
+
+
+def _payload(scene_id: str) -> dict:
+    return {
+        'schema_id': '1xlasm_enhancer.iteration.v4',
+        'scene_id': scene_id,
+        'prompts': {'current': 0},
+    }
+
+
+def _render(url, clipspace: str, mtime: float) -> None:
+    graph = {'1': {'class_type': 'FbbcoolClipspace', 'is_changed': [clipspace], 'inputs': {}}}
+    info = PngInfo()
+    info.add_text('prompt', json.dumps(graph))
+    PILImage.new('RGB', (8, 8)).save(url, pnginfo=info)
+    os.utime(url, (mtime, mtime))
+
+
+@pytest.fixture
+def chain(tmp_path):
+    root, mid, leaf = tmp_path / 'root.png', tmp_path / 'mid.png', tmp_path / 'leaf.png'
+    _render(root, json.dumps(_payload('enh-1')), 1000.0)
+    _render(mid, str(root), 1001.0)
+    _render(leaf, str(mid), 1002.0)
+    return root, mid, leaf
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = MetadataCache(tmp_path / 'metadata.sqlite3')
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def opens(monkeypatch):
+    counts = {'open': 0}
+    open_ = PILImage.open
+
+    def counting(*args, **kwargs):
+        counts['open'] += 1
+        return open_(*args, **kwargs)
+
+    monkeypatch.setattr(images.PILImage, 'open', counting)
+    return counts
+
+
+def test_cached_equals_uncached(chain, cache):
+    for url in chain:
+        assert metadata(url, cache=cache) == metadata(url)
+    assert metadata(chain[2], cache=cache)['enhancer']['scene_id'] == 'enh-1'
+    assert metadata(chain[2], cache=cache)['inherited'][0] == 'enhancer'
+
+
+def test_hits_do_not_open_files(chain, cache, opens):
+    cache.metadata_many(chain)
+    n_open = opens['open']
+
+    mds = MetadataCache(cache.url).metadata_many([*chain, chain[0].parent / 'missing.png'])
+
+    assert opens['open'] == n_open
+    assert [md['url'] for md in list(mds.values())[:3]] == [str(url) for url in chain]
+    assert list(mds.values())[3] is None
+
+
+def test_source_chain_walks_cached_rows(chain, cache, opens):
+    # the chain hops of leaf come from the rows stored for root and mid
+    cache.metadata_many(chain[:2])
+    n_open = opens['open']
+
+    cache.metadata(chain[2])
+
+    assert opens['open'] == n_open + 1
+
+
+def test_changed_chain_root_invalidates_renders(chain, cache):
+    root, _, leaf = chain
+    assert cache.metadata(leaf)['enhancer']['scene_id'] == 'enh-1'
+
+    _render(root, json.dumps(_payload('enh-2')), 2000.0)
+
+    assert cache.metadata(leaf)['enhancer']['scene_id'] == 'enh-2'
+
+
+def _text_behind_idat(url, key: str, text: str) -> None:
+    raw = url.read_bytes()
+    data = key.encode('latin-1') + b'\x00' + text.encode('latin-1')
+    chunk = struct.pack('>I', len(data)) + b'tEXt' + data
+    chunk += struct.pack('>I', zlib.crc32(b'tEXt' + data))
+    iend = raw.rindex(b'IEND') - 4
+    url.write_bytes(raw[:iend] + chunk + raw[iend:])
+
+
+def test_header_only_reads_text_behind_idat(chain, tmp_path):
+    url = tmp_path / 'tail.png'
+    PILImage.new('RGB', (8, 8)).save(url)
+    envelope = {'input_data': _payload('enh-tail')}
+    _text_behind_idat(url, 'parent_metadata', json.dumps(envelope))
+
+    md = metadata(url, header_only=True)
+
+    assert md == metadata(url)
+    assert md['enhancer']['scene_id'] == 'enh-tail'
+    cache = MetadataCache(tmp_path / 'header.sqlite3', header_only=True)
+    assert cache.metadata_many([url, *chain]) == {path: metadata(path) for path in [url, *chain]}
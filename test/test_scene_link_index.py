@@ -0,0 +1,187 @@
+"""Tests for the scene link index (`aidb.scene.scene_link_index`) behind
+scene_scan_links, scene_ids_from_enh_id and the origin resolution of
+scene_adopt_img, and for the bulk `scenes_links_backfill` (in-process,
+checkpoint resume).
+
+Runs against an in-memory mongomock database with scene folders in tmp;
+renders carry an enhancer payload in their parent envelope. No network, no
+MongoDB server.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+mongomock = pytest.importorskip('mongomock')
+
+from aidb.scene.db_connect import DBConnection  # noqa: E402
+from aidb.scene.scene_common import SceneDef  # noqa: E402
+from aidb.scene.scene_manager import SceneManager  # noqa: E402
+from ait.tools.metadata_cache import MetadataCache  # noqa: E402
+
+
+def _payload_png(path: Path, id_enh: str, url_origin: str) -> Path:
+    payload = {
+        'schema_id': '1xlasm_enhancer.iteration.v4',
+        'scene_id': id_enh,
+        'url': url_origin,
+        'prompts': {'current': 0, 'entries': ['test prompt']},
+    }
+    info = PngInfo()
+    info.add_text('parent_metadata', json.dumps({'input_data': payload}))
+    Image.new('RGB', (8, 8)).save(path, pnginfo=info)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def mongomock_bulk_sort(monkeypatch):
+    # pymongo >= 4.11 passes sort= to bulk update builders, mongomock 4.3 does not take it
+    builder = mongomock.collection.BulkOperationBuilder
+    add_update = builder.add_update
+
+    def _add_update(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    monkeypatch.setattr(builder, 'add_update', _add_update)
+
+
+@pytest.fixture
+def scm(tmp_path):
+    dbc = object.__new__(DBConnection)
+    dbc.db = mongomock.MongoClient().db
+    dbc._verbose = 0
+    scm = SceneManager(dbc=dbc)
+    scm._metadata_cache = MetadataCache(tmp_path / 'metadata.sqlite3')
+    return scm
+
+
+def _scene(scm, url: Path) -> str:
+    url.mkdir()
+    return scm._dbc.insert_document(SceneDef.COLLECTION_SCENES, {SceneDef.FIELD_URL: str(url)})
+
+
+@pytest.fixture
+def scenes(scm, tmp_path):
+    origin = _scene(scm, tmp_path / 'origin')
+    (tmp_path / 'origin' / 'src.png').write_bytes(b'x')
+    child = _scene(scm, tmp_path / 'child')
+    _payload_png(tmp_path / 'child' / 'r1.png', 'enh-1', str(tmp_path / 'origin' / 'src.png'))
+    _payload_png(tmp_path / 'child' / 'r2.png', 'enh-2', '/nonexistent/src.png')
+    return origin, child
+
+
+def test_indexes_created(scm):
+    assert scm.link_index is not None
+    links = scm._dbc.db[SceneDef.COLLECTION_LINKS].index_information()
+    scenes = scm._dbc.db[SceneDef.COLLECTION_SCENES].index_information()
+
+    assert any(info['key'] == [('url', 1)] and info.get('unique') for info in links.values())
+    assert any(info['key'] == [('scenes_linked.ids_scene_enh', 1)] for info in scenes.values())
+
+
+def test_indexes_created_for_every_client(scm):
+    # a second client with a database of the same name gets its own indexes
+    assert scm.link_index is not None
+    dbc = object.__new__(DBConnection)
+    dbc.db = mongomock.MongoClient().db
+    dbc._verbose = 0
+    assert SceneManager(dbc=dbc).link_index is not None
+
+    links = dbc.db[SceneDef.COLLECTION_LINKS].index_information()
+    assert any(info['key'] == [('url', 1)] and info.get('unique') for info in links.values())
+
+
+def test_rescan_reads_only_changed_files(scm, scenes, tmp_path, monkeypatch):
+    origin, child = scenes
+    scm.scene_scan_links(origin)
+    found = scm.scene_scan_links(child)
+    assert sorted(found['ids_scene_enh']) == ['enh-1', 'enh-2']
+    assert found['sourced'] == [origin]
+
+    read = []
+    metadata_many = scm.metadata_cache.metadata_many
+    monkeypatch.setattr(
+        scm.metadata_cache, 'metadata_many', lambda urls: read.extend(urls) or metadata_many(urls)
+    )
+    assert scm.scene_scan_links(child) == found
+    assert read == []
+
+    (tmp_path / 'child' / 'r2.png').unlink()
+    _payload_png(tmp_path / 'child' / 'r3.png', 'enh-3', '/nonexistent/src.png')
+
+    assert sorted(scm.scene_scan_links(child)['ids_scene_enh']) == ['enh-1', 'enh-3']
+    assert read == [tmp_path / 'child' / 'r3.png']
+    assert scm.link_index.row_from_url(tmp_path / 'child' / 'r2.png') is None
+
+
+def test_adoption_lookups_use_index(scm, scenes, tmp_path):
+    origin, child = scenes
+    scm.scene_scan_links(origin)
+    scm.scene_scan_links(child)
+
+    # the index alone knows the enhancer scene (scenes_linked was never seeded)
+    assert scm.scene_ids_from_enh_id('enh-1') == [child]
+    assert scm._origin_scene_from_url(str(tmp_path / 'origin' / 'src.png')) == origin
+
+
+def test_registration_rename_keeps_row(scm, scenes, tmp_path):
+    _, child = scenes
+    scm.scene_scan_links(child)
+    url_orig = tmp_path / 'child' / '0rig___abc.png'
+
+    scm.link_index.move(tmp_path / 'child' / 'r1.png', url_orig, 'abc')
+
+    row = scm.link_index.row_from_url(url_orig)
+    assert row[SceneDef.FIELD_LINK_IMAGE_ID] == 'abc'
+    assert row[SceneDef.FIELD_LINK_ID_ENH] == 'enh-1'
+
+
+def _linked(scm, scene_id: str) -> dict:
+    doc = scm._dbc.db[SceneDef.COLLECTION_SCENES].find_one({'_id': scm._dbc.to_oid(scene_id)})
+    return doc.get(SceneDef.FIELD_SCENES_LINKED, {})
+
+
+def test_backfill_bulk_writes_links(scm, scenes, tmp_path):
+    origin, child = scenes
+    url_checkpoint = tmp_path / 'backfill.json'
+
+    dry = scm.scenes_links_backfill(dry=True, processes=1, url_checkpoint=url_checkpoint)
+    assert _linked(scm, child) == {}
+
+    found = scm.scenes_links_backfill(processes=1, url_checkpoint=url_checkpoint)
+
+    assert found == dry
+    assert sorted(found[child]['ids_scene_enh']) == ['enh-1', 'enh-2']
+    linked = _linked(scm, child)
+    assert sorted(linked['ids_scene_enh']) == ['enh-1', 'enh-2']
+    assert linked['ids_scene_db']['sourced'] == [origin]
+    assert _linked(scm, origin) == {}
+    assert not url_checkpoint.exists()
+
+
+def test_backfill_resumes_from_checkpoint(scm, scenes, tmp_path, monkeypatch):
+    origin, child = scenes
+    url_checkpoint = tmp_path / 'backfill.json'
+    checkpointed = {'ids_scene_enh': ['enh-0'], 'sourced': []}
+    url_checkpoint.write_text(json.dumps({'dry': False, 'done': {child: checkpointed}}))
+    scanned = []
+    scan = SceneManager.scene_scan_links
+    monkeypatch.setattr(
+        SceneManager, 'scene_scan_links', lambda self, id: scanned.append(id) or scan(self, id)
+    )
+    reported = []
+
+    found = scm.scenes_links_backfill(
+        processes=1, url_checkpoint=url_checkpoint, on_scene=lambda id, _: reported.append(id)
+    )
+
+    assert scanned == [origin]
+    assert reported == [child, origin]
+    assert found[child] == checkpointed
+    # a checkpoint of a dry run does not stand in for a written one
+    url_checkpoint.write_text(json.dumps({'dry': True, 'done': {child: checkpointed}}))
+    scm.scenes_links_backfill(processes=1, url_checkpoint=url_checkpoint)
+    assert scanned == [origin, origin, child]
@@ -0,0 +1,113 @@
+"""Tests for scene thumbnails: the draft/reduce downsizing, mtime staleness and
+atomic writes of `ait.tools.images`, and the ThumbnailPool behind
+`SceneManager.thumbnail_scope`.
+
+Images are written to tmp; the scope test replaces the scene config with a
+stub. No network, no DB.
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from aidb.scene.scene_manager import SceneManager
+from aidb.scene.scene_thumbs import ThumbnailPool
+from ait.tools.images import thumbnail_from_pil, thumbnail_stale, thumbnail_to_url
+
+
+def _img(path, size, format=None):
+    Image.linear_gradient('L').resize(size).convert('RGB').save(path, format=format)
+    return path
+
+
+@pytest.mark.parametrize(
+    'name, size, expected',
+    [('a.jpg', (4096, 4096), (256, 256)), ('b.png', (2048, 1024), (256, 128))],
+)
+def test_thumbnail_from_pil(tmp_path, name, size, expected):
+    with Image.open(_img(tmp_path / name, size)) as pil:
+        assert thumbnail_from_pil(pil, 256).size == expected
+
+
+@pytest.mark.parametrize(
+    'name, mode',
+    [('p.png', 'P'), ('p.gif', 'P'), ('pt.png', 'P'), ('bilevel.png', '1'), ('i16.png', 'I;16')],
+)
+def test_thumbnail_from_pil_modes_without_reduce(tmp_path, name, mode):
+    # Image.reduce rejects P, 1 and I;16: these are converted before
+    gradient = Image.linear_gradient('L').resize((2048, 1600))
+    flipped = gradient.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+    pil = Image.merge('RGB', (gradient, flipped, gradient)).convert(mode)
+    if name == 'pt.png':
+        pil.info['transparency'] = 0
+    pil.save(tmp_path / name)
+
+    with Image.open(tmp_path / name) as pil:
+        assert pil.mode == mode
+        assert thumbnail_from_pil(pil, 256).size == (256, 200)
+
+
+def test_jpeg_decodes_drafted(tmp_path, monkeypatch):
+    url = _img(tmp_path / 'a.jpg', (4096, 4096))
+    decoded = []
+    load = Image.Image.load
+
+    def recording(self):
+        decoded.append(self.size)
+        return load(self)
+
+    monkeypatch.setattr(Image.Image, 'load', recording)
+    with Image.open(url) as pil:
+        thumbnail_from_pil(pil, 256)
+
+    assert decoded and max(decoded)[0] == 512  # DCT scale 1/8, not 4096
+
+
+def test_thumbnail_staleness_follows_source_mtime(tmp_path):
+    src = _img(tmp_path / 'src.png', (600, 400))
+    thumb = tmp_path / 'thumbs' / 'thumbnail___x.png'
+
+    assert thumbnail_stale(src, thumb)
+    thumbnail_to_url(src, thumb, size=64)
+
+    assert not thumbnail_stale(src, thumb)
+    assert Image.open(thumb).size == (64, 43)
+    assert os.listdir(thumb.parent) == [thumb.name]  # temp file renamed away
+    os.utime(src, ns=(0, os.stat(src).st_mtime_ns + 1))
+    assert thumbnail_stale(src, thumb)
+    assert not thumbnail_stale(tmp_path / 'missing.png', thumb)
+
+
+def test_pool_writes_and_reports_failures(tmp_path):
+    srcs = [_img(tmp_path / f'{i}.png', (300, 300)) for i in range(3)]
+    broken = tmp_path / 'broken.png'
+    broken.write_bytes(b'no png')
+
+    with ThumbnailPool(processes=2, verbose=0) as pool:
+        for src in [*srcs, broken]:
+            assert pool.submit(src, tmp_path / 'thumbs' / src.name, 32)
+        assert not pool.submit(srcs[0], tmp_path / 'thumbs' / srcs[0].name, 32)
+        assert pool.wait() == 1
+
+    for src in srcs:
+        assert not thumbnail_stale(src, tmp_path / 'thumbs' / src.name)
+
+
+def test_scope_enqueues_submits(tmp_path, monkeypatch):
+    scm = object.__new__(SceneManager)
+    scm._verbose = 0
+    scm._thumbnails = None
+    monkeypatch.setattr(SceneManager, 'config', SimpleNamespace(thumbs_size=32))
+    src = _img(tmp_path / 'src.png', (300, 300))
+    thumb = tmp_path / 'thumbnail___x.png'
+
+    with scm.thumbnail_scope(processes=1) as pool:
+        assert scm.thumbnail_submit(src, thumb)
+        assert len(pool) == 1
+    assert not thumbnail_stale(src, thumb)
+
+    os.utime(src, ns=(0, 1))
+    assert scm.thumbnail_submit(src, thumb)  # no scope: written right away
+    assert not thumbnail_stale(src, thumb)
@@ -0,0 +1,130 @@
+"""Tests for the scene folder watcher (`aidb.scene.scene_watch`) and the
+journal-driven `SceneManager.scenes_update`.
+
+Both backends run against folders in tmp; the update test replaces Scene
+and the DB lookups with stubs. No network, no DB.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from aidb.scene import scene as scene_module
+from aidb.scene.scene_manager import SceneManager
+from aidb.scene.scene_watch import CREATED, DELETED, MODIFIED, SceneJournal, SceneWatcher
+
+BACKENDS = ['poll'] + (['inotify'] if sys.platform.startswith('linux') else [])
+
+
+def _wait(journal: SceneJournal, n_dirs: int, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while len(journal) < n_dirs and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def scenes(tmp_path):
+    for name in ('0000', '0001', '0002'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'old.png').write_bytes(b'x')
+    return tmp_path
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_watcher_journals_changes_per_folder(scenes, backend):
+    with SceneWatcher(scenes, backend=backend, interval=0.05, verbose=0) as watcher:
+        (scenes / '0000' / 'new.png').write_bytes(b'x')
+        (scenes / '0001' / 'old.png').unlink()
+        (scenes / '0001' / 'notes.txt').write_text('not a scene file')
+        (scenes / '0003').mkdir()
+        (scenes / '0003' / 'a.jpg').write_bytes(b'x')
+        _wait(watcher.journal, 3)
+        changes, lost = watcher.journal.take()
+
+    assert not lost
+    assert changes[scenes / '0000'] == {'new.png': CREATED}
+    assert changes[scenes / '0001'] == {'old.png': DELETED}
+    assert changes[scenes / '0003'] == {'a.jpg': CREATED}
+    assert scenes / '0002' not in changes
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_watcher_sees_rewrites(scenes, backend):
+    url = scenes / '0002' / 'old.png'
+    with SceneWatcher(scenes, backend=backend, interval=0.05, verbose=0) as watcher:
+        time.sleep(0.05)  # a different mtime for the poller
+        url.write_bytes(b'rewritten')
+        _wait(watcher.journal, 1)
+
+    assert watcher.journal.take()[0] == {scenes / '0002': {'old.png': MODIFIED}}
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is linux only')
+def test_inotify_follows_renamed_folder(scenes):
+    (scenes / '0000' / 'sub').mkdir()
+    with SceneWatcher(scenes, backend='inotify', verbose=0) as watcher:
+        (scenes / '0000').rename(scenes / '0100')
+        _wait(watcher.journal, 2)
+        changes, lost = watcher.journal.take()
+        (scenes / '0100' / 'x.png').write_bytes(b'x')
+        (scenes / '0100' / 'sub' / 'y.png').write_bytes(b'x')
+        _wait(watcher.journal, 2)
+
+    assert not lost
+    assert changes == {scenes / '0000': {'old.png': DELETED}, scenes / '0100': {'old.png': CREATED}}
+    assert watcher.journal.take() == (
+        {scenes / '0100': {'x.png': CREATED}, scenes / '0100' / 'sub': {'y.png': CREATED}},
+        False,
+    )
+
+
+def test_journal_coalesces():
+    journal = SceneJournal()
+    journal.record('/s/0000', 'a.png', CREATED)
+    journal.record('/s/0000', 'a.png', MODIFIED)
+    journal.record('/s/0001', 'b.png', CREATED)
+    journal.record('/s/0001', 'b.png', DELETED)
+
+    changes, lost = journal.take()
+
+    assert changes == {Path('/s/0000'): {'a.png': CREATED}, Path('/s/0001'): {}}
+    assert not lost
+    assert journal.take() == ({}, False)
+
+
+@pytest.fixture
+def scm(monkeypatch):
+    scm = object.__new__(SceneManager)
+    scm._verbose = 0
+    scm._thumbnails = None
+    urls = {'/s/0000': 'id0', '/s/0001': 'id1', '/s/0002': 'id2'}
+    monkeypatch.setattr(SceneManager, 'ids', property(lambda self: iter(urls.values())))
+    monkeypatch.setattr(
+        scm, 'data_from_url_db', lambda url: {'_id': urls[str(url)]} if str(url) in urls else None
+    )
+    scm.updated = []
+
+    class FakeScene:
+        def __init__(self, _scm, id):
+            self.id = id
+
+        def update(self):
+            scm.updated.append(self.id)
+
+    monkeypatch.setattr(scene_module, 'Scene', FakeScene)
+    return scm
+
+
+def test_scenes_update_touches_only_dirty_scenes(scm):
+    journal = SceneJournal()
+    journal.record('/s/0001', 'a.png', CREATED)
+    journal.record('/s/unknown', 'b.png', CREATED)
+
+    scm.scenes_update(journal=journal)
+    assert scm.updated == ['id1']
+
+    journal.mark_lost()
+    scm.scenes_update(journal=journal)
+    assert scm.updated == ['id1', 'id0', 'id1', 'id2']
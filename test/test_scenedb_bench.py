@@ -0,0 +1,44 @@
+"""Smoke test of the scene DB benchmark (`script/scenedb_bench.py`): a tiny run
+in a subprocess stays within its round trip budgets and writes comparable JSON.
+
+Runs against an in-memory mongomock database with scene folders in tmp. No
+network, no MongoDB server.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('mongomock')
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_bench_within_budgets(tmp_path):
+    url_out = tmp_path / 'bench.json'
+
+    subprocess.run(
+        [
+            sys.executable,
+            str(ROOT / 'script' / 'scenedb_bench.py'),
+            'n=3',
+            'm=2',
+            'repeat=1',
+            f'out={url_out}',
+        ],
+        env=os.environ | {'PYTHONPATH': str(ROOT / 'src')},
+        capture_output=True,
+        check=True,
+    )
+
+    results = json.loads(url_out.read_text())
+    assert (results['db'], results['n'], results['m']) == ('mongomock', 3, 2)
+    assert results['over_budget'] == []
+    ops = results['ops']
+    assert {'ids', 'scene_imgs', 'set_imgs_for_query', 'set_compile', 'scan_all'} <= set(ops)
+    assert ops['ids']['queries_by_call'] == {'scenes.find': 1}
+    assert ops['scene_imgs']['queries'] == 3 * 2  # one find_one per registered image
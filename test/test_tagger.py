@@ -0,0 +1,154 @@
+"""Tests for the batched WD14 tagger (`aidb.tagger.TaggerWD`): `tags_batch` and
+`tags_from_dir` give the per-image `tags()` results, a fixed model batch dim caps
+the batches, and concurrent callers share the session pool.
+
+A tiny onnx model (global mean pool + linear + sigmoid) and its label csv are
+exported to tmp and passed as model paths. No network, no DB.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+from PIL import Image
+
+pytest.importorskip('onnxruntime')
+onnx = pytest.importorskip('onnx')
+
+from aidb.tagger import TaggerWD  # noqa: E402
+
+N_TAGS = 16
+SIZE_MODEL = 32
+
+
+def _export(tmp_path, batch='N'):
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+    weight = numpy_helper.from_array(rng.normal(0.0, 0.01, (3, N_TAGS)).astype(np.float32), 'w')
+    graph = helper.make_graph(
+        [
+            helper.make_node('ReduceMean', ['input'], ['pooled'], axes=[1, 2], keepdims=0),
+            helper.make_node('MatMul', ['pooled', 'w'], ['logits']),
+            helper.make_node('Sigmoid', ['logits'], ['output']),
+        ],
+        'tiny_wd',
+        [
+            helper.make_tensor_value_info(
+                'input', TensorProto.FLOAT, [batch, SIZE_MODEL, SIZE_MODEL, 3]
+            )
+        ],
+        [helper.make_tensor_value_info('output', TensorProto.FLOAT, [batch, N_TAGS])],
+        initializer=[weight],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 17)], ir_version=8)
+    url_model = tmp_path / f'model_{batch}.onnx'
+    onnx.save(model, url_model)
+
+    url_labels = tmp_path / 'selected_tags.csv'
+    lines = ['tag_id,name,category,count']
+    lines += [f'{i},tag_{i},{9 if i < 4 else 0},0' for i in range(N_TAGS)]
+    url_labels.write_text('\n'.join(lines) + '\n')
+    return url_model, url_labels
+
+
+def _images() -> list[Image.Image]:
+    rng = np.random.default_rng(1)
+    imgs = []
+    for i, mode in enumerate(['RGBA', 'RGB', 'P', 'L', 'RGBA', 'RGB', 'LA']):
+        size = (40 + 7 * i, 64 - 5 * i)
+        arr = rng.integers(0, 255, (size[1], size[0], 4), dtype=np.uint8)
+        imgs.append(Image.fromarray(arr, 'RGBA').convert(mode))
+    return imgs
+
+
+@pytest.fixture
+def tagger(tmp_path):
+    return TaggerWD(*_export(tmp_path), prepare_workers=4)
+
+
+@pytest.mark.parametrize('batch_size', [1, 3, 16])
+def test_tags_batch_equals_tags(tagger, batch_size):
+    imgs = _images()
+
+    expected = [tagger.tags(img) for img in imgs]
+
+    assert tagger.tags_batch(imgs, batch_size=batch_size) == expected
+    assert {len(tags['rating']) for tags in expected} == {4}
+
+
+def test_fixed_batch_dim_caps_batches(tmp_path, monkeypatch):
+    tagger = TaggerWD(*_export(tmp_path, batch=2))
+    runs = []
+    run = tagger._run
+    monkeypatch.setattr(tagger, '_run', lambda batch: runs.append(len(batch)) or run(batch))
+
+    got = tagger.tags_batch(_images(), batch_size=16)
+
+    assert tagger.batch_max == 2
+    assert runs == [2, 2, 2, 1]
+    assert got == [tagger.tags(img) for img in _images()]
+
+
+def test_model_paths_from_env(tmp_path, monkeypatch):
+    url_model, url_labels = _export(tmp_path)
+    monkeypatch.setenv('AIDB_WDTAGGER_MODEL', str(url_model))
+    monkeypatch.setenv('AIDB_WDTAGGER_LABELS', str(url_labels))
+
+    tagger = TaggerWD()
+
+    assert (tagger.model_path, tagger.model_target_size) == (url_model, SIZE_MODEL)
+
+
+def test_tags_from_dir(tagger, tmp_path):
+    url = tmp_path / 'imgs'
+    (url / 'sub').mkdir(parents=True)
+    imgs = _images()[:5]
+    for i, img in enumerate(imgs[:4]):
+        img.save(url / f'{i}.png')
+    imgs[4].save(url / 'sub' / '4.png')
+    (url / 'broken.png').write_bytes(b'no png')
+    (url / 'notes.txt').write_text('no image')
+
+    got = list(tagger.tags_from_dir(url, batch_size=3))
+
+    assert [u.name for u, _ in got] == ['0.png', '1.png', '2.png', '3.png']
+    for u, tags in got:
+        with Image.open(u) as img:
+            assert tags == tagger.tags(img)
+    assert len(list(tagger.tags_from_dir(url, recursive=True))) == 5
+
+
+def test_concurrent_callers_share_the_pool(tmp_path, monkeypatch):
+    tagger = TaggerWD(*_export(tmp_path), pool_size=2)
+    imgs = _images()
+    expected = [tagger.tags(img) for img in imgs]
+    lock = threading.Lock()
+    state = {'out': 0, 'out_max': 0, 'used': set()}
+    session = TaggerWD._session
+
+    @contextmanager
+    def counting(self):
+        with session(self) as sess:
+            with lock:
+                state['out'] += 1
+                state['out_max'] = max(state['out_max'], state['out'])
+                state['used'].add(id(sess))
+            time.sleep(0.02)
+            try:
+                yield sess
+            finally:
+                with lock:
+                    state['out'] -= 1
+
+    monkeypatch.setattr(TaggerWD, '_session', counting)
+    with ThreadPoolExecutor(6) as ex:
+        got = list(ex.map(tagger.tags, imgs * 3))
+
+    assert got == expected * 3
+    assert state['out_max'] == 2
+    assert len(state['used']) == 2
+    assert tagger._sessions.qsize() == 2
@@ -0,0 +1,74 @@
+"""Tests for the train image resize (`ait.tools.images.train_from_image` /
+`resize_train`): reduce-then-resample and the OpenCV backend against the
+plain crop + LANCZOS resize, by PSNR. Synthetic images, no network, no DB.
+"""
+
+from collections import Counter
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from ait.tools.images import TRAIN_RESIZE_PSNR_MIN, resize_train, train_from_image
+
+
+def _render(width: int, height: int) -> Image.Image:
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([np.sin(x / (40 + 9 * c)) * np.cos(y / (55 + 7 * c)) for c in range(3)], -1)
+    arr = (base * 100 + 128 + rng.normal(0, 8, (height, width, 3))).clip(0, 255)
+    return Image.fromarray(arr.astype(np.uint8))
+
+
+def _psnr(a: Image.Image, b: Image.Image) -> float:
+    mse = np.mean((np.asarray(a, np.float64) - np.asarray(b, np.float64)) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255**2 / mse)
+
+
+def _lanczos(pil: Image.Image, size: tuple[int, int], box: tuple) -> Image.Image:
+    return pil.crop(box).resize(size, Image.Resampling.LANCZOS)
+
+
+@pytest.mark.parametrize(
+    'width, height, size, box',
+    [
+        (4096, 4096, (1024, 1024), (0, 0, 4096, 4096)),
+        (3840, 2160, (1024, 682), (300, 0, 3540, 2160)),
+        (2160, 3840, (682, 1024), (0, 300, 2160, 3540)),
+    ],
+)
+def test_train_from_image_matches_lanczos(width, height, size, box):
+    pil = _render(width, height)
+    stats = Counter()
+    train = train_from_image(pil, stats=stats, backend='pillow')
+
+    assert train.size == size
+    assert stats == {size: 1}
+    assert _psnr(train, _lanczos(pil, size, box)) >= TRAIN_RESIZE_PSNR_MIN
+
+
+def test_upscale_is_plain_lanczos():
+    pil = _render(400, 400)
+
+    train = train_from_image(pil, backend='pillow')
+
+    assert train.size == (512, 512)
+    assert _psnr(train, _lanczos(pil, (512, 512), (0, 0, 400, 400))) == float('inf')
+
+
+def test_cv2_backend_within_tolerance():
+    pytest.importorskip('cv2')
+    pil = _render(3840, 2160)
+    box = (300, 0, 3540, 2160)
+
+    train = resize_train(pil, (1024, 682), box=box, backend='cv2')
+
+    assert _psnr(train, _lanczos(pil, (1024, 682), box)) >= TRAIN_RESIZE_PSNR_MIN
+
+
+@pytest.mark.parametrize('mode', ['P', '1', 'I;16'])
+def test_modes_without_reduce(mode):
+    # Image.reduce rejects these modes, resize_train converts them first
+    pil = _render(4096, 4096).convert(mode)
+
+    assert train_from_image(pil, backend='pillow').size == (1024, 1024)
@@ -0,0 +1,87 @@
+"""Tests for the shared trainer dataset builder (`trainer.dataset`).
+
+Builds a dataset folder from a few source files, inline and on the process
+pool, and checks that a re-run only touches changed entries. No network.
+"""
+
+import os
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('git')  # the trainer package pulls in ait.install
+_ROOT = Path(__file__).resolve().parent.parent
+os.environ.setdefault('CONF_AIT', str(_ROOT / 'conf'))
+os.environ.setdefault('HOME_AIT', str(_ROOT))
+os.environ.setdefault('WORKSPACE', '/tmp')
+
+from trainer import dataset  # noqa: E402
+from trainer.dataset import DatasetBuilder, DatasetEntry  # noqa: E402
+
+
+def _sources(tmp_path: Path, n: int) -> list[DatasetEntry]:
+    src = tmp_path / 'src'
+    src.mkdir()
+    entries = []
+    for i in range(n):
+        url = src / f'img_{i:03d}.jpg'
+        url.write_bytes(b'x' * (i + 1))
+        entries.append(DatasetEntry(url, f'trigger,caption {i}'))
+    return entries
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_build_links_images_and_writes_captions(tmp_path, monkeypatch, workers):
+    monkeypatch.setattr(dataset, 'POOL_MIN', 1)
+    monkeypatch.setattr(dataset, 'BATCH_SIZE', 3)
+    entries = _sources(tmp_path, 10)
+    out = tmp_path / 'dataset'
+
+    counts = DatasetBuilder(out, workers=workers).build(entries)
+
+    assert counts == {'built': 10, 'unchanged': 0, 'missing': 0, 'failed': 0}
+    for entry in entries:
+        img = out / entry.src.name
+        assert img.is_symlink() and img.resolve() == entry.src
+        assert img.with_suffix('.txt').read_text(encoding='utf-8') == entry.caption
+
+
+def test_rebuild_only_touches_changed_entries(tmp_path):
+    entries = _sources(tmp_path, 5)
+    out = tmp_path / 'dataset'
+    DatasetBuilder(out, workers=1).build(entries)
+
+    entries[0].src.write_bytes(b'changed source')
+    entries[1] = DatasetEntry(entries[1].src, 'new caption')
+    (out / entries[2].src.with_suffix('.txt').name).unlink()
+    counts = DatasetBuilder(out, workers=1).build(entries)
+
+    assert counts['built'] == 3 and counts['unchanged'] == 2
+    assert (out / 'img_001.txt').read_text(encoding='utf-8') == 'new caption'
+    assert (out / 'img_002.txt').exists()
+
+
+def test_copy_mode_replaces_links_and_skips_missing_sources(tmp_path):
+    entries = _sources(tmp_path, 2)
+    entries.append(DatasetEntry(tmp_path / 'src' / 'gone.jpg', 'caption'))
+    out = tmp_path / 'dataset'
+    DatasetBuilder(out, workers=1).build(entries[:2])
+
+    counts = DatasetBuilder(out, workers=1, copy=True).build(entries)
+
+    assert counts['missing'] == 1
+    assert not (out / 'img_000.jpg').is_symlink()
+    assert (out / 'img_001.jpg').read_bytes() == entries[1].src.read_bytes()
+
+
+def test_link_mode_replaces_copies(tmp_path):
+    entries = _sources(tmp_path, 2)
+    out = tmp_path / 'dataset'
+    DatasetBuilder(out, workers=1, copy=True).build(entries)
+
+    counts = DatasetBuilder(out, workers=1).build(entries)
+
+    assert counts == {'built': 2, 'unchanged': 0, 'missing': 0, 'failed': 0}
+    for entry in entries:
+        img = out / entry.src.name
+        assert img.is_symlink() and img.resolve() == entry.src